@@ -0,0 +1,158 @@
+"""Analizy szeregów czasowych w NumPy: średnie kroczące, agregacje tygodniowe
+i miesięczne, korelacja bilansu kalorii ze zmianą wagi i trend wagi.
+
+Wejściem są kolumny z load_chart_data(). Każda seria jest raz zamieniana na
+tablicę wartości na ciągłej osi dni (dzień bez pomiaru = NaN), a wszystkie
+obliczenia działają na całych tablicach, bez pętli po wierszach.
+"""
+from datetime import date
+
+import numpy as np
+
+# Dni tygodnia liczone od poniedziałku; 1970-01-01 (dzień 0 w datetime64) to czwartek
+EPOCH_WEEKDAY = 3
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_days(dates):
+    """Kolumna obiektów date jako datetime64[D].
+
+    Przez numery dni - np.array(dates, dtype='datetime64[D]') jest kilkadziesiąt razy wolniejsze."""
+    ordinals = np.fromiter(map(date.toordinal, dates), dtype=np.int64, count=len(dates))
+    return (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+
+
+class DailySeries:
+    """Seria dzienna: `days` (datetime64[D]) i `values` (float, NaN = brak danych)"""
+
+    def __init__(self, days, values):
+        self.days = days
+        self.values = values
+
+    @classmethod
+    def from_columns(cls, dates, values, skip_zero=True):
+        """Buduje serię z kolumn; kilka wartości z jednego dnia jest uśredniane"""
+        values = np.array(values, dtype=float)
+        valid = ~np.isnan(values)
+        if skip_zero:
+            valid &= values != 0
+        days = to_days(dates)[valid]
+        values = values[valid]
+        if not len(values):
+            return cls(np.array([], dtype='datetime64[D]'), np.array([], dtype=float))
+
+        start = days.min()
+        index = (days - start).astype(np.int64)
+        sums = np.bincount(index, weights=values)
+        counts = np.bincount(index)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            daily = sums / counts
+        return cls(start + np.arange(len(daily)), daily)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def observed(self):
+        return ~np.isnan(self.values)
+
+    def rolling_mean(self, window):
+        """Średnia z ostatnich `window` dni (tylko dni z danymi; NaN, gdy w oknie brak danych)"""
+        present = self.observed
+        sums = np.concatenate(([0.0], np.cumsum(np.where(present, self.values, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(present)))
+        lag = np.maximum(np.arange(1, len(self) + 1) - window, 0)
+        window_sums = sums[1:] - sums[lag]
+        window_counts = counts[1:] - counts[lag]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+    def resample(self, period):
+        """Średnie tygodniowe ('week', od poniedziałku) albo miesięczne ('month').
+
+        Zwraca (początki okresów jako datetime64[D], średnie, liczba dni z danymi)."""
+        present = self.observed
+        days, values = self.days[present], self.values[present]
+        if not len(values):
+            return days, values, np.array([], dtype=np.int64)
+        if period == 'week':
+            ordinals = days.astype(np.int64)
+            keys = days - (ordinals + EPOCH_WEEKDAY) % 7
+        elif period == 'month':
+            keys = days.astype('datetime64[M]').astype('datetime64[D]')
+        else:
+            raise ValueError(f'Nieznany okres: {period}')
+        periods, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse)
+        return periods, np.bincount(inverse, weights=values) / counts, counts
+
+
+def calorie_weight_correlation(calories, weight):
+    """Korelacja średniego dziennego spożycia kalorii w tygodniu ze zmianą wagi w tym tygodniu.
+
+    Zmiana wagi to różnica średnich wag kolejnego i bieżącego tygodnia. Z prostej regresji
+    wyznaczane jest spożycie, przy którym waga się nie zmienia (szacowane zapotrzebowanie).
+    """
+    weeks, weekly_weight, _ = weight.resample('week')
+    consecutive = np.diff(weeks).astype(np.int64) == 7
+    change_weeks = weeks[:-1][consecutive]
+    weight_change = np.diff(weekly_weight)[consecutive]
+
+    cal_weeks, weekly_calories, _ = calories.resample('week')
+    _, index_change, index_calories = np.intersect1d(change_weeks, cal_weeks, return_indices=True)
+    x = weekly_calories[index_calories]
+    y = weight_change[index_change]
+
+    result = {'weeks': int(len(x)), 'r': None, 'kg_per_100_kcal': None, 'maintenance_kcal': None}
+    if len(x) < 3 or np.ptp(x) == 0 or np.ptp(y) == 0:
+        return result
+
+    slope, intercept = np.polyfit(x, y, 1)
+    result['r'] = round(float(np.corrcoef(x, y)[0, 1]), 3)
+    result['kg_per_100_kcal'] = round(float(slope * 100), 3)
+    if slope > 0:
+        result['maintenance_kcal'] = round(float(-intercept / slope))
+    return result
+
+
+def linear_trend(series, window_days=90, horizons=(30, 90)):
+    """Trend liniowy z ostatnich `window_days` dni serii i prognozy na kolejne dni.
+
+    Zwraca None, gdy w oknie są mniej niż dwa dni z pomiarem."""
+    if not len(series):
+        return None
+    recent = slice(max(len(series) - window_days, 0), None)
+    days, values = series.days[recent], series.values[recent]
+    present = ~np.isnan(values)
+    if present.sum() < 2:
+        return None
+
+    x = (days[present] - days[-1]).astype(np.int64).astype(float)
+    slope, intercept = np.polyfit(x, values[present], 1)
+    return {
+        'slope_per_week': float(slope * 7),
+        'start': days[present][0],
+        'start_value': float(intercept + slope * x[0]),
+        'end': days[-1],
+        'end_value': float(intercept),
+        'projections': [(days[-1] + int(h), float(intercept + slope * h)) for h in horizons],
+    }
+
+
+def daily_series(data, source, column):
+    """Kolumna danych wykresu jako seria dzienna NumPy (budowana raz na wczytanie danych)"""
+    cache = data.setdefault('series', {})
+    if (source, column) not in cache:
+        cache[source, column] = DailySeries.from_columns(data[source]['date'], data[source][column])
+    return cache[source, column]
+
+
+def resample_columns(series, period):
+    periods, means, counts = series.resample(period)
+    return {'period': [str(day) for day in periods], 'mean': np.round(means, 2).tolist(),
+            'days': counts.tolist()}
+
+
+def latest(values):
+    present = values[~np.isnan(values)]
+    return round(float(present[-1]), 2) if len(present) else None
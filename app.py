@@ -1,304 +1,1670 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, date, timedelta
+from flask import (Blueprint, Flask, Request, abort, current_app, render_template, request, redirect, url_for,
+                   flash, jsonify, Response, g, make_response, send_from_directory, session, stream_with_context)
+from werkzeug.datastructures import FileStorage
+from werkzeug.local import LocalProxy
+from sqlalchemy import event, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, date, timedelta, timezone
+from functools import partial, wraps
+import gzip
+import hashlib
 import os
+import posixpath
+import shutil
+import signal
+import sys
+from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
-import plotly.graph_objs as go
-import plotly.utils
 import json
+import threading
+import time
+from urllib.parse import urlsplit
+import click
+from collections import OrderedDict, defaultdict, Counter
+from importer import FORMATS, ImportDataError, batched, detect_format, iter_records, normalize
+import exporter
+import goals
+import retention
+import synthetic
+import search
+from models import (db, DailySummary, DataVersion, MEAL_TYPE_COLUMNS, NutritionEntry,
+                    PersonalData, PersonalDaily, PersonalHourly, Photo, SportEntry, User)
+from perf import PerfMonitor
+from images import ImagePipeline, VARIANTS, find_original, remove_variants, variant_name, variant_source
+from ingest import IngestQueue, IngestQueueFull
+from photo_store import TMP_DIR, HashingFile, is_content_name, sanitize, spool, store_upload
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'twoj-secret-key-tutaj'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///dziennik.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs('instance', exist_ok=True)
-
-db = SQLAlchemy(app)
-
-# Modele bazy danych
-class SportEntry(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False)
-    activity = db.Column(db.String(100), nullable=False)
-    duration = db.Column(db.Integer)  # w minutach
-    notes = db.Column(db.Text)
-    photo_filename = db.Column(db.String(200))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class NutritionEntry(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False)
-    meal_type = db.Column(db.String(50), nullable=False)  # śniadanie, obiad, kolacja, przekąska
-    food_item = db.Column(db.String(200), nullable=False)
-    quantity = db.Column(db.String(100))
-    calories = db.Column(db.Integer)
-    water_ml = db.Column(db.Integer, default=0)
-    notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class PersonalData(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False)
-    weight = db.Column(db.Float)
-    height = db.Column(db.Float)  # w cm
-    body_fat = db.Column(db.Float)  # procent
-    muscle_mass = db.Column(db.Float)  # kg
-    notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    @property
-    def bmi(self):
-        if self.weight and self.height:
-            height_m = self.height / 100
-            return round(self.weight / (height_m * height_m), 1)
-        return None
+# Wykresy (Plotly, NumPy) i analizy ładowane są leniwie - przy pierwszym wykresie albo raporcie,
+# więc start procesu, polecenia CLI i trasy bez wykresów nie płacą za ich import
+
+def load_config(app, test_config=None):
+    """Konfiguracja domyślna, nadpisywana zmiennymi środowiskowymi i `test_config`"""
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'twoj-secret-key-tutaj')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///dziennik.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Zdjęcia poza folderem static/ - serwuje je tylko /photos/ ze sprawdzeniem właściciela
+    app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', os.path.join(app.instance_path, 'uploads'))
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', 2))  # wątki obróbki zdjęć
+    app.config['PHOTO_MAX_AGE'] = 365 * 24 * 3600  # zdjęcia mają nazwy ze skrótu treści - nie zmieniają się
+    app.config['CHART_CACHE_BYTES'] = 64 * 1024 * 1024  # limit pamięci podręcznej wykresów (JSON) w procesie
+    app.config['CHART_CACHE_USER_BYTES'] = 4 * 1024 * 1024  # limit części jednego użytkownika
+    app.config['CHART_MAX_POINTS'] = 2000  # domyślny limit punktów serii w /api/charts
+    app.config['CHART_WORKERS'] = int(os.environ.get('CHART_WORKERS', 0))  # procesy budujące wykresy (0 - w wątku żądania)
+    app.config['COMPRESS_MIN_SIZE'] = 500  # mniejsze odpowiedzi nie są kompresowane (bajty)
+    app.config['COMPRESS_MAX_FILE_SIZE'] = 1024 * 1024  # większe pliki statyczne nie są kompresowane
+    app.config['COMPRESS_LEVEL'] = 6
+    app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'production')
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    # Pomiary żądań (Server-Timing, /debug/perf) - domyślnie wyłączone
+    app.config['PERF_ENABLED'] = os.environ.get('PERF_ENABLED', '') == '1'
+    # Konta (nazwy rozdzielone przecinkami), które mogą oglądać i zerować raport /debug/perf
+    app.config['PERF_ADMINS'] = {name for name in os.environ.get('PERF_ADMINS', '').split(',') if name}
+    # Próbki z urządzeń (/api/ingest): pojemność kolejki, paczka zapisu, maks. czas oczekiwania (s)
+    app.config['INGEST_QUEUE_SIZE'] = int(os.environ.get('INGEST_QUEUE_SIZE', 50000))
+    app.config['INGEST_BATCH_SIZE'] = int(os.environ.get('INGEST_BATCH_SIZE', 1000))
+    app.config['INGEST_FLUSH_INTERVAL'] = float(os.environ.get('INGEST_FLUSH_INTERVAL', 0.5))
+    app.config['INGEST_MAX_SAMPLES'] = 5000  # limit próbek w jednym żądaniu
+    # Przechowywanie pomiarów (retention.py): dni surowych próbek i agregatów godzinowych,
+    # odstęp kompaktowania w serwerze (s, 0 - tylko poleceniem compact-data)
+    app.config['PERSONAL_RAW_DAYS'] = int(os.environ.get('PERSONAL_RAW_DAYS', 30))
+    app.config['PERSONAL_HOURLY_DAYS'] = int(os.environ.get('PERSONAL_HOURLY_DAYS', 365))
+    app.config['PERSONAL_COMPACT_INTERVAL'] = int(os.environ.get('PERSONAL_COMPACT_INTERVAL', 3600))
+    # Aktualizacja schematu przy pierwszym żądaniu (0 - tylko poleceniami init-db / upgrade-db)
+    app.config['AUTO_UPGRADE_DB'] = os.environ.get('AUTO_UPGRADE_DB', '1') == '1'
+    app.config.update(test_config or {})
+
+    if app.config['SQLITE_PROFILE'] not in SQLITE_PROFILES:
+        raise ValueError(f"Nieznany profil SQLite: {app.config['SQLITE_PROFILE']}")
+
+    # Baza w pamięci używa jednego współdzielonego połączenia (StaticPool) - bez puli
+    if app.config['SQLALCHEMY_DATABASE_URI'] not in ('sqlite://', 'sqlite:///:memory:'):
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': 30,
+        })
+
+# Profil SQLite: ustawienia PRAGMA wykonywane dla każdego nowego połączenia
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',          # czytelnicy nie blokują zapisu i odwrotnie
+        'synchronous': 'NORMAL',        # w trybie WAL bezpieczne i znacznie szybsze niż FULL
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,       # w KiB (64 MB)
+        'busy_timeout': 5000,           # ms oczekiwania na blokadę zamiast "database is locked"
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Trasy, których pliki zapisywane są od razu do magazynu zdjęć
+PHOTO_UPLOAD_ENDPOINTS = {'main.add_sport', 'main.edit_sport'}
+
+class UploadRequest(Request):
+    """Zdjęcia z formularzy treningów trafiają na dysk kawałkami, z liczeniem skrótu"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint in PHOTO_UPLOAD_ENDPOINTS:
+            return HashingFile(os.path.join(current_app.config['UPLOAD_FOLDER'], TMP_DIR))
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+def set_sqlite_pragmas(pragmas, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+def extension(name):
+    """Rozszerzenie bieżącej aplikacji z app.extensions (LocalProxy, jak current_app)"""
+    return LocalProxy(lambda: current_app.extensions[name])
+
+# Rozszerzenia tworzone osobno dla każdej aplikacji w create_app() - kilka aplikacji w jednym
+# procesie (np. aplikacja procesu puli wykresów) nie dzieli stanu ani wątków. Trasy, polecenia
+# CLI i hooki żądań rejestruje blueprint `main` (polecenia bez prefiksu grupy, np. `flask upgrade-db`)
+perf_monitor = extension('dziennik_perf')
+image_pipeline = extension('dziennik_images')
+ingest_queue = extension('dziennik_ingest')
+chart_cache = extension('dziennik_chart_cache')
+bp = Blueprint('main', __name__, cli_group=None)
+
+def create_app(test_config=None):
+    """Tworzy aplikację; nie łączy się z bazą i nie importuje modułów wykresów"""
+    app = Flask(__name__)
+    load_config(app, test_config)
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.instance_path, exist_ok=True)
+    app.request_class = UploadRequest
+    app.jinja_env.globals['timedelta'] = timedelta
+
+    db.init_app(app)
+    perf = app.extensions['dziennik_perf'] = PerfMonitor()
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            pragmas = SQLITE_PROFILES[app.config['SQLITE_PROFILE']]
+            event.listen(db.engine, 'connect', partial(set_sqlite_pragmas, pragmas))
+        perf.init_app(app, db.engine)
+    app.extensions['dziennik_images'] = ImagePipeline()
+    app.extensions['dziennik_images'].init_app(app)
+    app.extensions['dziennik_chart_cache'] = ChartCache()
+    app.extensions['dziennik_chart_cache'].init_app(app)
+    app.extensions['dziennik_ingest'] = IngestQueue()
+    app.extensions['dziennik_ingest'].init_app(app, partial(write_ingest_batch, app))
+    app.extensions['dziennik_chart_pool'] = {'executor': None, 'lock': threading.Lock()}
+    app.register_blueprint(bp)
+    return app
 
 # Funkcje pomocnicze
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def create_weight_chart():
-    data = PersonalData.query.order_by(PersonalData.date).all()
-    if not data:
-        return None
-    
-    dates = [entry.date for entry in data if entry.weight]
-    weights = [entry.weight for entry in data if entry.weight]
-    
-    if not dates:
-        return None
-    
-    fig = go.Figure(data=go.Scatter(x=dates, y=weights, mode='lines+markers'))
-    fig.update_layout(
-        title='Wykres Wagi',
-        xaxis_title='Data',
-        yaxis_title='Waga (kg)',
-        height=400
-    )
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+@bp.app_template_global()
+def photo_url(filename, variant):
+    """Adres wariantu zdjęcia (WebP) - stały, więc strona (i jej ETag) nie zależy od tego,
+    czy obróbka w tle już się skończyła; do tego czasu trasa zdjęć zwraca oryginał"""
+    if variant in VARIANTS:
+        return url_for('main.photo', filename=variant_name(filename, variant))
+    return url_for('main.photo', filename=filename)
 
-def create_bmi_chart():
-    data = PersonalData.query.order_by(PersonalData.date).all()
-    if not data:
-        return None
-    
-    dates = []
-    bmis = []
-    
-    for entry in data:
-        if entry.bmi:
-            dates.append(entry.date)
-            bmis.append(entry.bmi)
-    
-    if not dates:
-        return None
-    
-    fig = go.Figure(data=go.Scatter(x=dates, y=bmis, mode='lines+markers'))
-    fig.update_layout(
-        title='Wykres BMI',
-        xaxis_title='Data',
-        yaxis_title='BMI',
-        height=400
-    )
-    
-    # Dodaj linie referencyjne BMI
-    fig.add_hline(y=18.5, line_dash="dash", line_color="blue", annotation_text="Niedowaga")
-    fig.add_hline(y=25, line_dash="dash", line_color="green", annotation_text="Norma")
-    fig.add_hline(y=30, line_dash="dash", line_color="orange", annotation_text="Nadwaga")
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+def legacy_upload_folder():
+    """Dawny folder zdjęć w static/ (dostępny bez logowania) - opróżniany przez migrate-photos"""
+    return os.path.join(current_app.static_folder, 'uploads')
 
-def create_body_composition_chart():
-    """Wykres składu ciała (tkanka tłuszczowa + masa mięśniowa)"""
-    data = PersonalData.query.order_by(PersonalData.date).all()
-    if not data:
-        return None
-    
-    dates = []
-    body_fat = []
-    muscle_mass = []
-    
-    for entry in data:
-        if entry.body_fat or entry.muscle_mass:
-            dates.append(entry.date)
-            body_fat.append(entry.body_fat if entry.body_fat else None)
-            muscle_mass.append(entry.muscle_mass if entry.muscle_mass else None)
-    
-    if not dates:
-        return None
-    
-    fig = go.Figure()
-    
-    if any(bf for bf in body_fat if bf is not None):
-        fig.add_trace(go.Scatter(x=dates, y=body_fat, mode='lines+markers', 
-                                name='Tkanka tłuszczowa (%)', line=dict(color='red')))
-    
-    if any(mm for mm in muscle_mass if mm is not None):
-        fig.add_trace(go.Scatter(x=dates, y=muscle_mass, mode='lines+markers', 
-                                name='Masa mięśniowa (kg)', line=dict(color='green'), yaxis='y2'))
-    
-    fig.update_layout(
-        title='Skład Ciała',
-        xaxis_title='Data',
-        yaxis=dict(title='Tkanka tłuszczowa (%)', side='left'),
-        yaxis2=dict(title='Masa mięśniowa (kg)', side='right', overlaying='y'),
-        height=400,
-        legend=dict(x=0, y=1)
-    )
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+def move_legacy_uploads():
+    """Przenosi zdjęcia z dawnego folderu static/uploads do UPLOAD_FOLDER; zwraca ich liczbę"""
+    legacy = legacy_upload_folder()
+    folder = current_app.config['UPLOAD_FOLDER']
+    if not os.path.isdir(legacy) or os.path.abspath(legacy) == os.path.abspath(folder):
+        return 0
+    moved = 0
+    for root, dirs, files in os.walk(legacy):
+        dirs[:] = [name for name in dirs if name != TMP_DIR]
+        for name in files:
+            source = os.path.join(root, name)
+            target = os.path.join(folder, os.path.relpath(source, legacy))
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(source, target)
+            moved += 1
+    return moved
 
-def create_calories_chart():
-    """Wykres dziennego spożycia kalorii"""
-    from sqlalchemy import func
-    
-    # Grupowanie kalorii po dniach
-    calories_by_day = db.session.query(
-        NutritionEntry.date,
-        func.sum(NutritionEntry.calories).label('total_calories')
-    ).filter(NutritionEntry.calories.isnot(None))\
-     .group_by(NutritionEntry.date)\
-     .order_by(NutritionEntry.date)\
-     .all()
-    
-    if not calories_by_day:
-        return None
-    
-    dates = [entry.date for entry in calories_by_day]
-    calories = [entry.total_calories for entry in calories_by_day]
-    
-    fig = go.Figure(data=go.Bar(x=dates, y=calories, marker_color='orange'))
-    fig.update_layout(
-        title='Dzienne Spożycie Kalorii',
-        xaxis_title='Data',
-        yaxis_title='Kalorie (kcal)',
-        height=400
+def remove_photo(filename):
+    """Usuwa oryginał zdjęcia razem z jego wariantami"""
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    remove_variants(current_app.config['UPLOAD_FOLDER'], filename)
+
+def store_photo(file):
+    """Zapisuje przesłane zdjęcie (bez metadanych) w magazynie i zwraca jego nazwę.
+
+    Identyczny plik zapisany wcześniej nie jest kopiowany - zwiększany jest tylko licznik odwołań.
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    upload = file.stream if isinstance(file.stream, HashingFile) else spool(folder, file.stream)
+    # Skrót i nazwa z treści bez EXIF - opublikowany plik już się nie zmienia
+    upload = sanitize(folder, upload)
+    digest = upload.hexdigest()
+
+    updated = db.session.execute(
+        db.update(Photo).where(Photo.sha256 == digest).values(ref_count=Photo.ref_count + 1)
+    ).rowcount
+    if updated:
+        upload.close()
+        return db.session.get(Photo, digest).filename
+
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+    filename = store_upload(folder, upload, ext)
+    db.session.add(Photo(sha256=digest, filename=filename, size=upload.size, ref_count=1))
+    image_pipeline.submit(filename)
+    return filename
+
+def release_photo(filename):
+    """Zmniejsza licznik odwołań zdjęcia.
+
+    Zwraca nazwę pliku do usunięcia po commit, jeśli było to ostatnie odwołanie.
+    """
+    photo = Photo.query.filter_by(filename=filename).first()
+    if photo is None:
+        # Zdjęcie sprzed magazynu (nazwa z datą) należy tylko do jednego wpisu
+        return filename
+    db.session.execute(
+        db.update(Photo).where(Photo.sha256 == photo.sha256).values(ref_count=Photo.ref_count - 1)
     )
-    
-    avg_calories = sum(calories) / len(calories) if calories else 0
-    fig.add_hline(y=avg_calories, line_dash="dash", line_color="red", 
-                  annotation_text=f"Średnia: {avg_calories:.0f} kcal")
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    db.session.refresh(photo)
+    if photo.ref_count > 0:
+        return None
+    db.session.delete(photo)
+    return filename
 
-def create_water_chart():
-    """Wykres dziennego spożycia wody"""
-    from sqlalchemy import func
-    
-    # Grupowanie wody po dniach
-    water_by_day = db.session.query(
+def remove_released_photo(filename):
+    """Usuwa plik zwolniony przez release_photo() - wywoływane dopiero po commit"""
+    # W międzyczasie ten sam plik mógł zostać przesłany ponownie
+    if filename and Photo.query.filter_by(filename=filename).first() is None:
+        remove_photo(filename)
+
+def current_user_id():
+    """Id zalogowanego użytkownika (w poleceniach CLI i procesach puli ustawiane w g)"""
+    return g.user_id
+
+def user_query(model):
+    """Zapytanie o wpisy zalogowanego użytkownika"""
+    return model.query.filter(model.user_id == current_user_id())
+
+def bump_data_version(table_name, user_id=None):
+    """Zwiększa wersję danych tabeli użytkownika (w tej samej transakcji co zmiana wpisu)"""
+    user_id = user_id or current_user_id()
+    now = datetime.utcnow()
+    updated = db.session.query(DataVersion)\
+        .filter(DataVersion.user_id == user_id, DataVersion.table_name == table_name)\
+        .update({DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: now},
+                synchronize_session=False)
+    if not updated:
+        db.session.add(DataVersion(user_id=user_id, table_name=table_name, version=1, updated_at=now))
+
+def get_data_versions():
+    return dict(db.session.query(DataVersion.table_name, DataVersion.version)
+                .filter(DataVersion.user_id == current_user_id()).all())
+
+class ChartCache:
+    """Pamięć podręczna gotowych wykresów (JSON) i raportów analiz, z osobną częścią na użytkownika.
+
+    Wpis ma klucz (nazwa, wersja danych, parametry). Zapis nowej wersji usuwa z części
+    użytkownika starsze wersje tego wykresu - po zmianie danych nie będą już czytane.
+    Rozmiar części użytkownika i całości ograniczają limity bajtów; po przekroczeniu
+    całości usuwane są najdawniej używane wpisy najdawniej aktywnych użytkowników."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, user_max_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.user_max_bytes = user_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        # użytkownik -> OrderedDict {(nazwa, wersja, parametry): (wartość, rozmiar)}; od najdawniej aktywnego
+        self._users = OrderedDict()
+        self._user_bytes = Counter()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_bytes = app.config['CHART_CACHE_BYTES']
+        self.user_max_bytes = app.config['CHART_CACHE_USER_BYTES']
+
+    def get(self, user_id, name, version, params):
+        """Zwraca (True, wartość) przy trafieniu, (False, None) w przeciwnym razie"""
+        key = (name, version, params)
+        with self._lock:
+            items = self._users.get(user_id)
+            if items is not None and key in items:
+                items.move_to_end(key)
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return True, items[key][0]
+            self.misses += 1
+            return False, None
+
+    def set(self, user_id, name, version, params, value):
+        size = len(value) if isinstance(value, (str, bytes)) else len(json.dumps(value, default=str))
+        if size > self.user_max_bytes:
+            return
+        key = (name, version, params)
+        with self._lock:
+            stale = [old for old in self._users.get(user_id, ()) if old[0] == name and (old == key or old[1] != version)]
+            for old in stale:
+                self._remove(user_id, old)
+            items = self._users.setdefault(user_id, OrderedDict())
+            self._users.move_to_end(user_id)
+            items[key] = (value, size)
+            self._user_bytes[user_id] += size
+            self.bytes += size
+            while self._user_bytes[user_id] > self.user_max_bytes:
+                self._remove(user_id, next(iter(items)))
+            while self.bytes > self.max_bytes:
+                oldest_user = next(iter(self._users))
+                self._remove(oldest_user, next(iter(self._users[oldest_user])))
+
+    def _remove(self, user_id, key):
+        items = self._users[user_id]
+        size = items.pop(key)[1]
+        self._user_bytes[user_id] -= size
+        self.bytes -= size
+        if not items:
+            del self._users[user_id]
+            del self._user_bytes[user_id]
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._user_bytes.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': sum(len(items) for items in self._users.values()),
+                'users': len(self._users),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'user_max_bytes': self.user_max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            }
+
+# Zapytania warunkowe stron (ETag, Last-Modified) - wynik zależy od szablonów i kodu,
+# więc ich zmiana (nowa wersja aplikacji) unieważnia znaczniki zapamiętane przez przeglądarki
+def code_files():
+    paths = [os.path.abspath(__file__)]
+    templates = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+    return paths + [os.path.join(templates, name) for name in sorted(os.listdir(templates))]
+
+def code_fingerprint():
+    stamps = '|'.join(f'{path}:{os.stat(path).st_mtime_ns}' for path in code_files())
+    return hashlib.sha1(stamps.encode('utf-8')).hexdigest()[:12]
+
+def code_modified():
+    """Czas ostatniej zmiany kodu lub szablonów (UTC) - najwcześniejszy Last-Modified stron"""
+    latest = max(os.stat(path).st_mtime for path in code_files())
+    return datetime.fromtimestamp(int(latest), timezone.utc)
+
+CODE_FINGERPRINT = code_fingerprint()
+CODE_MODIFIED = code_modified()
+
+def page_validators(tables):
+    """ETag i Last-Modified strony zależnej od danych `tables` - jedno zapytanie o wersje"""
+    rows = db.session.query(DataVersion.table_name, DataVersion.version, DataVersion.updated_at)\
+        .filter(DataVersion.user_id == current_user_id(), DataVersion.table_name.in_(tables)).all()
+    versions = {table_name: version for table_name, version, updated_at in rows}
+    # Dzisiejsza data - strony bez parametrów (np. bieżący miesiąc kalendarza) zależą od niej
+    key = [CODE_FINGERPRINT, str(current_user_id()), request.full_path, date.today().isoformat()]
+    key += [f'{table}:{versions.get(table, 0)}' for table in tables]
+    etag = hashlib.sha1('|'.join(key).encode('utf-8')).hexdigest()
+    # Last-Modified uwzględnia to samo co ETag: zmianę danych, początek dzisiejszego dnia
+    # i wdrożenie nowej wersji - klient wysyłający tylko If-Modified-Since nie dostanie
+    # nieaktualnej strony po północy ani po aktualizacji aplikacji
+    start_of_today = datetime.combine(date.today(), datetime.min.time()).astimezone(timezone.utc)
+    updated = [updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+               for table_name, version, updated_at in rows if updated_at]
+    last_modified = max(updated + [start_of_today, CODE_MODIFIED])
+    return etag, last_modified
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+def conditional_page(*tables):
+    """Strona z ETag i Last-Modified z wersji danych `tables`; przy zgodności odpowiedź 304"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Strona z komunikatem flash różni się od zapamiętanej przez przeglądarkę
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            etag, last_modified = page_validators(tables)
+            if not_modified(etag, last_modified):
+                response = current_app.response_class(status=304, mimetype='text/html')
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            # Przeglądarka może zapamiętać stronę, ale musi ją za każdym razem zweryfikować
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+# Kompresja gzip odpowiedzi tekstowych (HTML, JSON, CSS, JS). Skompresowana odpowiedź ma
+# ETag z przyrostkiem -gzip (jak mod_deflate), usuwanym z If-None-Match przed obsługą żądania
+COMPRESSIBLE_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+                          'application/javascript', 'application/json', 'image/svg+xml'}
+GZIP_ETAG_SUFFIX = '-gzip'
+
+@bp.before_app_request
+def strip_gzip_etag_suffix():
+    header = request.environ.get('HTTP_IF_NONE_MATCH')
+    if header and GZIP_ETAG_SUFFIX in header:
+        request.environ['HTTP_IF_NONE_MATCH'] = header.replace(f'{GZIP_ETAG_SUFFIX}"', '"')
+
+@bp.after_app_request
+def compress_response(response):
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip'] or 'Content-Encoding' in response.headers:
+        return response
+
+    if response.status_code == 200:
+        if response.direct_passthrough:
+            # Plik statyczny (send_file) - wczytywany do pamięci tylko, gdy jest niewielki
+            if (response.content_length or 0) > current_app.config['COMPRESS_MAX_FILE_SIZE']:
+                return response
+            response.direct_passthrough = False
+        elif response.is_streamed:
+            return response
+        data = response.get_data()
+        if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(gzip.compress(data, current_app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers.pop('Accept-Ranges', None)
+    elif response.status_code != 304:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag and not etag.endswith(GZIP_ETAG_SUFFIX):
+        response.set_etag(etag + GZIP_ETAG_SUFFIX, weak)
+    return response
+
+# Konta użytkowników - id zalogowanego użytkownika pochodzi z podpisanej sesji (bez zapytania
+# do bazy); trasy spoza PUBLIC_ENDPOINTS wymagają zalogowania
+PUBLIC_ENDPOINTS = {'main.login', 'main.register', 'static', 'main.chart_shared_layout'}
+
+def is_legacy_upload(filename):
+    """Plik statyczny z dawnego folderu zdjęć static/uploads"""
+    return posixpath.normpath(filename).lower().startswith('uploads/')
+
+@bp.before_app_request
+def load_user():
+    # Zdjęcia, które zostały jeszcze w static/uploads, nie są dostępne jako pliki statyczne
+    if request.endpoint == 'static' and is_legacy_upload(request.view_args.get('filename', '')):
+        abort(404)
+    g.user_id = session.get('user_id')
+    if g.user_id is None and request.endpoint not in PUBLIC_ENDPOINTS:
+        if request.path.startswith('/api/'):
+            return jsonify({'error': 'Wymagane zalogowanie'}), 401
+        return redirect(url_for('main.login', next=request.full_path if request.args else request.path))
+
+def safe_next_url(value):
+    """Adres powrotu po zalogowaniu - tylko ścieżki tej aplikacji.
+
+    Przeglądarki traktują `\\` jak `/` (np. `/\\evil.com` jako `//evil.com`) i pomijają znaki
+    sterujące, więc adres sprawdzany jest po zamianie `\\`: bez schematu i hosta, ze ścieżką
+    od jednego `/` (`///evil.com` to także adres hosta)."""
+    if value and not any(ord(char) < 32 for char in value):
+        normalized = value.replace('\\', '/')
+        parts = urlsplit(normalized)
+        if not parts.scheme and not parts.netloc and normalized.startswith('/') and not normalized.startswith('//'):
+            return value
+    return url_for('main.index')
+
+def log_in(user):
+    session.clear()
+    session['user_id'] = user.id
+    session['username'] = user.username
+
+PERSONAL_CHART_COLUMNS = ('date', 'weight', 'height', 'body_fat', 'muscle_mass')
+SUMMARY_COUNTER_COLUMNS = ('calories', 'calories_count', 'water_ml', 'workout_minutes', 'workout_count',
+                           'timed_workout_count', 'breakfast_count', 'lunch_count', 'dinner_count', 'snack_count',
+                           'other_meal_count')
+SUMMARY_CHART_COLUMNS = ('date',) + SUMMARY_COUNTER_COLUMNS
+MEAL_COUNT_COLUMNS = tuple(MEAL_TYPE_COLUMNS.values()) + ('other_meal_count',)
+
+def filter_date_range(query, column, date_from=None, date_to=None):
+    if date_from:
+        query = query.filter(column >= date_from)
+    if date_to:
+        query = query.filter(column <= date_to)
+    return query
+
+def parse_date_arg(name):
+    """Data RRRR-MM-DD z parametru zapytania (None, gdy brak); ValueError przy złym formacie"""
+    value = request.args.get(name)
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def encode_cursor(entry):
+    return f'{entry.date.isoformat()}_{entry.id}'
+
+def decode_cursor(cursor):
+    day, _, entry_id = cursor.partition('_')
+    return datetime.strptime(day, '%Y-%m-%d').date(), int(entry_id)
+
+def keyset_page(query, model, after=None, before=None, limit=20):
+    """Strona wpisów od najnowszych, stronicowana po (date, id) zamiast OFFSET.
+
+    Zwraca (wpisy, kursor poprzedniej strony, kursor następnej strony)."""
+    key = tuple_(model.date, model.id)
+    if before:
+        rows = query.filter(key > decode_cursor(before))\
+            .order_by(model.date, model.id).limit(limit + 1).all()
+        entries = rows[:limit][::-1]
+        has_previous, has_next = len(rows) > limit, True
+    else:
+        if after:
+            query = query.filter(key < decode_cursor(after))
+        rows = query.order_by(model.date.desc(), model.id.desc()).limit(limit + 1).all()
+        entries = rows[:limit]
+        has_previous, has_next = after is not None, len(rows) > limit
+
+    previous_cursor = encode_cursor(entries[0]) if entries and has_previous else None
+    next_cursor = encode_cursor(entries[-1]) if entries and has_next else None
+    return entries, previous_cursor, next_cursor
+
+def listing_args(filter_names, default_limit):
+    """Filtry, kursory i rozmiar strony listy wpisów; ValueError przy złych parametrach"""
+    filters = {name: request.args.get(name, '').strip() for name in filter_names}
+    filters = {name: value for name, value in filters.items() if value}
+    args = {
+        'filters': filters,
+        'date_from': parse_date_arg('from'),
+        'date_to': parse_date_arg('to'),
+        'after': request.args.get('after') or None,
+        'before': request.args.get('before') or None,
+        'limit': max(1, min(int(request.args.get('limit') or default_limit), 100)),
+    }
+    for cursor in (args['after'], args['before']):
+        if cursor:
+            decode_cursor(cursor)
+    return args
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def sport_listing(args):
+    query = filter_date_range(user_query(SportEntry), SportEntry.date, args['date_from'], args['date_to'])
+    if args['filters'].get('activity'):
+        query = query.filter(SportEntry.activity.ilike(escape_like(args['filters']['activity']) + '%',
+                                                       escape='\\'))
+    return keyset_page(query, SportEntry, args['after'], args['before'], args['limit'])
+
+def nutrition_listing(args):
+    query = filter_date_range(user_query(NutritionEntry), NutritionEntry.date, args['date_from'], args['date_to'])
+    if args['filters'].get('meal_type'):
+        query = query.filter(NutritionEntry.meal_type == args['filters']['meal_type'])
+    return keyset_page(query, NutritionEntry, args['after'], args['before'], args['limit'])
+
+def entry_to_dict(table, entry):
+    return {name: exporter.to_text(getattr(entry, name)) for name, kind in EXPORT_COLUMNS[table]}
+
+def search_entries(phrase, kind=None, limit=20, offset=0):
+    """Wyniki wyszukiwania w kolejności trafności: lista (rodzaj, wpis)"""
+    found = search.search(db.session, current_user_id(), phrase, kind, limit, offset)
+    ids = defaultdict(list)
+    for entry_kind, entry_id, score in found:
+        ids[entry_kind].append(entry_id)
+    entries = {}
+    for entry_kind, entry_ids in ids.items():
+        model = IMPORT_MODELS[entry_kind]
+        entries.update(((entry_kind, entry.id), entry) for entry in user_query(model).filter(model.id.in_(entry_ids)))
+    return [(entry_kind, entries[entry_kind, entry_id]) for entry_kind, entry_id, score in found
+            if (entry_kind, entry_id) in entries]
+
+def search_args():
+    """Parametry wyszukiwania (q, kind, limit, offset); ValueError przy złych wartościach"""
+    kind = request.args.get('kind') or None
+    if kind and kind not in search.SOURCES:
+        raise ValueError(kind)
+    return {
+        'phrase': request.args.get('q', '').strip(),
+        'kind': kind,
+        'limit': max(1, min(int(request.args.get('limit') or 20), 100)),
+        'offset': max(0, int(request.args.get('offset') or 0)),
+    }
+
+def to_columns(rows, names):
+    """Zamienia listę krotek na słownik kolumn (nazwa -> krotka wartości)"""
+    if not rows:
+        return {name: () for name in names}
+    return dict(zip(names, zip(*rows)))
+
+def nutrition_summary_delta(meal_type, calories, water_ml, sign=1):
+    return {
+        'calories': sign * (calories or 0),
+        'calories_count': sign if calories is not None else 0,
+        'water_ml': sign * (water_ml or 0),
+        MEAL_TYPE_COLUMNS.get(meal_type, 'other_meal_count'): sign,
+    }
+
+def sport_summary_delta(duration, sign=1):
+    return {'workout_minutes': sign * (duration or 0), 'workout_count': sign,
+            'timed_workout_count': sign if duration is not None else 0}
+
+def apply_summary_deltas(deltas):
+    """Nanosi zmiany {dzień: {kolumna: zmiana}} na podsumowania użytkownika.
+
+    Zmiany dodawane są w SQL (upsert `kolumna = kolumna + zmiana`), a nie odczytem i zapisem
+    w Pythonie - przyrost zatwierdzony między nimi przez inne żądanie albo wątek zapisu
+    próbek nie zostanie nadpisany. Jedno zapytanie na paczkę dni."""
+    user_id = current_user_id()
+    table = DailySummary.__table__
+    rows = [dict(dict.fromkeys(SUMMARY_COUNTER_COLUMNS, 0), user_id=user_id, date=day, **delta)
+            for day, delta in deltas.items()]
+    for chunk in batched(rows, 500):
+        statement = sqlite_insert(table)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.date],
+            set_={column: table.c[column] + statement.excluded[column] for column in SUMMARY_COUNTER_COLUMNS},
+        ), chunk)
+    # Dni bez treningów i posiłków nie mają podsumowania
+    meal_count = sum(table.c[column] for column in MEAL_COUNT_COLUMNS)
+    for days in batched(list(deltas), 500):
+        db.session.execute(table.delete().where(
+            table.c.user_id == user_id, table.c.date.in_(days), table.c.workout_count == 0, meal_count == 0))
+    # Postęp i serie celów - tylko okresy zmienionych dni
+    goals.refresh_days(db.session, user_id, deltas)
+
+def update_summary_nutrition(day, meal_type, calories, water_ml, sign=1):
+    """Dolicza (sign=1) lub odejmuje (sign=-1) posiłek w podsumowaniu dnia"""
+    apply_summary_deltas({day: nutrition_summary_delta(meal_type, calories, water_ml, sign)})
+
+def update_summary_sport(day, duration, sign=1):
+    """Dolicza (sign=1) lub odejmuje (sign=-1) trening w podsumowaniu dnia"""
+    apply_summary_deltas({day: sport_summary_delta(duration, sign)})
+
+def rebuild_daily_summary(user_id=None):
+    """Przelicza od zera podsumowania jednego użytkownika albo (user_id=None) wszystkich"""
+    from sqlalchemy import func, case
+
+    days = {}
+
+    def row_for(owner, day):
+        if (owner, day) not in days:
+            days[owner, day] = dict(user_id=owner, date=day, **dict.fromkeys(SUMMARY_COUNTER_COLUMNS, 0))
+        return days[owner, day]
+
+    def owned(query, model):
+        if user_id is None:
+            return query.filter(model.user_id.isnot(None))
+        return query.filter(model.user_id == user_id)
+
+    known_types = list(MEAL_TYPE_COLUMNS)
+    meal_sums = [func.sum(case((NutritionEntry.meal_type == meal_type, 1), else_=0))
+                 for meal_type in known_types]
+    nutrition_rows = owned(db.session.query(
+        NutritionEntry.user_id,
         NutritionEntry.date,
-        func.sum(NutritionEntry.water_ml).label('total_water')
-    ).filter(NutritionEntry.water_ml > 0)\
-     .group_by(NutritionEntry.date)\
-     .order_by(NutritionEntry.date)\
-     .all()
-    
-    if not water_by_day:
-        return None
-    
-    dates = [entry.date for entry in water_by_day]
-    water = [entry.total_water for entry in water_by_day]
-    
-    fig = go.Figure(data=go.Bar(x=dates, y=water, marker_color='lightblue'))
-    fig.update_layout(
-        title='Dzienne Spożycie Wody',
-        xaxis_title='Data',
-        yaxis_title='Woda (ml)',
-        height=400
-    )
-    
-    fig.add_hline(y=2000, line_dash="dash", line_color="blue", 
-                  annotation_text="Zalecane: 2000ml")
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        func.coalesce(func.sum(NutritionEntry.calories), 0),
+        func.count(NutritionEntry.calories),
+        func.coalesce(func.sum(NutritionEntry.water_ml), 0),
+        func.count(NutritionEntry.id),
+        *meal_sums
+    ), NutritionEntry).group_by(NutritionEntry.user_id, NutritionEntry.date).all()
 
-def create_activity_chart():
-    """Wykres aktywności sportowej (czas treningu)"""
-    from sqlalchemy import func
-    
-    # Grupowanie aktywności po dniach
-    activity_by_day = db.session.query(
+    for owner, day, calories, calories_count, water_ml, total, *meal_counts in nutrition_rows:
+        row = row_for(owner, day)
+        row['calories'] = calories
+        row['calories_count'] = calories_count
+        row['water_ml'] = water_ml
+        for meal_type, count in zip(known_types, meal_counts):
+            row[MEAL_TYPE_COLUMNS[meal_type]] = count
+        row['other_meal_count'] = total - sum(meal_counts)
+
+    sport_rows = owned(db.session.query(
+        SportEntry.user_id,
         SportEntry.date,
-        func.sum(SportEntry.duration).label('total_duration'),
-        func.count(SportEntry.id).label('workout_count')
-    ).filter(SportEntry.duration.isnot(None))\
-     .group_by(SportEntry.date)\
-     .order_by(SportEntry.date)\
-     .all()
-    
-    if not activity_by_day:
+        func.coalesce(func.sum(SportEntry.duration), 0),
+        func.count(SportEntry.id),
+        func.count(SportEntry.duration)
+    ), SportEntry).group_by(SportEntry.user_id, SportEntry.date).all()
+
+    for owner, day, minutes, count, timed_count in sport_rows:
+        row = row_for(owner, day)
+        row['workout_minutes'] = minutes
+        row['workout_count'] = count
+        row['timed_workout_count'] = timed_count
+
+    # Wersje danych zmieniają się także u użytkowników, którym podsumowania zniknęły
+    owners = {owner for owner, day in days}
+    summaries = db.session.query(DailySummary)
+    if user_id is None:
+        owners.update(owner for (owner,) in db.session.query(DailySummary.user_id).distinct())
+    else:
+        owners.add(user_id)
+        summaries = summaries.filter(DailySummary.user_id == user_id)
+    summaries.delete(synchronize_session=False)
+    if days:
+        db.session.execute(DailySummary.__table__.insert(), list(days.values()))
+    for owner in owners:
+        goals.rebuild_user(db.session, owner)
+        bump_data_version('sport_entry', owner)
+        bump_data_version('nutrition_entry', owner)
+    db.session.commit()
+    return len(days)
+
+def ensure_daily_summary():
+    """Wypełnia pustą tabelę podsumowań, jeśli w bazie są już wpisy"""
+    if DailySummary.query.first() is None and (
+            SportEntry.query.first() is not None or NutritionEntry.query.first() is not None):
+        rebuild_daily_summary()
+
+# Tabele pochodne - w starszym schemacie (np. klucz bez user_id sprzed kont albo brak
+# nowych liczników podsumowań) odtwarzane od zera
+PER_USER_DERIVED_TABLES = (DataVersion, DailySummary)
+
+def claim_orphaned_entries(user_id):
+    """Przypisuje użytkownikowi wpisy bez właściciela (z bazy sprzed kont); zwraca ich liczbę"""
+    claimed = 0
+    for model in IMPORT_MODELS.values():
+        claimed += db.session.query(model).filter(model.user_id.is_(None))\
+            .update({model.user_id: user_id}, synchronize_session=False)
+    if claimed:
+        rebuild_daily_summary(user_id)
+    db.session.commit()
+    return claimed
+
+def outdated_tables(inspector, models):
+    """Istniejące tabele `models` bez którejś z kolumn modelu (np. user_id w bazie sprzed kont)"""
+    return list(dict.fromkeys(table for table, column in missing_columns(inspector, models)))
+
+def missing_columns(inspector, models):
+    """Kolumny modeli `models` brakujące w istniejących tabelach: [(tabela, kolumna)]"""
+    missing = []
+    for model in models:
+        table = model.__table__
+        if inspector.has_table(table.name):
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            missing += [(table, column) for column in table.columns if column.name not in existing]
+    return missing
+
+def add_column_sql(table, column):
+    dialect = db.engine.dialect
+    quote = dialect.identifier_preparer.quote
+    sql = f'ALTER TABLE {table.name} ADD COLUMN {quote(column.name)} {column.type.compile(dialect)}'
+    for foreign_key in column.foreign_keys:
+        sql += f' REFERENCES {quote(foreign_key.column.table.name)} ({foreign_key.column.name})'
+    return sql
+
+def index_changes(inspector):
+    """Indeksy istniejących tabel do usunięcia (zastąpione nowymi) i do utworzenia"""
+    stale, missing = [], []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        # Indeksy zastąpione nowymi (np. po dacie -> po użytkowniku i dacie)
+        expected = {index.name for index in table.indexes}
+        stale += [index['name'] for index in inspector.get_indexes(table.name)
+                  if index['name'].startswith('ix_') and index['name'] not in expected]
+        missing += [index for index in table.indexes if not inspector.has_index(table.name, index.name)]
+    return stale, missing
+
+def pending_schema_changes():
+    """Zmiany, które wykonałoby upgrade_database(); pusta lista, gdy schemat jest aktualny"""
+    from sqlalchemy import inspect
+
+    inspector = inspect(db.engine)
+    changes = [f'odtworzenie tabeli {table.name} (brakujące kolumny)'
+               for table in outdated_tables(inspector, PER_USER_DERIVED_TABLES)]
+    changes += [f'kolumna {table.name}.{column.name}'
+                for table, column in missing_columns(inspector, IMPORT_MODELS.values())]
+    changes += [f'tabela {table.name}' for table in db.metadata.sorted_tables if not inspector.has_table(table.name)]
+    stale, missing = index_changes(inspector)
+    changes += [f'usunięcie indeksu {name}' for name in stale]
+    changes += [f'indeks {index.name}' for index in missing]
+    if db.engine.dialect.name == 'sqlite' and not (search.has_index(db.session) and search.is_current(db.session)):
+        changes.append(f'indeks wyszukiwania {search.INDEX_TABLE}')
+    return changes
+
+def upgrade_database():
+    """Tworzy brakujące tabele, kolumny i indeksy (także w istniejących bazach danych)"""
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in outdated_tables(inspector, PER_USER_DERIVED_TABLES):
+            table.drop(connection)
+        for table, column in missing_columns(inspector, IMPORT_MODELS.values()):
+            connection.execute(text(add_column_sql(table, column)))
+
+    db.create_all()
+    stale, missing = index_changes(inspect(db.engine))
+    with db.engine.begin() as connection:
+        for name in stale:
+            connection.execute(text(f'DROP INDEX {name}'))
+    for index in missing:
+        index.create(db.engine)
+    ensure_daily_summary()
+    if db.engine.dialect.name == 'sqlite':
+        search.ensure_index(db.session)
+        db.session.commit()
+    owner = db.session.query(User.id).order_by(User.id).first()
+    if owner is not None:
+        claim_orphaned_entries(owner.id)
+    return [index.name for index in missing]
+
+# Bez poleceń init-db / upgrade-db schemat aktualizowany jest przy pierwszym żądaniu
+# (AUTO_UPGRADE_DB) - sam start procesu, np. workera WSGI, nie łączy się z bazą
+_schema_lock = threading.Lock()
+
+@bp.before_app_request
+def upgrade_database_once():
+    state = current_app.extensions.setdefault('dziennik_schema', {'upgraded': False})
+    if state['upgraded'] or not current_app.config['AUTO_UPGRADE_DB']:
+        return
+    with _schema_lock:
+        if not state['upgraded']:
+            upgrade_database()
+            state['upgraded'] = True
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Tworzy schemat nowej bazy danych (tabele, indeksy, indeks wyszukiwania)."""
+    from sqlalchemy import inspect
+
+    existing = [table.name for table in db.metadata.sorted_tables if inspect(db.engine).has_table(table.name)]
+    if existing:
+        raise click.ClickException(f'Baza danych zawiera już tabele ({", ".join(existing)}) - użyj upgrade-db')
+    upgrade_database()
+    print(f'Utworzono bazę danych: {db.engine.url.render_as_string(hide_password=True)}')
+
+@bp.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Aktualizuje schemat bazy danych (tabele, indeksy, podsumowania)."""
+    created = upgrade_database()
+    print(f'Utworzono indeksy: {", ".join(created)}' if created else 'Schemat jest aktualny.')
+
+@bp.cli.command('db-status')
+def db_status_command():
+    """Pokazuje zmiany schematu czekające na upgrade-db (kod wyjścia 1, gdy są)."""
+    changes = pending_schema_changes()
+    for change in changes:
+        print(f'- {change}')
+    if changes:
+        raise SystemExit(1)
+    print('Schemat jest aktualny.')
+
+@bp.cli.command('check-query-plans')
+@click.option('--user', 'username', help='Użytkownik, jako który wywoływane są trasy (domyślnie pierwsze konto).')
+def check_query_plans_command(username):
+    """Sprawdza plany zapytań wszystkich tras (EXPLAIN QUERY PLAN) - błąd przy pełnym skanie tabeli."""
+    from query_plans import check_query_plans, default_urls
+
+    upgrade_database()
+    # Sprawdzane są zapytania tras - bez aktualizacji schematu przy pierwszym żądaniu
+    current_app.extensions['dziennik_schema'] = {'upgraded': True}
+    user_id = use_cli_user(username)
+    chart_cache.clear()
+    chart_names = [name[:-len('_chart')] for name in CHART_SOURCES]
+    failures = check_query_plans(current_app._get_current_object(), db, default_urls(chart_names), user_id)
+    for url, statement, detail in failures:
+        print(f'{url}: {detail}\n    {statement}')
+    if failures:
+        raise SystemExit(1)
+    print('Wszystkie zapytania korzystają z indeksów.')
+
+def use_cli_user(username=None):
+    """Ustawia użytkownika poleceń CLI (domyślnie pierwsze konto); zwraca jego id"""
+    query = User.query.filter_by(username=username) if username else User.query.order_by(User.id)
+    user = query.first()
+    if user is None:
+        raise click.ClickException(f'Nie ma użytkownika {username}' if username
+                                   else 'Brak kont - utwórz je poleceniem create-user')
+    g.user_id = user.id
+    return user.id
+
+def create_user(username, password):
+    """Zakłada konto; pierwsze konto przejmuje wpisy sprzed kont. ValueError, gdy nazwa jest zajęta"""
+    if User.query.filter_by(username=username).first() is not None:
+        raise ValueError('Nazwa użytkownika jest zajęta!')
+    user = User(username=username, password_hash=generate_password_hash(password))
+    db.session.add(user)
+    db.session.commit()
+    if user.id == db.session.query(db.func.min(User.id)).scalar():
+        claim_orphaned_entries(user.id)
+    return user
+
+@bp.cli.command('create-user')
+@click.argument('username')
+@click.password_option()
+def create_user_command(username, password):
+    """Zakłada konto użytkownika."""
+    upgrade_database()
+    try:
+        user = create_user(username, password)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f'Utworzono użytkownika {user.username} (id {user.id}).')
+
+@bp.cli.command('rebuild-summary')
+def rebuild_summary_command():
+    """Przelicza tabelę dziennych podsumowań na podstawie wszystkich wpisów."""
+    upgrade_database()
+    days = rebuild_daily_summary()
+    print(f'Przeliczono podsumowania dla {days} dni.')
+
+@bp.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Buduje od zera indeks wyszukiwania pełnotekstowego."""
+    upgrade_database()
+    entries = search.rebuild_index(db.session)
+    db.session.commit()
+    print(f'Zaindeksowano {entries} wpisów.')
+
+@bp.cli.command('process-photos')
+@click.option('--all', 'process_all', is_flag=True, help='Przetwarza ponownie także zdjęcia z gotowymi wariantami.')
+def process_photos_command(process_all):
+    """Tworzy brakujące miniatury i warianty WebP zdjęć treningów."""
+    filenames = [name for (name,) in db.session.query(SportEntry.photo_filename)
+                 .filter(SportEntry.photo_filename.isnot(None), SportEntry.photo_filename != '')]
+    before = image_pipeline.stats()
+    for filename in filenames:
+        if not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], filename)):
+            continue
+        if process_all or not all(image_pipeline.has_variant(filename, v) for v in VARIANTS):
+            image_pipeline.submit(filename)
+    image_pipeline.wait()
+    stats = image_pipeline.stats()
+    print(f"Przetworzono {stats['processed'] - before['processed']} zdjęć, "
+          f"błędy: {stats['failed'] - before['failed']}.")
+
+def rename_photo(photo):
+    """Przenosi zdjęcie z magazynu pod nazwę ze skrótu jego treści bez metadanych.
+
+    Dotyczy zdjęć zapisanych, zanim metadane były usuwane przy zapisie - ich treść
+    zmieniała się potem, a nazwa nie. Zwraca starą nazwę do usunięcia po commit
+    albo None, gdy nazwa się zgadza.
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    with open(os.path.join(folder, photo.filename), 'rb') as stream:
+        upload = sanitize(folder, spool(folder, stream))
+    digest = upload.hexdigest()
+    if digest == photo.sha256:
+        upload.close()
         return None
-    
-    dates = [entry.date for entry in activity_by_day]
-    durations = [entry.total_duration for entry in activity_by_day]
-    counts = [entry.workout_count for entry in activity_by_day]
-    
-    fig = go.Figure()
-    
-    # Czas treningu (słupki)
-    fig.add_trace(go.Bar(x=dates, y=durations, name='Czas treningu (min)', 
-                        marker_color='green', yaxis='y'))
-    
-    # Liczba treningów (linia)
-    fig.add_trace(go.Scatter(x=dates, y=counts, mode='lines+markers', 
-                            name='Liczba treningów', line=dict(color='red'), yaxis='y2'))
-    
-    fig.update_layout(
-        title='Aktywność Sportowa',
-        xaxis_title='Data',
-        yaxis=dict(title='Czas (minuty)', side='left'),
-        yaxis2=dict(title='Liczba treningów', side='right', overlaying='y'),
-        height=400,
-        legend=dict(x=0, y=1)
-    )
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
 
-def create_meal_distribution_chart():
-    """Wykres rozkładu posiłków"""
-    from sqlalchemy import func
-    
-    # Zliczanie posiłków według typu
-    meal_counts = db.session.query(
-        NutritionEntry.meal_type,
-        func.count(NutritionEntry.id).label('count')
-    ).group_by(NutritionEntry.meal_type).all()
-    
-    if not meal_counts:
+    existing = db.session.get(Photo, digest)
+    if existing is not None:
+        upload.close()
+        existing.ref_count += photo.ref_count
+        filename = existing.filename
+    else:
+        filename = store_upload(folder, upload, os.path.splitext(photo.filename)[1])
+        db.session.add(Photo(sha256=digest, filename=filename, size=upload.size, ref_count=photo.ref_count))
+        image_pipeline.submit(filename)
+    entries = SportEntry.query.filter(SportEntry.photo_filename == photo.filename)
+    for (user_id,) in entries.with_entities(SportEntry.user_id).distinct():
+        bump_data_version(SportEntry.__tablename__, user_id)
+    entries.update({SportEntry.photo_filename: filename}, synchronize_session=False)
+    db.session.delete(photo)
+    return photo.filename
+
+@bp.cli.command('migrate-photos')
+def migrate_photos_command():
+    """Przenosi zdjęcia z dawnego folderu static/uploads i zdjęcia zapisane pod nazwami z datą
+    do magazynu adresowanego treścią oraz zmienia nazwy zdjęć, których treść nie zgadza się
+    już ze skrótem w nazwie."""
+    db.create_all()
+    relocated = move_legacy_uploads()
+    stored = {filename for (filename,) in db.session.query(Photo.filename)}
+    moved = 0
+    for entry in SportEntry.query.filter(SportEntry.photo_filename.isnot(None), SportEntry.photo_filename != ''):
+        old_filename = entry.photo_filename
+        path = os.path.join(current_app.config['UPLOAD_FOLDER'], old_filename)
+        if old_filename in stored or not os.path.exists(path):
+            continue
+        with open(path, 'rb') as stream:
+            entry.photo_filename = store_photo(FileStorage(stream=stream, filename=old_filename))
+        db.session.commit()
+        stored.add(entry.photo_filename)
+        remove_photo(old_filename)
+        moved += 1
+
+    renamed = 0
+    for photo in Photo.query.all():
+        if not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], photo.filename)):
+            continue
+        old_filename = rename_photo(photo)
+        db.session.commit()
+        if old_filename:
+            remove_photo(old_filename)
+            renamed += 1
+    image_pipeline.wait()
+    print(f'Przeniesiono {relocated} plików z {legacy_upload_folder()}, {moved} zdjęć do magazynu, '
+          f'zmieniono nazwy {renamed} zdjęć.')
+
+# Import danych (CSV, JSON Lines, GPX, TCX)
+IMPORT_MODELS = {'sport': SportEntry, 'nutrition': NutritionEntry, 'personal': PersonalData}
+
+# Kolumny identyfikujące duplikat wpisu
+IMPORT_KEYS = {
+    'sport': ('date', 'activity', 'duration'),
+    'nutrition': ('date', 'meal_type', 'food_item', 'calories'),
+    'personal': ('date', 'measured_at', 'weight', 'height', 'body_fat', 'muscle_mass'),
+}
+
+def existing_import_keys(table, days):
+    """Klucze wpisów użytkownika już zapisanych w bazie dla podanych dni"""
+    model = IMPORT_MODELS[table]
+    columns = [getattr(model, column) for column in IMPORT_KEYS[table]]
+    keys = set()
+    for chunk in batched(list(days), 500):
+        keys.update(tuple(row) for row in db.session.query(*columns)
+                    .filter(model.user_id == current_user_id(), model.date.in_(chunk)))
+    return keys
+
+def insert_rows(table, rows, deltas):
+    """Wstawia wiersze wpisów użytkownika (executemany) i dolicza do `deltas` zmiany podsumowań dni"""
+    model = IMPORT_MODELS[table]
+    db.session.execute(model.__table__.insert(), rows)
+    bump_data_version(model.__tablename__)
+    for row in rows:
+        if table == 'sport':
+            deltas[row['date']].update(sport_summary_delta(row['duration']))
+        elif table == 'nutrition':
+            deltas[row['date']].update(nutrition_summary_delta(row['meal_type'], row['calories'], row['water_ml']))
+
+def import_batch(rows_by_table):
+    """Zapisuje paczkę wierszy w jednej transakcji (executemany), pomijając duplikaty"""
+    inserted = Counter()
+    duplicates = 0
+    deltas = defaultdict(Counter)
+
+    try:
+        for table, rows in rows_by_table.items():
+            seen = existing_import_keys(table, {row['date'] for row in rows})
+            new_rows = []
+            for row in rows:
+                key = tuple(row[column] for column in IMPORT_KEYS[table])
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                new_rows.append(dict(row, user_id=current_user_id()))
+
+            if not new_rows:
+                continue
+
+            insert_rows(table, new_rows, deltas)
+            inserted[table] += len(new_rows)
+
+        if deltas:
+            apply_summary_deltas(deltas)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return inserted, duplicates
+
+def import_stream(stream, fmt, table=None, batch_size=1000):
+    """Importuje strumień pliku paczkami; zwraca statystyki importu"""
+    started = time.perf_counter()
+    stats = {'inserted': Counter(), 'duplicates': 0, 'errors': 0, 'messages': [], 'records': 0}
+
+    for batch in batched(iter_records(stream, fmt, table), batch_size):
+        rows_by_table = defaultdict(list)
+        for record_table, record in batch:
+            stats['records'] += 1
+            try:
+                record_table, row = normalize(record_table, record)
+            except ImportDataError as e:
+                stats['errors'] += 1
+                if len(stats['messages']) < 10:
+                    stats['messages'].append(f'Rekord {stats["records"]}: {e}')
+                continue
+            rows_by_table[record_table].append(row)
+
+        inserted, duplicates = import_batch(rows_by_table)
+        stats['inserted'].update(inserted)
+        stats['duplicates'] += duplicates
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['rows_per_second'] = stats['records'] / stats['seconds'] if stats['seconds'] else 0.0
+    stats['inserted'] = dict(stats['inserted'])
+    return stats
+
+def format_import_stats(stats):
+    inserted = ', '.join(f'{table}: {count}' for table, count in stats['inserted'].items()) or '0'
+    return (f'Zaimportowano ({inserted}), duplikaty: {stats["duplicates"]}, '
+            f'błędy: {stats["errors"]}, {stats["records"]} rekordów w {stats["seconds"]:.2f} s '
+            f'({stats["rows_per_second"]:.0f} rekordów/s)')
+
+@bp.cli.command('import-data')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Format pliku (domyślnie z rozszerzenia).')
+@click.option('--table', type=click.Choice(list(IMPORT_MODELS)), help='Tabela docelowa dla CSV/JSONL.')
+@click.option('--batch-size', default=1000, show_default=True, help='Liczba rekordów w jednej transakcji.')
+@click.option('--user', 'username', help='Właściciel wpisów (domyślnie pierwsze konto).')
+def import_data_command(paths, fmt, table, batch_size, username):
+    """Importuje wpisy z plików CSV, JSON Lines, GPX lub TCX."""
+    upgrade_database()
+    use_cli_user(username)
+    for path in paths:
+        try:
+            with open(path, 'rb') as stream:
+                stats = import_stream(stream, fmt or detect_format(path), table, batch_size)
+        except ImportDataError as e:
+            raise click.ClickException(f'{path}: {e}')
+        print(f'{path}: {format_import_stats(stats)}')
+        for message in stats['messages']:
+            print(f'  {message}')
+
+# Próbki z urządzeń - /api/ingest sprawdza je i dopisuje do ingest_queue, a wątek
+# zapisujący zatwierdza je paczkami (jedna transakcja na paczkę, także dla wielu kont;
+# paczkę z błędem kolejka zapisuje połowami, aż zostaną same wadliwe próbki)
+def write_ingest_batch(app, items):
+    """Zapisuje paczkę próbek (id użytkownika, tabela, wiersz) z kolejki w jednej transakcji"""
+    rows = defaultdict(lambda: defaultdict(list))
+    for user_id, table, row in items:
+        rows[user_id][table].append(dict(row, user_id=user_id))
+
+    with app.app_context():
+        try:
+            for user_id, tables in rows.items():
+                g.user_id = user_id
+                deltas = defaultdict(Counter)
+                for table, table_rows in tables.items():
+                    insert_rows(table, table_rows, deltas)
+                if deltas:
+                    apply_summary_deltas(deltas)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+def parse_samples(samples):
+    """Sprawdza próbki żądania; zwraca (wiersze do kolejki, błędy z numerami próbek)"""
+    items = []
+    errors = []
+    for index, sample in enumerate(samples):
+        try:
+            if not isinstance(sample, dict):
+                raise ImportDataError('Próbka musi być obiektem JSON')
+            table, row = normalize(sample.get('table'), sample)
+        except ImportDataError as e:
+            errors.append({'index': index, 'error': str(e)})
+            continue
+        items.append((current_user_id(), table, row))
+    return items, errors
+
+# Kompaktowanie pomiarów - stare próbki z urządzeń przenoszone do agregatów (retention.py)
+def compact_personal_data(today=None):
+    """Kompaktuje pomiary wszystkich kont (transakcja na konto); zwraca łączne liczby
+    przeniesionych wierszy {'raw': ..., 'hourly': ...}"""
+    today = today or date.today()
+    totals = Counter()
+    for (user_id,) in db.session.query(User.id).order_by(User.id).all():
+        try:
+            moved = retention.compact(db.session, user_id, today, current_app.config['PERSONAL_RAW_DAYS'],
+                                      current_app.config['PERSONAL_HOURLY_DAYS'])
+            if any(moved.values()):
+                bump_data_version('personal_data', user_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        totals.update(moved)
+    return {'raw': totals['raw'], 'hourly': totals['hourly']}
+
+def run_compaction(app, interval, stop):
+    """Wątek serwera: kompaktowanie od razu po starcie, potem co `interval` sekund"""
+    while True:
+        with app.app_context():
+            try:
+                moved = compact_personal_data()
+                if any(moved.values()):
+                    app.logger.info('Kompaktowanie pomiarów: %(raw)d próbek, %(hourly)d agregatów godzinowych', moved)
+            except Exception:
+                app.logger.exception('Kompaktowanie pomiarów nie powiodło się')
+        if stop.wait(interval):
+            return
+
+@bp.cli.command('compact-data')
+@click.option('--today', type=click.DateTime(formats=['%Y-%m-%d']), help='Dzień, od którego liczone są okresy (domyślnie dziś).')
+def compact_data_command(today):
+    """Przenosi stare pomiary z urządzeń do agregatów godzinowych i dziennych."""
+    upgrade_database()
+    started = time.perf_counter()
+    moved = compact_personal_data(today and today.date())
+    print(f'Próbki -> agregaty godzinowe: {moved["raw"]}, agregaty godzinowe -> dzienne: {moved["hourly"]} '
+          f'({time.perf_counter() - started:.1f} s)')
+
+def insert_synthetic(years=5, multiplier=1, seed=42, end=None, user_id=None):
+    """Wypełnia bazę danymi z generatora synthetic.py (domyślnie dla zalogowanego użytkownika);
+    zwraca liczbę wierszy na tabelę"""
+    user_id = user_id or current_user_id()
+    counts = Counter()
+    for batch in synthetic.generate(years, multiplier, seed, end):
+        for table, rows in batch.items():
+            if rows:
+                for row in rows:
+                    row['user_id'] = user_id
+                db.session.execute(IMPORT_MODELS[table].__table__.insert(), rows)
+                counts[table] += len(rows)
+        db.session.commit()
+    rebuild_daily_summary(user_id)
+    bump_data_version('personal_data', user_id)
+    db.session.commit()
+    return dict(counts)
+
+@bp.cli.command('serve')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=5001, show_default=True)
+@click.option('--threads', default=8, show_default=True, help='Liczba wątków obsługujących żądania.')
+@click.option('--chart-workers', type=int, help='Liczba procesów budujących wykresy (domyślnie CHART_WORKERS albo liczba rdzeni).')
+def serve_command(host, port, threads, chart_workers):
+    """Uruchamia serwer produkcyjny (waitress z pulą wątków i pulą procesów wykresów)."""
+    from waitress import serve
+
+    upgrade_database()
+    if chart_workers is None:
+        chart_workers = current_app.config['CHART_WORKERS'] or os.cpu_count() or 1
+    current_app.config['CHART_WORKERS'] = chart_workers
+    print(f'Serwer http://{host}:{port} - wątki: {threads}, procesy wykresów: {chart_workers}')
+    # SIGTERM kończy serwer tak jak Ctrl+C - z zamknięciem procesów puli wykresów
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    stop_compaction = threading.Event()
+    if current_app.config['PERSONAL_COMPACT_INTERVAL'] > 0:
+        threading.Thread(target=run_compaction, name='compaction', daemon=True,
+                         args=(current_app._get_current_object(), current_app.config['PERSONAL_COMPACT_INTERVAL'],
+                               stop_compaction)).start()
+    try:
+        serve(current_app._get_current_object(), host=host, port=port, threads=threads)
+    finally:
+        stop_compaction.set()
+        ingest_queue.close()
+        shutdown_chart_executor()
+
+@bp.cli.command('generate-data')
+@click.option('--scale', type=click.Choice(list(synthetic.SCALES)), help='Gotowy rozmiar (lata i mnożnik).')
+@click.option('--years', default=5, show_default=True, help='Liczba lat historii.')
+@click.option('--multiplier', default=1, show_default=True, help='Mnożnik liczby wpisów dziennie.')
+@click.option('--seed', default=42, show_default=True, help='Ziarno generatora.')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Ostatni dzień danych (domyślnie dziś).')
+@click.option('--user', 'username', help='Właściciel wpisów (domyślnie pierwsze konto).')
+def generate_data_command(scale, years, multiplier, seed, end, username):
+    """Dodaje do bazy syntetyczne wpisy z wielu lat (deterministycznie dla danego ziarna)."""
+    upgrade_database()
+    use_cli_user(username)
+    if scale:
+        years, multiplier = synthetic.SCALES[scale]
+    started = time.perf_counter()
+    counts = insert_synthetic(years, multiplier, seed, end and end.date())
+    print(', '.join(f'{table}: {count}' for table, count in counts.items())
+          + f' ({time.perf_counter() - started:.1f} s)')
+
+# Eksport danych - kolumny i ich typy (dla formatu kolumnowego)
+EXPORT_COLUMNS = {
+    'sport': (('id', 'int'), ('date', 'date'), ('activity', 'str'), ('duration', 'int'),
+              ('notes', 'str'), ('photo_filename', 'str'), ('created_at', 'timestamp')),
+    'nutrition': (('id', 'int'), ('date', 'date'), ('meal_type', 'str'), ('food_item', 'str'),
+                  ('quantity', 'str'), ('calories', 'int'), ('water_ml', 'int'), ('notes', 'str'),
+                  ('created_at', 'timestamp')),
+    'personal': (('id', 'int'), ('date', 'date'), ('measured_at', 'timestamp'), ('weight', 'float'),
+                 ('height', 'float'), ('body_fat', 'float'), ('muscle_mass', 'float'), ('notes', 'str'),
+                 ('created_at', 'timestamp')),
+}
+
+def iter_export_partitions(table, date_from=None, date_to=None, batch_size=1000):
+    """Paczki wierszy tabeli czytane kursorem strumieniowym (filtry wykonywane w SQL)"""
+    model = IMPORT_MODELS[table]
+    columns = [getattr(model, name) for name, kind in EXPORT_COLUMNS[table]]
+    query = filter_date_range(db.select(*columns).where(model.user_id == current_user_id()),
+                              model.date, date_from, date_to)
+    result = db.session.execute(query.order_by(model.date, model.id)
+                                .execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        yield [tuple(row) for row in rows]
+
+def iter_export(tables, fmt, date_from=None, date_to=None):
+    """Generator fragmentów pliku eksportu dla wybranych tabel"""
+    if fmt == 'csv' and len(tables) != 1:
+        raise ValueError('Eksport CSV obejmuje dokładnie jedną tabelę')
+    if fmt == 'columnar':
+        yield exporter.MAGIC
+
+    for table in tables:
+        names = [name for name, kind in EXPORT_COLUMNS[table]]
+        partitions = iter_export_partitions(table, date_from, date_to)
+        if fmt == 'csv':
+            yield from exporter.iter_csv(names, partitions)
+        elif fmt == 'ndjson':
+            yield from exporter.iter_ndjson(table, names, partitions)
+        else:
+            types = [kind for name, kind in EXPORT_COLUMNS[table]]
+            yield from exporter.iter_columnar(table, names, types, partitions)
+
+    if fmt == 'columnar':
+        yield exporter.END_MARKER
+
+@bp.cli.command('export-data')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(list(EXPORT_COLUMNS)),
+              help='Tabela do eksportu (można podać kilka razy, domyślnie wszystkie).')
+@click.option('--format', 'fmt', default='ndjson', show_default=True, type=click.Choice(exporter.FORMATS))
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), help='Data początkowa.')
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), help='Data końcowa.')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Plik wynikowy (domyślnie stdout).')
+@click.option('--user', 'username', help='Właściciel wpisów (domyślnie pierwsze konto).')
+def export_data_command(tables, fmt, date_from, date_to, output, username):
+    """Eksportuje wpisy jako CSV, NDJSON lub plik kolumnowy."""
+    use_cli_user(username)
+    tables = list(tables) or list(EXPORT_COLUMNS)
+    try:
+        for chunk in iter_export(tables, fmt, date_from and date_from.date(), date_to and date_to.date()):
+            output.write(chunk)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+def load_chart_data(sources=('personal', 'summary'), date_from=None, date_to=None, max_points=None,
+                    resolution=None):
+    """Pobiera dane do wykresów - jedno zapytanie na tabelę, kolumny zamiast obiektów ORM.
+
+    Pomiary czytane są ze wszystkich poziomów przechowywania (retention.py) w rozdzielczości
+    `resolution`; domyślnie wybranej przez retention.series_resolution()."""
+    data = {}
+
+    if 'personal' in sources:
+        if resolution is None:
+            resolution = retention.series_resolution(db.session, current_user_id(), date_from, date_to, max_points)
+        personal_rows = retention.load_series(db.session, current_user_id(), resolution, date_from, date_to)
+        data['personal'] = to_columns(personal_rows, PERSONAL_CHART_COLUMNS)
+
+    if 'summary' in sources:
+        query = db.session.query(
+            DailySummary.date,
+            DailySummary.calories,
+            DailySummary.calories_count,
+            DailySummary.water_ml,
+            DailySummary.workout_minutes,
+            DailySummary.workout_count,
+            DailySummary.timed_workout_count,
+            DailySummary.breakfast_count,
+            DailySummary.lunch_count,
+            DailySummary.dinner_count,
+            DailySummary.snack_count,
+            DailySummary.other_meal_count
+        )
+        query = filter_date_range(query.filter(DailySummary.user_id == current_user_id()),
+                                  DailySummary.date, date_from, date_to)
+        summary_rows = query.order_by(DailySummary.date).all()
+        data['summary'] = to_columns(summary_rows, SUMMARY_CHART_COLUMNS)
+        data['goals'] = goals.daily_targets(db.session, current_user_id())
+
+    return data
+
+# Źródło danych wykresu i tabela, od której wersji zależy
+CHART_SOURCES = {
+    'weight_chart': ('personal', 'personal_data'),
+    'bmi_chart': ('personal', 'personal_data'),
+    'body_composition_chart': ('personal', 'personal_data'),
+    'calories_chart': ('summary', 'nutrition_entry'),
+    'water_chart': ('summary', 'nutrition_entry'),
+    'activity_chart': ('summary', 'sport_entry'),
+    'meal_distribution_chart': ('summary', 'nutrition_entry'),
+}
+
+# Formaty odpowiedzi /api/charts: pełna figura Plotly albo format zwarty (chart_format.py)
+CHART_FORMATS = ('plotly', 'compact')
+
+# Pula procesów budujących wykresy (CHART_WORKERS > 0), tworzona przy pierwszym użyciu, osobno
+# dla każdej aplikacji. Budowa figur Plotly to czysty Python - wątki blokowałyby się nawzajem na GIL
+_worker_app = None
+
+# Ustawienia aplikacji przekazywane procesom puli
+CHART_WORKER_CONFIG = ('SQLALCHEMY_DATABASE_URI', 'SQLITE_PROFILE', 'CHART_MAX_POINTS')
+
+def init_chart_worker(config):
+    """Start procesu puli: własna aplikacja (bez puli i aktualizacji schematu) i rozgrzany Plotly"""
+    global _worker_app
+    _worker_app = create_app(dict(config, CHART_WORKERS=0, AUTO_UPGRADE_DB=False, PERF_ENABLED=False))
+    import charts
+    charts.warm_up()
+
+def chart_executor():
+    pool = current_app.extensions['dziennik_chart_pool']
+    with pool['lock']:
+        if pool['executor'] is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            config = {name: current_app.config[name] for name in CHART_WORKER_CONFIG}
+            # spawn - procesy nie dziedziczą wątków ani połączeń z bazą serwera
+            pool['executor'] = ProcessPoolExecutor(current_app.config['CHART_WORKERS'],
+                                                   mp_context=multiprocessing.get_context('spawn'),
+                                                   initializer=init_chart_worker, initargs=(config,))
+        return pool['executor']
+
+def shutdown_chart_executor(wait=True):
+    pool = current_app.extensions['dziennik_chart_pool']
+    with pool['lock']:
+        if pool['executor'] is not None:
+            pool['executor'].shutdown(wait=wait, cancel_futures=True)
+        pool['executor'] = None
+
+def build_chart_job(user_id, name, date_from, date_to, max_points, fmt, packed):
+    """Buduje jeden wykres w procesie puli - z własnym kontekstem aplikacji i sesją bazy"""
+    import charts
+
+    with _worker_app.app_context():
+        g.user_id = user_id
+        data = load_chart_data({CHART_SOURCES[name][0]}, date_from, date_to, max_points)
+        return charts.serialize_chart(charts.CHART_BUILDERS[name](data, max_points), fmt, packed)
+
+def build_charts_concurrently(names, date_from, date_to, max_points, fmt, packed):
+    """Wykresy budowane równolegle w puli procesów; None, gdy pula przestała działać"""
+    from concurrent.futures.process import BrokenProcessPool
+
+    try:
+        futures = {name: chart_executor().submit(build_chart_job, current_user_id(), name, date_from,
+                                                 date_to, max_points, fmt, packed)
+                   for name in names}
+        with perf_monitor.span('charts_pool'):
+            return {name: future.result() for name, future in futures.items()}
+    except BrokenProcessPool:
+        current_app.logger.exception('Pula procesów wykresów przestała działać - budowa w wątku żądania')
+        shutdown_chart_executor(wait=False)
         return None
-    
-    meal_types = [entry.meal_type.title() for entry in meal_counts]
-    counts = [entry.count for entry in meal_counts]
-    
-    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8']
-    
-    fig = go.Figure(data=go.Pie(labels=meal_types, values=counts, 
-                               marker=dict(colors=colors)))
-    fig.update_layout(
-        title='Rozkład Rodzajów Posiłków',
-        height=400
-    )
-    
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+def build_charts(names, date_from=None, date_to=None, max_points=None, fmt='plotly', packed=True):
+    """Zwraca JSON wybranych wykresów, budując tylko te, których nie ma w pamięci podręcznej"""
+    versions = get_data_versions()
+    charts = {}
+    missing = {}
+
+    for name in names:
+        source, table_name = CHART_SOURCES[name]
+        # Wykresy podsumowań mają linie celów - wersja celów też jest w kluczu
+        key = (current_user_id(), name, (versions.get(table_name, 0), versions.get('goal', 0)),
+               (date_from, date_to, max_points, fmt, packed))
+        hit, chart = chart_cache.get(*key)
+        if hit:
+            charts[name] = chart
+        else:
+            missing[name] = key
+
+    built = None
+    if missing and current_app.config['CHART_WORKERS'] > 0:
+        built = build_charts_concurrently(missing, date_from, date_to, max_points, fmt, packed)
+    if missing and built is None:
+        from charts import CHART_BUILDERS, serialize_chart
+
+        built = {}
+        with perf_monitor.span('chart_data'):
+            data = load_chart_data({CHART_SOURCES[name][0] for name in missing}, date_from, date_to, max_points)
+        for name in missing:
+            with perf_monitor.span(f'chart_{name[:-len("_chart")]}'):
+                fig = CHART_BUILDERS[name](data, max_points)
+            with perf_monitor.span('serialize'):
+                built[name] = serialize_chart(fig, fmt, packed)
+    for name, key in missing.items():
+        charts[name] = built[name]
+        chart_cache.set(*key, charts[name])
+
+    return charts
+
+# Analizy - serie, które obejmuje raport /api/analytics
+ANALYTICS_SERIES = (('personal', 'weight'), ('summary', 'calories'), ('summary', 'water_ml'))
+
+def build_analytics(date_from=None, date_to=None):
+    """Raport analiz: średnie kroczące, agregacje tygodniowe i miesięczne, korelacja, trend wagi"""
+    versions = get_data_versions()
+    key = (current_user_id(), 'analytics', (versions.get('personal_data', 0), versions.get('nutrition_entry', 0)),
+           (date_from, date_to))
+    hit, report = chart_cache.get(*key)
+    if hit:
+        return report
+
+    import analytics
+
+    # Analizy liczone są na seriach dziennych - pomiary od razu jako średnie dzienne
+    data = load_chart_data(('personal', 'summary'), date_from, date_to, resolution='day')
+    report = {'series': {}}
+    for source, column in ANALYTICS_SERIES:
+        series = analytics.daily_series(data, source, column)
+        report['series'][column] = {
+            'rolling_7': analytics.latest(series.rolling_mean(7)),
+            'rolling_30': analytics.latest(series.rolling_mean(30)),
+            'weekly': analytics.resample_columns(series, 'week'),
+            'monthly': analytics.resample_columns(series, 'month'),
+        }
+
+    weight = analytics.daily_series(data, 'personal', 'weight')
+    report['calorie_weight_correlation'] = analytics.calorie_weight_correlation(
+        analytics.daily_series(data, 'summary', 'calories'), weight)
+
+    trend = analytics.linear_trend(weight)
+    report['weight_trend'] = trend and {
+        'kg_per_week': round(trend['slope_per_week'], 3),
+        'projections': [{'date': str(day), 'weight': round(value, 2)} for day, value in trend['projections']],
+    }
+
+    chart_cache.set(*key, report)
+    return report
+
+# Kalendarz - dane dzienne z tabeli podsumowań (jedno zapytanie po zakresie dat)
+def month_range(year, month):
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return start, end
+
+def parse_month_arg(name='month'):
+    """Miesiąc z parametru żądania w formacie RRRR-MM (domyślnie bieżący)"""
+    value = request.args.get(name)
+    if not value:
+        today = date.today()
+        return today.year, today.month
+    parsed = datetime.strptime(value, '%Y-%m')
+    return parsed.year, parsed.month
+
+def calendar_days(date_from, date_to):
+    """Liczniki i sumy dla każdego dnia z wpisami: {'RRRR-MM-DD': {...}}"""
+    meal_count = (DailySummary.breakfast_count + DailySummary.lunch_count + DailySummary.dinner_count
+                  + DailySummary.snack_count + DailySummary.other_meal_count)
+    rows = db.session.query(
+        DailySummary.date, DailySummary.workout_count, DailySummary.workout_minutes,
+        meal_count, DailySummary.calories, DailySummary.water_ml,
+    ).filter(DailySummary.user_id == current_user_id(), DailySummary.date.between(date_from, date_to))\
+        .order_by(DailySummary.date)
+
+    return {
+        day.isoformat(): {'workouts': workouts, 'workout_minutes': minutes, 'meals': meals,
+                          'calories': calories, 'water_ml': water_ml}
+        for day, workouts, minutes, meals, calories, water_ml in rows
+    }
+
+def calendar_totals(days):
+    return {
+        'active_days': len(days),
+        'workouts': sum(day['workouts'] for day in days.values()),
+        'workout_minutes': sum(day['workout_minutes'] for day in days.values()),
+        'meals': sum(day['meals'] for day in days.values()),
+        'calories': sum(day['calories'] for day in days.values()),
+        'complete_days': sum(1 for day in days.values() if day['workouts'] and day['meals']),
+    }
+
+def calendar_payload(date_from, date_to):
+    days = calendar_days(date_from, date_to)
+    return {'from': date_from.isoformat(), 'to': date_to.isoformat(),
+            'days': days, 'totals': calendar_totals(days)}
+
+# Szczegóły dni - maksymalny zakres jednego żądania /api/days
+DAYS_MAX_RANGE = 62
+
+def load_days(date_from, date_to):
+    """Wpisy wszystkich tabel z zakresu dat pogrupowane po dniach.
+
+    Jedno zapytanie na tabelę niezależnie od długości zakresu; każdy dzień zakresu
+    jest w wyniku, także bez wpisów.
+    """
+    days = {date_from + timedelta(days=i): {table: [] for table in IMPORT_MODELS}
+            for i in range((date_to - date_from).days + 1)}
+    for table, model in IMPORT_MODELS.items():
+        entries = user_query(model).filter(model.date.between(date_from, date_to)).order_by(model.date, model.id)
+        for entry in entries:
+            days[entry.date][table].append(entry)
+    return days
 
 # Trasy
-@app.route('/')
+@bp.route('/')
 def index():
-    return render_template('index.html')
+    # Bieżące serie celów - odczyty po kluczu, bez przeglądania historii wpisów
+    return render_template('index.html', goals=goals.status(db.session, current_user_id(), date.today()))
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        user = User.query.filter_by(username=request.form.get('username', '').strip()).first()
+        if user is None or not check_password_hash(user.password_hash, request.form.get('password', '')):
+            flash('Nieprawidłowa nazwa użytkownika lub hasło!', 'error')
+            return render_template('login.html'), 401
+        log_in(user)
+        return redirect(safe_next_url(request.args.get('next')))
+    
+    return render_template('login.html')
 
-@app.route('/sport')
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form.get('username', '').strip()
+        password = request.form.get('password', '')
+        if not username or len(username) > 80:
+            flash('Nazwa użytkownika jest wymagana (najwyżej 80 znaków)!', 'error')
+            return render_template('register.html')
+        if len(password) < 8:
+            flash('Hasło musi mieć co najmniej 8 znaków!', 'error')
+            return render_template('register.html')
+        
+        try:
+            user = create_user(username, password)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return render_template('register.html')
+        log_in(user)
+        flash('Konto zostało utworzone!', 'success')
+        return redirect(url_for('main.index'))
+    
+    return render_template('register.html')
+
+@bp.route('/logout', methods=['POST'])
+def logout():
+    session.clear()
+    return redirect(url_for('main.login'))
+
+@bp.route('/sport')
+@conditional_page('sport_entry')
 def sport():
-    entries = SportEntry.query.order_by(SportEntry.date.desc()).limit(10).all()
-    return render_template('sport.html', entries=entries)
+    try:
+        args = listing_args(('activity', 'from', 'to'), default_limit=10)
+    except ValueError:
+        flash('Nieprawidłowe parametry filtrowania!', 'error')
+        return redirect(url_for('main.sport'))
+    
+    entries, previous_cursor, next_cursor = sport_listing(args)
+    return render_template('sport.html', entries=entries, filters=args['filters'],
+                         previous_cursor=previous_cursor, next_cursor=next_cursor)
 
-@app.route('/sport/add', methods=['GET', 'POST'])
+@bp.route('/api/sport')
+def sport_api():
+    try:
+        args = listing_args(('activity', 'from', 'to'), default_limit=10)
+    except ValueError:
+        return jsonify({'error': 'Nieprawidłowe parametry filtrowania!'}), 400
+    
+    entries, previous_cursor, next_cursor = sport_listing(args)
+    return jsonify({'entries': [entry_to_dict('sport', entry) for entry in entries],
+                    'previous_cursor': previous_cursor, 'next_cursor': next_cursor})
+
+@bp.route('/sport/add', methods=['GET', 'POST'])
 def add_sport():
     if request.method == 'POST':
         try:
@@ -312,6 +1678,7 @@ def add_sport():
                 return render_template('add_sport.html')
             
             entry = SportEntry(
+                user_id=current_user_id(),
                 date=datetime.strptime(request.form['date'], '%Y-%m-%d').date(),
                 activity=request.form['activity'],
                 duration=int(request.form['duration']) if request.form.get('duration') else None,
@@ -322,25 +1689,17 @@ def add_sport():
             if 'photo' in request.files:
                 file = request.files['photo']
                 if file and file.filename and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    name, ext = os.path.splitext(filename)
-                    filename = f"{timestamp}_{name}{ext}"
-                    
-                    upload_path = os.path.join(app.config['UPLOAD_FOLDER'])
-                    os.makedirs(upload_path, exist_ok=True)
-                    
-                    file_path = os.path.join(upload_path, filename)
-                    file.save(file_path)
-                    entry.photo_filename = filename
+                    entry.photo_filename = store_photo(file)
                 elif file and file.filename and not allowed_file(file.filename):
                     flash('Nieprawidłowy format pliku! Dozwolone: PNG, JPG, JPEG, GIF', 'error')
                     return render_template('add_sport.html')
             
             db.session.add(entry)
+            update_summary_sport(entry.date, entry.duration)
+            bump_data_version('sport_entry')
             db.session.commit()
             flash('Wpis sportowy został dodany!', 'success')
-            return redirect(url_for('sport'))
+            return redirect(url_for('main.sport'))
             
         except ValueError as e:
             flash('Błąd w dacie lub liczbach!', 'error')
@@ -351,9 +1710,9 @@ def add_sport():
     
     return render_template('add_sport.html')
 
-@app.route('/sport/edit/<int:id>', methods=['GET', 'POST'])
+@bp.route('/sport/edit/<int:id>', methods=['GET', 'POST'])
 def edit_sport(id):
-    entry = SportEntry.query.get_or_404(id)
+    entry = user_query(SportEntry).filter(SportEntry.id == id).first_or_404()
     
     if request.method == 'POST':
         try:
@@ -367,39 +1726,32 @@ def edit_sport(id):
                 return render_template('edit_sport.html', entry=entry)
             
             # Aktualizuje dane
+            old_date, old_duration = entry.date, entry.duration
             entry.date = datetime.strptime(request.form['date'], '%Y-%m-%d').date()
             entry.activity = request.form['activity']
             entry.duration = int(request.form['duration']) if request.form.get('duration') else None
             entry.notes = request.form.get('notes', '')
             
             # Obsługa nowego zdjęcia
+            released_photo = None
             if 'photo' in request.files:
                 file = request.files['photo']
                 if file and file.filename and allowed_file(file.filename):
-              
+                    new_filename = store_photo(file)
                     if entry.photo_filename:
-                        old_file_path = os.path.join(app.config['UPLOAD_FOLDER'], entry.photo_filename)
-                        if os.path.exists(old_file_path):
-                            os.remove(old_file_path)
-                    
-                    filename = secure_filename(file.filename)
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    name, ext = os.path.splitext(filename)
-                    filename = f"{timestamp}_{name}{ext}"
-                    
-                    upload_path = os.path.join(app.config['UPLOAD_FOLDER'])
-                    os.makedirs(upload_path, exist_ok=True)
-                    
-                    file_path = os.path.join(upload_path, filename)
-                    file.save(file_path)
-                    entry.photo_filename = filename
+                        released_photo = release_photo(entry.photo_filename)
+                    entry.photo_filename = new_filename
                 elif file and file.filename and not allowed_file(file.filename):
                     flash('Nieprawidłowy format pliku! Dozwolone: PNG, JPG, JPEG, GIF', 'error')
                     return render_template('edit_sport.html', entry=entry)
             
+            update_summary_sport(old_date, old_duration, sign=-1)
+            update_summary_sport(entry.date, entry.duration)
+            bump_data_version('sport_entry')
             db.session.commit()
+            remove_released_photo(released_photo)
             flash('Wpis sportowy został zaktualizowany!', 'success')
-            return redirect(url_for('sport'))
+            return redirect(url_for('main.sport'))
             
         except ValueError as e:
             flash('Błąd w dacie lub liczbach!', 'error')
@@ -410,30 +1762,49 @@ def edit_sport(id):
     
     return render_template('edit_sport.html', entry=entry)
 
-@app.route('/sport/delete/<int:id>', methods=['POST'])
+@bp.route('/sport/delete/<int:id>', methods=['POST'])
 def delete_sport(id):
-    entry = SportEntry.query.get_or_404(id)
+    entry = user_query(SportEntry).filter(SportEntry.id == id).first_or_404()
     
     try:
-        if entry.photo_filename:
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], entry.photo_filename)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        released_photo = release_photo(entry.photo_filename) if entry.photo_filename else None
         
+        update_summary_sport(entry.date, entry.duration, sign=-1)
         db.session.delete(entry)
+        bump_data_version('sport_entry')
         db.session.commit()
+        remove_released_photo(released_photo)
         flash('Wpis sportowy został usunięty!', 'success')
     except Exception as e:
         flash(f'Błąd podczas usuwania: {str(e)}', 'error')
     
-    return redirect(url_for('sport'))
+    return redirect(url_for('main.sport'))
 
-@app.route('/nutrition')
+@bp.route('/nutrition')
+@conditional_page('nutrition_entry')
 def nutrition():
-    entries = NutritionEntry.query.order_by(NutritionEntry.date.desc()).limit(20).all()
-    return render_template('nutrition.html', entries=entries)
+    try:
+        args = listing_args(('meal_type', 'from', 'to'), default_limit=20)
+    except ValueError:
+        flash('Nieprawidłowe parametry filtrowania!', 'error')
+        return redirect(url_for('main.nutrition'))
+    
+    entries, previous_cursor, next_cursor = nutrition_listing(args)
+    return render_template('nutrition.html', entries=entries, filters=args['filters'],
+                         previous_cursor=previous_cursor, next_cursor=next_cursor)
+
+@bp.route('/api/nutrition')
+def nutrition_api():
+    try:
+        args = listing_args(('meal_type', 'from', 'to'), default_limit=20)
+    except ValueError:
+        return jsonify({'error': 'Nieprawidłowe parametry filtrowania!'}), 400
+    
+    entries, previous_cursor, next_cursor = nutrition_listing(args)
+    return jsonify({'entries': [entry_to_dict('nutrition', entry) for entry in entries],
+                    'previous_cursor': previous_cursor, 'next_cursor': next_cursor})
 
-@app.route('/nutrition/add', methods=['GET', 'POST'])
+@bp.route('/nutrition/add', methods=['GET', 'POST'])
 def add_nutrition():
     if request.method == 'POST':
         try:
@@ -451,6 +1822,7 @@ def add_nutrition():
                 return render_template('add_nutrition.html')
             
             entry = NutritionEntry(
+                user_id=current_user_id(),
                 date=datetime.strptime(request.form['date'], '%Y-%m-%d').date(),
                 meal_type=request.form['meal_type'],
                 food_item=request.form['food_item'],
@@ -461,9 +1833,11 @@ def add_nutrition():
             )
             
             db.session.add(entry)
+            update_summary_nutrition(entry.date, entry.meal_type, entry.calories, entry.water_ml)
+            bump_data_version('nutrition_entry')
             db.session.commit()
             flash('Wpis żywieniowy został dodany!', 'success')
-            return redirect(url_for('nutrition'))
+            return redirect(url_for('main.nutrition'))
             
         except ValueError as e:
             flash('Błąd w dacie lub liczbach!', 'error')
@@ -474,9 +1848,9 @@ def add_nutrition():
     
     return render_template('add_nutrition.html')
 
-@app.route('/nutrition/edit/<int:id>', methods=['GET', 'POST'])
+@bp.route('/nutrition/edit/<int:id>', methods=['GET', 'POST'])
 def edit_nutrition(id):
-    entry = NutritionEntry.query.get_or_404(id)
+    entry = user_query(NutritionEntry).filter(NutritionEntry.id == id).first_or_404()
     
     if request.method == 'POST':
         try:
@@ -494,6 +1868,7 @@ def edit_nutrition(id):
                 return render_template('edit_nutrition.html', entry=entry)
             
             # Aktualizuje dane
+            old_values = (entry.date, entry.meal_type, entry.calories, entry.water_ml)
             entry.date = datetime.strptime(request.form['date'], '%Y-%m-%d').date()
             entry.meal_type = request.form['meal_type']
             entry.food_item = request.form['food_item']
@@ -502,9 +1877,12 @@ def edit_nutrition(id):
             entry.water_ml = int(request.form['water_ml']) if request.form.get('water_ml') else 0
             entry.notes = request.form.get('notes', '')
             
+            update_summary_nutrition(*old_values, sign=-1)
+            update_summary_nutrition(entry.date, entry.meal_type, entry.calories, entry.water_ml)
+            bump_data_version('nutrition_entry')
             db.session.commit()
             flash('Wpis żywieniowy został zaktualizowany!', 'success')
-            return redirect(url_for('nutrition'))
+            return redirect(url_for('main.nutrition'))
             
         except ValueError as e:
             flash('Błąd w dacie lub liczbach!', 'error')
@@ -515,43 +1893,33 @@ def edit_nutrition(id):
     
     return render_template('edit_nutrition.html', entry=entry)
 
-@app.route('/nutrition/delete/<int:id>', methods=['POST'])
+@bp.route('/nutrition/delete/<int:id>', methods=['POST'])
 def delete_nutrition(id):
-    entry = NutritionEntry.query.get_or_404(id)
+    entry = user_query(NutritionEntry).filter(NutritionEntry.id == id).first_or_404()
     
     try:
+        update_summary_nutrition(entry.date, entry.meal_type, entry.calories, entry.water_ml, sign=-1)
         db.session.delete(entry)
+        bump_data_version('nutrition_entry')
         db.session.commit()
         flash('Wpis żywieniowy został usunięty!', 'success')
     except Exception as e:
         flash(f'Błąd podczas usuwania: {str(e)}', 'error')
     
-    return redirect(url_for('nutrition'))
+    return redirect(url_for('main.nutrition'))
 
-@app.route('/personal')
+@bp.route('/personal')
+@conditional_page('personal_data', 'sport_entry', 'nutrition_entry')
 def personal():
-    entries = PersonalData.query.order_by(PersonalData.date.desc()).limit(10).all()
-    
-    # Generowanie wszystkich wykresów
-    weight_chart = create_weight_chart()
-    bmi_chart = create_bmi_chart()
-    body_composition_chart = create_body_composition_chart()
-    calories_chart = create_calories_chart()
-    water_chart = create_water_chart()
-    activity_chart = create_activity_chart()
-    meal_distribution_chart = create_meal_distribution_chart()
-    
-    return render_template('personal.html', 
-                         entries=entries, 
-                         weight_chart=weight_chart, 
-                         bmi_chart=bmi_chart,
-                         body_composition_chart=body_composition_chart,
-                         calories_chart=calories_chart,
-                         water_chart=water_chart,
-                         activity_chart=activity_chart,
-                         meal_distribution_chart=meal_distribution_chart)
-
-@app.route('/personal/add', methods=['GET', 'POST'])
+    entries = user_query(PersonalData).order_by(PersonalData.date.desc()).limit(10).all()
+    
+    # Wykresy pobierane są asynchronicznie jednym żądaniem do /api/charts
+    has_charts = bool(entries) or any(user_query(model).first() is not None
+                                      for model in (DailySummary, PersonalHourly, PersonalDaily))
+    
+    return render_template('personal.html', entries=entries, has_charts=has_charts)
+
+@bp.route('/personal/add', methods=['GET', 'POST'])
 def add_personal():
     if request.method == 'POST':
         try:
@@ -566,6 +1934,7 @@ def add_personal():
                 return render_template('add_personal.html')
             
             entry = PersonalData(
+                user_id=current_user_id(),
                 date=datetime.strptime(request.form['date'], '%Y-%m-%d').date(),
                 weight=float(request.form['weight']) if request.form.get('weight') else None,
                 height=float(request.form['height']) if request.form.get('height') else None,
@@ -575,9 +1944,10 @@ def add_personal():
             )
             
             db.session.add(entry)
+            bump_data_version('personal_data')
             db.session.commit()
             flash('Dane osobiste zostały dodane!', 'success')
-            return redirect(url_for('personal'))
+            return redirect(url_for('main.personal'))
             
         except ValueError as e:
             flash('Błąd w dacie lub liczbach! Sprawdź poprawność danych.', 'error')
@@ -588,69 +1958,311 @@ def add_personal():
     
     return render_template('add_personal.html')
 
-@app.route('/calendar')
-def calendar():
-    today = date.today()
-    sport_entries = SportEntry.query.filter(
-        SportEntry.date >= date(today.year, today.month, 1)
-    ).all()
-    
-    nutrition_entries = NutritionEntry.query.filter(
-        NutritionEntry.date >= date(today.year, today.month, 1)
-    ).all()
-    
-    calendar_data = {}
-    
-    # Dodaje wpisy sportowe
-    for entry in sport_entries:
-        date_str = entry.date.strftime('%Y-%m-%d')
-        if date_str not in calendar_data:
-            calendar_data[date_str] = []
-        calendar_data[date_str].append({
-            'type': 'sport',
-            'activity': entry.activity,
-            'duration': entry.duration,
-            'id': entry.id
-        })
+@bp.route('/api/charts/shared')
+def chart_shared_layout():
+    # Szablon wyglądu wspólny dla wykresów w formacie zwartym - zmienia się tylko z wersją Plotly
+    import chart_format
+
+    response = jsonify(chart_format.shared_layout())
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
+
+def chart_args():
+    """Parametry zapytania wykresów; ValueError z komunikatem dla użytkownika"""
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+        max_points = int(request.args.get('max_points') or current_app.config['CHART_MAX_POINTS'])
+    except ValueError:
+        raise ValueError('Nieprawidłowa data lub liczba punktów!')
     
-    # Dodaje wpisy żywieniowe
-    for entry in nutrition_entries:
-        date_str = entry.date.strftime('%Y-%m-%d')
-        if date_str not in calendar_data:
-            calendar_data[date_str] = []
-        calendar_data[date_str].append({
-            'type': 'nutrition',
-            'meal_type': entry.meal_type,
-            'food_item': entry.food_item,
-            'calories': entry.calories,
-            'id': entry.id
-        })
+    if max_points < 3:
+        raise ValueError('max_points musi wynosić co najmniej 3')
+    
+    fmt = request.args.get('format', 'plotly')
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f'Nieznany format: {fmt}')
+    packed = request.args.get('pack', '1') != '0'
+    return date_from, date_to, max_points, fmt, packed
+
+@bp.route('/api/charts')
+def charts_api():
+    """Kilka wykresów naraz (?names=weight,bmi; domyślnie wszystkie) - budowanych równolegle"""
+    names = request.args.get('names')
+    names = names.split(',') if names else [name[:-len('_chart')] for name in CHART_SOURCES]
+    unknown = [name for name in names if f'{name}_chart' not in CHART_SOURCES]
+    if unknown:
+        return jsonify({'error': f'Nieznany wykres: {", ".join(unknown)}'}), 404
+    
+    try:
+        args = chart_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    charts = build_charts([f'{name}_chart' for name in names], *args)
+    # Gotowe JSON-y wykresów wklejane bez ponownej serializacji
+    body = ','.join(f'{json.dumps(name)}:{charts[f"{name}_chart"]}' for name in names)
+    return current_app.response_class('{' + body + '}', mimetype='application/json')
+
+@bp.route('/api/charts/<name>')
+def chart_api(name):
+    chart_name = f'{name}_chart'
+    if chart_name not in CHART_SOURCES:
+        return jsonify({'error': f'Nieznany wykres: {name}'}), 404
+    
+    try:
+        args = chart_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    chart = build_charts([chart_name], *args)[chart_name]
+    return current_app.response_class(chart, mimetype='application/json')
+
+@bp.route('/api/analytics')
+def analytics_api():
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+    except ValueError:
+        return jsonify({'error': 'Nieprawidłowa data!'}), 400
+    
+    return jsonify(build_analytics(date_from, date_to))
+
+@bp.route('/api/chart-cache/stats')
+def chart_cache_stats():
+    return jsonify(chart_cache.stats())
+
+@bp.route('/api/ingest', methods=['POST'])
+def ingest_api():
+    """Paczka próbek z urządzenia ({"samples": [...]} albo sama lista) - zapis w tle, odpowiedź 202"""
+    payload = request.get_json(silent=True)
+    samples = payload.get('samples') if isinstance(payload, dict) else payload
+    if not isinstance(samples, list) or not samples:
+        return jsonify({'error': 'Oczekiwano niepustej listy próbek'}), 400
+    if len(samples) > current_app.config['INGEST_MAX_SAMPLES']:
+        return jsonify({'error': f'Paczka może zawierać najwyżej {current_app.config["INGEST_MAX_SAMPLES"]} próbek'}), 413
+
+    items, errors = parse_samples(samples)
+    if not items:
+        return jsonify({'error': 'Żadna próbka nie jest poprawna', 'errors': errors[:10]}), 400
+    try:
+        queued = ingest_queue.submit(items)
+    except IngestQueueFull as e:
+        # Przeciążenie - klient ponawia całą paczkę po chwili
+        response = jsonify({'error': str(e)})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, round(ingest_queue.flush_interval)))
+        return response
+    return jsonify({'accepted': len(items), 'invalid': len(errors), 'errors': errors[:10], 'queued': queued}), 202
+
+@bp.route('/api/ingest/stats')
+def ingest_stats():
+    return jsonify(ingest_queue.stats())
+
+@bp.route('/goals', methods=['GET', 'POST'])
+def goals_page():
+    if request.method == 'POST':
+        try:
+            target = int(request.form.get('target', ''))
+        except ValueError:
+            target = None
+            flash('Cel musi być liczbą całkowitą!', 'error')
+        if target is not None:
+            try:
+                goals.set_goal(db.session, current_user_id(), request.form.get('metric'),
+                               request.form.get('period'), target)
+                bump_data_version('goal')
+                db.session.commit()
+                flash('Cel został zapisany!', 'success')
+                return redirect(url_for('main.goals_page'))
+            except ValueError as e:
+                db.session.rollback()
+                flash(str(e), 'error')
+    
+    return render_template('goals.html', goals=goals.status(db.session, current_user_id(), date.today()),
+                           metrics=goals.GOAL_METRICS, periods=goals.PERIODS)
+
+@bp.route('/goals/<metric>/<period>/delete', methods=['POST'])
+def delete_goal(metric, period):
+    if goals.delete_goal(db.session, current_user_id(), metric, period):
+        bump_data_version('goal')
+        db.session.commit()
+        flash('Cel został usunięty!', 'success')
+    return redirect(url_for('main.goals_page'))
+
+@bp.route('/api/goals')
+def goals_api():
+    """Cele z postępem bieżącego okresu oraz bieżącą i najdłuższą serią"""
+    return jsonify(goals.status(db.session, current_user_id(), date.today()))
+
+@bp.route('/photos/<path:filename>')
+def photo(filename):
+    """Zdjęcie albo jego wariant - tylko dla właściciela wpisu, który go używa"""
+    folder = current_app.config['UPLOAD_FOLDER']
+    source = variant_source(filename)
+    original = find_original(folder, source[0]) if source else filename
+    if original is None or user_query(SportEntry).with_entities(SportEntry.id)\
+            .filter(SportEntry.photo_filename == original).first() is None:
+        abort(404)
+
+    if source and not os.path.exists(os.path.join(folder, filename)):
+        # Wariant jeszcze nie powstał - oryginał bez długiego zapamiętania pod adresem wariantu
+        response = send_from_directory(folder, original)
+    elif not is_content_name(filename):
+        # Zdjęcia sprzed magazynu (nazwa z datą) - zwykłe zapytanie warunkowe
+        response = send_from_directory(folder, filename)
+    else:
+        response = send_from_directory(folder, filename, max_age=current_app.config['PHOTO_MAX_AGE'])
+        response.cache_control.immutable = True
+    # Ten sam plik może należeć do wielu kont - wspólne pamięci podręczne (proxy) nie mogą go przechowywać
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+@bp.route('/import', methods=['GET', 'POST'])
+def import_data():
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Wybierz plik do importu!', 'error')
+            return render_template('import.html')
+        
+        try:
+            stats = import_stream(file.stream, detect_format(file.filename),
+                                  request.form.get('table') or None)
+        except ImportDataError as e:
+            flash(f'Błąd importu: {str(e)}', 'error')
+            return render_template('import.html')
+        except Exception as e:
+            flash(f'Wystąpił błąd: {str(e)}', 'error')
+            return render_template('import.html')
+        
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(stats)
+        
+        flash(format_import_stats(stats), 'success' if not stats['errors'] else 'error')
+        for message in stats['messages']:
+            flash(message, 'error')
+        return redirect(url_for('main.import_data'))
+    
+    return render_template('import.html')
+
+@bp.route('/export')
+def export_data():
+    tables = [table for table in request.args.get('tables', '').split(',') if table] or list(EXPORT_COLUMNS)
+    fmt = request.args.get('format', 'ndjson')
     
-    return render_template('calendar.html', calendar_data=calendar_data)
+    if fmt not in exporter.FORMATS or any(table not in EXPORT_COLUMNS for table in tables):
+        return jsonify({'error': 'Nieznany format lub tabela!'}), 400
+    if fmt == 'csv' and len(tables) != 1:
+        return jsonify({'error': 'Eksport CSV obejmuje dokładnie jedną tabelę'}), 400
+    
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+    except ValueError:
+        return jsonify({'error': 'Nieprawidłowa data!'}), 400
+    
+    filename = f"dziennik-{'-'.join(tables)}.{exporter.EXTENSIONS[fmt]}"
+    return Response(stream_with_context(iter_export(tables, fmt, date_from, date_to)),
+                    mimetype=exporter.MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@bp.route('/calendar')
+@conditional_page('sport_entry', 'nutrition_entry')
+def calendar():
+    try:
+        year, month = parse_month_arg()
+    except ValueError:
+        flash('Nieprawidłowy miesiąc!', 'error')
+        return redirect(url_for('main.calendar'))
 
-@app.route('/day/<date_str>')
+    calendar_month = calendar_payload(*month_range(year, month))
+    return render_template('calendar.html', calendar_month=calendar_month,
+                           year=year, month=month)
+
+@bp.route('/api/calendar')
+def calendar_api():
+    """Dane kalendarza dla miesiąca (?month=RRRR-MM) albo całego roku (?year=RRRR)"""
+    try:
+        if request.args.get('year'):
+            year = int(request.args['year'])
+            date_from, date_to = date(year, 1, 1), date(year, 12, 31)
+        else:
+            date_from, date_to = month_range(*parse_month_arg())
+    except ValueError:
+        return jsonify({'error': 'Nieprawidłowy miesiąc lub rok'}), 400
+
+    return jsonify(calendar_payload(date_from, date_to))
+
+@bp.route('/day/<date_str>')
+@conditional_page('sport_entry', 'nutrition_entry', 'personal_data')
 def day_details(date_str):
     try:
         selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
     except ValueError:
         flash('Nieprawidłowa data!', 'error')
-        return redirect(url_for('calendar'))
+        return redirect(url_for('main.calendar'))
     
     # Pobiera wszystkie wpisy dla tego dnia
-    sport_entries = SportEntry.query.filter(SportEntry.date == selected_date).all()
-    nutrition_entries = NutritionEntry.query.filter(NutritionEntry.date == selected_date).all()
-    personal_entries = PersonalData.query.filter(PersonalData.date == selected_date).all()
+    entries = load_days(selected_date, selected_date)[selected_date]
     
     return render_template('day_details.html', 
                          selected_date=selected_date,
-                         sport_entries=sport_entries,
-                         nutrition_entries=nutrition_entries,
-                         personal_entries=personal_entries)
+                         previous_date=selected_date - timedelta(days=1),
+                         next_date=selected_date + timedelta(days=1),
+                         sport_entries=entries['sport'],
+                         nutrition_entries=entries['nutrition'],
+                         personal_entries=entries['personal'])
+
+@bp.route('/search')
+@conditional_page('sport_entry', 'nutrition_entry', 'personal_data')
+def search_page():
+    try:
+        args = search_args()
+    except ValueError:
+        flash('Nieprawidłowe parametry wyszukiwania!', 'error')
+        return redirect(url_for('main.search_page'))
+    
+    results = search_entries(**args) if args['phrase'] else []
+    return render_template('search.html', results=results, query=args['phrase'], kind=args['kind'],
+                           limit=args['limit'], offset=args['offset'])
+
+@bp.route('/api/search')
+def search_api():
+    """Wyszukiwanie pełnotekstowe (?q=słowa&kind=sport|nutrition|personal&limit=&offset=)"""
+    try:
+        args = search_args()
+    except ValueError:
+        return jsonify({'error': 'Nieprawidłowe parametry wyszukiwania'}), 400
+    
+    results = search_entries(**args)
+    return jsonify({'results': [dict(entry_to_dict(kind, entry), kind=kind) for kind, entry in results]})
+
+@bp.route('/api/days')
+def days_api():
+    """Wpisy z zakresu dni (?from=RRRR-MM-DD&to=RRRR-MM-DD, najwyżej DAYS_MAX_RANGE dni)"""
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to') or date_from
+    except ValueError:
+        return jsonify({'error': 'Nieprawidłowa data'}), 400
+    if date_from is None or date_to < date_from:
+        return jsonify({'error': 'Podaj zakres dat: from <= to'}), 400
+    if (date_to - date_from).days >= DAYS_MAX_RANGE:
+        return jsonify({'error': f'Zakres może obejmować najwyżej {DAYS_MAX_RANGE} dni'}), 400
+
+    days = load_days(date_from, date_to)
+    return jsonify({'days': {
+        day.isoformat(): {table: [entry_to_dict(table, entry) for entry in entries[table]]
+                          for table in entries}
+        for day, entries in days.items()
+    }})
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        db.create_all()
+        upgrade_database()
 
-    app.jinja_env.globals['timedelta'] = timedelta
-    
     app.run(debug=True, host='127.0.0.1', port=5001)
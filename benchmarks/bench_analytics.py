@@ -0,0 +1,103 @@
+"""Benchmark analiz NumPy na syntetycznych danych z 10 lat.
+
+Mierzy wczytanie kolumn, budowę serii dziennych, średnie kroczące, agregacje,
+korelację i trend oraz cały raport /api/analytics (zimny i z pamięci podręcznej).
+Dla porównania liczona jest też średnia krocząca w czystym Pythonie.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_analytics.py --rows 10000 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(function, repeat):
+    """Średni czas wywołania w ms i wynik ostatniego wywołania"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return 1000 * (time.perf_counter() - started) / repeat, result
+
+
+def python_rolling_mean(dates, values, window):
+    """Średnia krocząca liczona pętlą po dniach - punkt odniesienia"""
+    by_day = {}
+    for day, value in zip(dates, values):
+        if value:
+            by_day.setdefault(day, []).append(value)
+    result = {}
+    for day in by_day:
+        window_values = [v for offset in range(window)
+                         for v in by_day.get(day.fromordinal(day.toordinal() - offset), [])]
+        result[day] = sum(window_values) / len(window_values)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000],
+                        help='liczba wierszy w każdej tabeli')
+    parser.add_argument('--repeat', type=int, default=5, help='liczba powtórzeń pomiaru')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+    import analytics
+    from flask import g
+    from app import (create_app, db, SportEntry, NutritionEntry, PersonalData, build_analytics,
+                     chart_cache, create_user, load_chart_data, rebuild_daily_summary, upgrade_database)
+    app = create_app()
+    from bench_personal import fill_database
+
+    print(f'{"wiersze":>10} {"etap":<28} {"czas [ms]":>10}')
+    filled = 0
+    with app.app_context():
+        upgrade_database()
+        g.user_id = create_user('bench', 'bench-password').id
+        for rows in sorted(args.rows):
+            fill_database(db, (SportEntry, NutritionEntry, PersonalData), rows - filled, seed=rows,
+                          user_id=g.user_id)
+            filled = rows
+            rebuild_daily_summary(g.user_id)
+
+            data = load_chart_data(('personal', 'summary'))
+            personal, summary = data['personal'], data['summary']
+            weight = analytics.DailySeries.from_columns(personal['date'], personal['weight'])
+            calories = analytics.DailySeries.from_columns(summary['date'], summary['calories'])
+
+            steps = [
+                ('wczytanie kolumn', lambda: load_chart_data(('personal', 'summary'))),
+                ('serie dzienne', lambda: analytics.DailySeries.from_columns(
+                    personal['date'], personal['weight'])),
+                ('średnie 7 i 30 dni', lambda: (weight.rolling_mean(7), weight.rolling_mean(30))),
+                ('tygodnie i miesiące', lambda: (weight.resample('week'), weight.resample('month'))),
+                ('korelacja kalorie-waga', lambda: analytics.calorie_weight_correlation(calories, weight)),
+                ('trend wagi', lambda: analytics.linear_trend(weight)),
+                ('średnia 30 dni (Python)', lambda: python_rolling_mean(
+                    personal['date'], personal['weight'], 30)),
+            ]
+            for name, function in steps:
+                elapsed, _ = timed(function, args.repeat)
+                print(f'{rows:>10} {name:<28} {elapsed:>10.1f}')
+
+            def cold_report():
+                chart_cache.clear()
+                return build_analytics()
+
+            elapsed, _ = timed(cold_report, args.repeat)
+            print(f'{rows:>10} {"raport (zimny)":<28} {elapsed:>10.1f}')
+            elapsed, _ = timed(build_analytics, args.repeat)
+            print(f'{rows:>10} {"raport (z pamięci)":<28} {elapsed:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
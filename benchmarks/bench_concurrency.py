@@ -0,0 +1,135 @@
+"""Benchmark współbieżnego odczytu i zapisu z profilem SQLite i bez niego.
+
+Czytelnicy pobierają kalendarz, szczegóły dnia i wykresy, a piszący dodają
+posiłki i treningi. Każdy profil działa w osobnym procesie na świeżej bazie.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_concurrency.py --rows 10000 --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from common import logged_in_client, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ('default', 'production')
+
+
+def run_worker(args):
+    """Jeden pomiar w bieżącym procesie; wynik wypisywany jako JSON"""
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['SQLITE_PROFILE'] = args.profile
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+    from app import create_app, db, SportEntry, NutritionEntry, PersonalData, create_user, upgrade_database
+    app = create_app()
+    from bench_personal import fill_database
+
+    with app.app_context():
+        upgrade_database()
+        user_id = create_user('bench', 'bench-password').id
+        fill_database(db, (SportEntry, NutritionEntry, PersonalData), args.rows, user_id=user_id)
+        upgrade_database()
+
+    today = date.today()
+    deadline = time.perf_counter() + args.seconds
+    lock = threading.Lock()
+    results = {'reads': [], 'writes': [], 'write_errors': 0, 'read_errors': 0}
+
+    def reader(seed):
+        rng = random.Random(seed)
+        client = logged_in_client(app, user_id)
+        while time.perf_counter() < deadline:
+            day = today - timedelta(days=rng.randrange(3650))
+            url = rng.choice([
+                '/calendar',
+                f'/day/{day.isoformat()}',
+                f'/api/charts/calories?from={(day - timedelta(days=90)).isoformat()}&to={day.isoformat()}',
+                '/sport',
+            ])
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+            with lock:
+                results['reads'].append(elapsed)
+                if response.status_code != 200:
+                    results['read_errors'] += 1
+
+    def writer(seed):
+        rng = random.Random(seed)
+        client = logged_in_client(app, user_id)
+        while time.perf_counter() < deadline:
+            day = (today - timedelta(days=rng.randrange(3650))).isoformat()
+            if rng.random() < 0.5:
+                url, form = '/nutrition/add', dict(date=day, meal_type='obiad', food_item='Zupa',
+                                                   calories=str(rng.randint(100, 900)), water_ml='250')
+            else:
+                url, form = '/sport/add', dict(date=day, activity='Bieganie',
+                                               duration=str(rng.randint(15, 90)))
+            started = time.perf_counter()
+            response = client.post(url, data=form)
+            elapsed = time.perf_counter() - started
+            with lock:
+                results['writes'].append(elapsed)
+                # Sukces to przekierowanie; formularz z komunikatem błędu oznacza np. "database is locked"
+                if response.status_code != 302:
+                    results['write_errors'] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({
+        'profile': args.profile,
+        'reads_per_second': len(results['reads']) / args.seconds,
+        'read_p95_ms': 1000 * percentile(results['reads'], 0.95),
+        'read_errors': results['read_errors'],
+        'writes_per_second': len(results['writes']) / args.seconds,
+        'write_p95_ms': 1000 * percentile(results['writes'], 0.95),
+        'write_errors': results['write_errors'],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='liczba wierszy w każdej tabeli')
+    parser.add_argument('--readers', type=int, default=8, help='liczba wątków czytających')
+    parser.add_argument('--writers', type=int, default=2, help='liczba wątków zapisujących')
+    parser.add_argument('--seconds', type=float, default=10, help='czas pomiaru')
+    parser.add_argument('--profile', choices=PROFILES, help='uruchom tylko jeden profil')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    print(f'{"profil":>11} {"odczyty/s":>10} {"p95 [ms]":>9} {"błędy":>6} '
+          f'{"zapisy/s":>9} {"p95 [ms]":>9} {"błędy":>6}')
+    for profile in ([args.profile] if args.profile else PROFILES):
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--profile', profile,
+                   '--rows', str(args.rows), '--readers', str(args.readers),
+                   '--writers', str(args.writers), '--seconds', str(args.seconds)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f'{profile:>11} {result["reads_per_second"]:>10.1f} {result["read_p95_ms"]:>9.1f} '
+              f'{result["read_errors"]:>6} {result["writes_per_second"]:>9.1f} '
+              f'{result["write_p95_ms"]:>9.1f} {result["write_errors"]:>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark celów i serii: koszt aktualizacji przy zapisie i odczytu na stronie głównej.
+
+Dla każdego rozmiaru historii (synthetic.py) konto dostaje cele dzienne i tygodniowe
+(woda, kalorie, aktywność). Mierzone są: strona główna z bieżącymi seriami, dodanie
+posiłku dziś i w dniu sprzed --back dni (przeliczenie tylko zmienionego okresu i serii
+po nim) oraz pełne przeliczenie celów od zera (goals.rebuild_user) dla porównania.
+Czasy strony głównej i zapisu nie powinny rosnąć wraz z długością historii.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_goals.py --scales small medium large --back 90
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from common import logged_in_client, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GOALS = (('water_ml', 'day', 1500), ('calories', 'day', 2500), ('workout_minutes', 'week', 150))
+
+
+def timed(action, repeat):
+    """(p50, p95) w ms dla `repeat` wywołań `action`"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - started)
+    return round(1000 * percentile(timings, 0.5), 2), round(1000 * percentile(timings, 0.95), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium', 'large'],
+                        help='rozmiary historii: small, medium, large, huge')
+    parser.add_argument('--back', type=int, default=90, help='ile dni wstecz dopisywany jest posiłek')
+    parser.add_argument('--repeat', type=int, default=20, help='liczba pomiarów każdej operacji')
+    parser.add_argument('--seed', type=int, default=42, help='ziarno generatora danych')
+    parser.add_argument('--output', help='plik JSON z wynikami')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import goals
+    import synthetic
+    from app import create_app, db, create_user, insert_synthetic, upgrade_database
+    app = create_app()
+
+    today = date.today()
+    results = []
+    with app.app_context():
+        upgrade_database()
+        print(f'{"historia":<10} {"dni":>6} {"/ p50/p95 [ms]":>16} {"zapis dziś":>14} '
+              f'{f"zapis -{args.back} dni":>16} {"pełne przeliczenie":>19}')
+        for index, scale in enumerate(args.scales):
+            if scale not in synthetic.SCALES:
+                parser.error(f'nieznany rozmiar: {scale}')
+            user_id = create_user(f'bench{index}', 'bench-password').id
+            years, multiplier = synthetic.SCALES[scale]
+            insert_synthetic(years, multiplier, args.seed, today, user_id)
+            for metric, period, target in GOALS:
+                goals.set_goal(db.session, user_id, metric, period, target)
+            db.session.commit()
+            client = logged_in_client(app, user_id)
+
+            def add_meal(day):
+                response = client.post('/nutrition/add', data={
+                    'date': day.isoformat(), 'meal_type': 'przekąska', 'food_item': 'Jabłko',
+                    'calories': 80, 'water_ml': 250})
+                assert response.status_code == 302, response.status_code
+
+            def rebuild():
+                goals.rebuild_user(db.session, user_id)
+                db.session.commit()
+
+            dashboard = timed(lambda: client.get('/'), args.repeat)
+            write_today = timed(lambda: add_meal(today), args.repeat)
+            write_past = timed(lambda: add_meal(today - timedelta(days=args.back)), args.repeat)
+            full = timed(rebuild, max(1, args.repeat // 4))
+            results.append({'scale': scale, 'days': int(years * 365), 'dashboard': dashboard,
+                            'write_today': write_today, 'write_past': write_past, 'rebuild': full})
+            print(f'{scale:<10} {int(years * 365):>6} {dashboard[0]:>7.1f}/{dashboard[1]:<8.1f} '
+                  f'{write_today[0]:>6.1f}/{write_today[1]:<7.1f} {write_past[0]:>7.1f}/{write_past[1]:<8.1f} '
+                  f'{full[0]:>9.1f}/{full[1]:<9.1f}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, indent=2, ensure_ascii=False)
+        print(f'Zapisano wyniki do {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Benchmark przyjmowania próbek z urządzeń (/api/ingest) przy jednoczesnych odczytach.
+
+Najpierw czytelnicy same pobierają /personal, /calendar, /day/<data> i /sport (czasy
+bazowe). Potem przez ten sam czas urządzenia wysyłają paczki próbek wagi z zadanym
+łącznym tempem (--rate próbek na sekundę), a czytelnicy działają dalej. Wynik: tempo
+przyjęcia i zapisu próbek, odrzucone paczki (429, pełna kolejka) oraz p50/p95
+odczytów bez zapisu i w jego trakcie.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_ingest.py --rate 5000 --devices 4 --batch 250 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from functools import partial
+
+from common import logged_in_client, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_readers(client_factory, readers, seconds, seed):
+    """Czasy odczytów `readers` wątków przez `seconds` sekund"""
+    today = date.today()
+    timings = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader(index):
+        rng = random.Random(seed + index)
+        client = client_factory()
+        while time.perf_counter() < deadline:
+            day = today - timedelta(days=rng.randrange(60))
+            url = rng.choice(['/personal', f'/calendar?month={day:%Y-%m}', f'/day/{day.isoformat()}', '/sport'])
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+            assert response.status_code == 200, (url, response.status_code)
+            with lock:
+                timings.append(elapsed)
+
+    threads = [threading.Thread(target=reader, args=(index,)) for index in range(readers)]
+    for thread in threads:
+        thread.start()
+    return threads, timings
+
+
+def run_devices(client_factory, devices, rate, batch, seconds, seed):
+    """Urządzenia wysyłające paczki po `batch` próbek z łącznym tempem `rate` próbek/s"""
+    stats = {'sent': 0, 'accepted': 0, 'rejected_batches': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    interval = devices * batch / rate
+
+    def device(index):
+        rng = random.Random(seed * 100 + index)
+        client = client_factory()
+        next_send = time.perf_counter() + rng.random() * interval
+        moment = datetime.utcnow() - timedelta(days=30)
+        while next_send < deadline:
+            time.sleep(max(0.0, next_send - time.perf_counter()))
+            samples = []
+            for _ in range(batch):
+                moment += timedelta(seconds=1)
+                samples.append({'measured_at': moment.isoformat(), 'weight': round(rng.uniform(70, 72), 2)})
+            response = client.post('/api/ingest', json={'samples': samples})
+            with lock:
+                stats['sent'] += batch
+                if response.status_code == 202:
+                    stats['accepted'] += response.get_json()['accepted']
+                elif response.status_code == 429:
+                    stats['rejected_batches'] += 1
+                else:
+                    raise AssertionError(response.status_code)
+            next_send += interval
+
+    threads = [threading.Thread(target=device, args=(index,)) for index in range(devices)]
+    for thread in threads:
+        thread.start()
+    return threads, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=int, default=5000, help='łączne tempo wysyłania próbek (na sekundę)')
+    parser.add_argument('--devices', type=int, default=4, help='liczba urządzeń (wątków wysyłających)')
+    parser.add_argument('--batch', type=int, default=250, help='liczba próbek w jednym żądaniu')
+    parser.add_argument('--readers', type=int, default=2, help='liczba wątków czytających')
+    parser.add_argument('--seconds', type=float, default=10, help='czas każdego etapu')
+    parser.add_argument('--days', type=int, default=365, help='długość historii w bazie (dni)')
+    parser.add_argument('--seed', type=int, default=42, help='ziarno generatora danych')
+    parser.add_argument('--output', help='plik JSON z wynikami')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    from app import create_app, create_user, ingest_queue, insert_synthetic, upgrade_database
+    app = create_app()
+
+    with app.app_context():
+        upgrade_database()
+        user_id = create_user('bench', 'bench-password').id
+        insert_synthetic(args.days / 365, 1, args.seed, date.today(), user_id)
+
+    new_client = partial(logged_in_client, app, user_id)
+
+    readers, baseline = run_readers(new_client, args.readers, args.seconds, args.seed)
+    for thread in readers:
+        thread.join()
+
+    started = time.perf_counter()
+    readers, loaded = run_readers(new_client, args.readers, args.seconds, args.seed)
+    devices, sent = run_devices(new_client, args.devices, args.rate, args.batch, args.seconds, args.seed)
+    for thread in readers + devices:
+        thread.join()
+    with app.app_context():
+        ingest_queue.flush()
+        elapsed = time.perf_counter() - started
+        stats = ingest_queue.stats()
+
+    results = {
+        'rate': args.rate, 'devices': args.devices, 'batch': args.batch, 'readers': args.readers,
+        'sent': sent['sent'], 'accepted': sent['accepted'], 'rejected_batches': sent['rejected_batches'],
+        'written': stats['written'], 'written_per_second': round(stats['written'] / elapsed, 1),
+        'avg_commit_ms': stats['avg_commit_ms'],
+        'reads': {name: {'count': len(values),
+                         'p50_ms': round(1000 * percentile(values, 0.5), 1),
+                         'p95_ms': round(1000 * percentile(values, 0.95), 1)}
+                  for name, values in (('baseline', baseline), ('during_ingest', loaded))},
+    }
+    print(f'Próbki: wysłane {results["sent"]}, przyjęte {results["accepted"]}, '
+          f'odrzucone paczki (429) {results["rejected_batches"]}, zapisane {results["written"]} '
+          f'({results["written_per_second"]:.0f}/s, średni commit {results["avg_commit_ms"]:.1f} ms)')
+    print(f'{"odczyty":<16} {"liczba":>8} {"p50 [ms]":>10} {"p95 [ms]":>10}')
+    for name, reads in results['reads'].items():
+        print(f'{name:<16} {reads["count"]:>8} {reads["p50_ms"]:>10.1f} {reads["p95_ms"]:>10.1f}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, indent=2, ensure_ascii=False)
+        print(f'Zapisano wyniki do {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark rozmiaru i czasu serializacji wykresów: pełna figura Plotly i format zwarty.
+
+Dla każdego wykresu z /api/charts mierzony jest rozmiar odpowiedzi (także po gzip)
+i czas serializacji gotowej figury w formatach: plotly, compact (base64) i
+compact bez pakowania (pack=0). Wspólny szablon formatu zwartego liczony jest raz.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_payload.py --scale large
+"""
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = (('plotly', 'plotly', True), ('compact', 'compact', True), ('compact pack=0', 'compact', False))
+
+
+def measure(fig, fmt, packed, repeat):
+    from charts import serialize_chart
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = serialize_chart(fig, fmt, packed)
+        timings.append(time.perf_counter() - started)
+    encoded = payload.encode('utf-8')
+    return min(timings), len(encoded), len(gzip.compress(encoded))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='medium', help='rozmiar danych: small, medium, large, huge')
+    parser.add_argument('--seed', type=int, default=42, help='ziarno generatora danych')
+    parser.add_argument('--repeat', type=int, default=10, help='liczba serializacji każdego wykresu')
+    parser.add_argument('--max-points', type=int, default=2000, help='limit punktów serii')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import json
+    import chart_format
+    import synthetic
+    from flask import g
+    from app import create_app, CHART_SOURCES, create_user, insert_synthetic, load_chart_data, upgrade_database
+    app = create_app()
+    from charts import CHART_BUILDERS
+
+    if args.scale not in synthetic.SCALES:
+        parser.error(f'nieznany rozmiar: {args.scale}')
+    years, multiplier = synthetic.SCALES[args.scale]
+
+    with app.app_context():
+        upgrade_database()
+        g.user_id = create_user('bench', 'bench-password').id
+        insert_synthetic(years, multiplier, args.seed, date.today())
+        data = load_chart_data({source for source, table_name in CHART_SOURCES.values()})
+        figures = {name: CHART_BUILDERS[name](data, args.max_points) for name in CHART_BUILDERS}
+
+    totals = {label: [0.0, 0, 0] for label, fmt, packed in VARIANTS}
+    print(f'{"wykres":<26} {"format":<15} {"serializacja [ms]":>18} {"bajty":>9} {"gzip":>8}')
+    for name, fig in figures.items():
+        if fig is None:
+            continue
+        for label, fmt, packed in VARIANTS:
+            seconds, size, compressed = measure(fig, fmt, packed, args.repeat)
+            total = totals[label]
+            total[0] += seconds
+            total[1] += size
+            total[2] += compressed
+            print(f'{name:<26} {label:<15} {1000 * seconds:>18.2f} {size:>9} {compressed:>8}')
+
+    shared = json.dumps(chart_format.shared_layout(), separators=(',', ':')).encode('utf-8')
+    print(f'\nWspólny szablon (pobierany raz): {len(shared)} B, gzip {len(gzip.compress(shared))} B')
+    print(f'\n{"razem":<26} {"format":<15} {"serializacja [ms]":>18} {"bajty":>9} {"gzip":>8}')
+    for label, (seconds, size, compressed) in totals.items():
+        print(f'{"":<26} {label:<15} {1000 * seconds:>18.2f} {size:>9} {compressed:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark strony /personal: liczba zapytań SQL i czas odpowiedzi.
+
+Mierzony jest cały panel: HTML strony oraz wszystkie wykresy z /api/charts/<nazwa>.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_personal.py --rows 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from common import logged_in_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def fill_database(db, models, rows, seed=42, user_id=None):
+    """Wypełnia bazę `rows` wierszami w każdej tabeli (zapis paczkami) dla użytkownika `user_id`"""
+    SportEntry, NutritionEntry, PersonalData = models
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=3650)
+    meal_types = ['śniadanie', 'obiad', 'kolacja', 'przekąska']
+    batch = 10000
+
+    for offset in range(0, rows, batch):
+        count = min(batch, rows - offset)
+        days = [start + timedelta(days=rng.randrange(3650)) for _ in range(count)]
+        db.session.execute(SportEntry.__table__.insert(), [
+            dict(user_id=user_id, date=d, activity='Bieganie', duration=rng.randint(15, 120), notes='')
+            for d in days
+        ])
+        db.session.execute(NutritionEntry.__table__.insert(), [
+            dict(user_id=user_id, date=d, meal_type=rng.choice(meal_types), food_item='Posiłek',
+                 quantity='', calories=rng.randint(100, 900), water_ml=rng.choice([0, 250, 500]),
+                 notes='')
+            for d in days
+        ])
+        db.session.execute(PersonalData.__table__.insert(), [
+            dict(user_id=user_id, date=d, weight=round(rng.uniform(60, 90), 1), height=180.0,
+                 body_fat=round(rng.uniform(10, 25), 1), muscle_mass=round(rng.uniform(30, 45), 1),
+                 notes='')
+            for d in days
+        ])
+        db.session.commit()
+
+
+def measure(client, urls, queries, repeat, before=None):
+    """Zwraca (liczba zapytań, średni czas w ms) dla jednego wczytania panelu"""
+    timings = []
+    for _ in range(repeat):
+        if before:
+            before()
+        queries.clear()
+        started = time.perf_counter()
+        for url in urls:
+            response = client.get(url)
+            assert response.status_code == 200, url
+        timings.append(time.perf_counter() - started)
+    return len(queries), 1000 * sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='liczba wierszy w każdej tabeli')
+    parser.add_argument('--repeat', type=int, default=5, help='liczba żądań na pomiar')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    from sqlalchemy import event
+    from app import (create_app, db, SportEntry, NutritionEntry, PersonalData, CHART_SOURCES,
+                     chart_cache, create_user, rebuild_daily_summary, upgrade_database)
+    app = create_app()
+
+    queries = []
+    urls = ['/personal'] + [f'/api/charts/{name[:-len("_chart")]}' for name in CHART_SOURCES]
+
+    print(f'{"wiersze":>10} {"zapytania":>10} {"zimne [ms]":>11} {"zapytania":>10} {"ciepłe [ms]":>12}')
+    filled = 0
+    with app.app_context():
+        upgrade_database()
+        user_id = create_user('bench', 'bench-password').id
+        client = logged_in_client(app, user_id)
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *args: queries.append(args[2]))
+
+        for rows in sorted(args.rows):
+            fill_database(db, (SportEntry, NutritionEntry, PersonalData), rows - filled, seed=rows,
+                          user_id=user_id)
+            filled = rows
+            rebuild_daily_summary(user_id)
+
+            # Zimne żądanie: pusta pamięć podręczna wykresów, ciepłe: wykresy już zapamiętane
+            cold = measure(client, urls, queries, args.repeat, before=chart_cache.clear)
+            warm = measure(client, urls, queries, args.repeat)
+
+            print(f'{rows:>10} {cold[0]:>10} {cold[1]:>11.1f} {warm[0]:>10} {warm[1]:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark poziomów przechowywania pomiarów: wykresy z długiej historii próbek z urządzeń.
+
+Baza dostaje --days dni próbek wagi co --interval minut (jak z wagi lub zegarka). Wykresy
+pomiarów (/api/charts?names=weight,bmi,body_composition) i raport /api/analytics mierzone
+są dla kilku zakresów dat na samych surowych danych, a potem po kompaktowaniu
+(compact-data) do agregatów godzinowych i dziennych. Wynik: liczby wierszy na każdym
+poziomie, czas kompaktowania i p50/p95 zimnych żądań (pusta pamięć podręczna).
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_retention.py --days 730 --interval 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from common import logged_in_client, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def insert_samples(db, PersonalData, user_id, days, interval, end, seed):
+    """Próbki co `interval` minut z `days` dni przed `end` (zapis paczkami po 10000); zwraca ich liczbę"""
+    rng = random.Random(seed)
+    moment = datetime.combine(end, datetime.min.time()) - timedelta(days=days)
+    stop = datetime.combine(end, datetime.min.time())
+    weight = 85.0
+    count = 0
+    while moment < stop:
+        rows = []
+        for _ in range(10000):
+            if moment >= stop:
+                break
+            weight += rng.gauss(-0.0005 * interval / 60, 0.02)
+            rows.append(dict(user_id=user_id, date=moment.date(), measured_at=moment, weight=round(weight, 2),
+                             body_fat=round(rng.uniform(18, 22), 1), notes=''))
+            moment += timedelta(minutes=interval)
+        db.session.execute(PersonalData.__table__.insert(), rows)
+        db.session.commit()
+        count += len(rows)
+    return count
+
+
+def measure(client, urls, repeat, clear):
+    """{url: (p50, p95)} w ms dla `repeat` zimnych żądań każdej trasy"""
+    results = {}
+    for url in urls:
+        timings = []
+        for _ in range(repeat):
+            clear()
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200, (url, response.status_code)
+        results[url] = (round(1000 * percentile(timings, 0.5), 1), round(1000 * percentile(timings, 0.95), 1))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=730, help='długość historii próbek (dni)')
+    parser.add_argument('--interval', type=int, default=5, help='odstęp między próbkami (minuty)')
+    parser.add_argument('--repeat', type=int, default=5, help='liczba żądań każdej trasy')
+    parser.add_argument('--seed', type=int, default=42, help='ziarno generatora danych')
+    parser.add_argument('--output', help='plik JSON z wynikami')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    from app import (create_app, db, PersonalData, PersonalDaily, PersonalHourly, chart_cache, compact_personal_data,
+                     create_user, upgrade_database)
+    app = create_app()
+
+    today = date.today()
+    charts = '/api/charts?format=compact&names=weight,bmi,body_composition'
+    urls = [f'{charts}&from={(today - timedelta(days=7)).isoformat()}',
+            f'{charts}&from={(today - timedelta(days=90)).isoformat()}',
+            charts, '/api/analytics']
+
+    results = {'days': args.days, 'interval': args.interval, 'stages': {}}
+    with app.app_context():
+        upgrade_database()
+        user_id = create_user('bench', 'bench-password').id
+        client = logged_in_client(app, user_id)
+        samples = insert_samples(db, PersonalData, user_id, args.days, args.interval, today, args.seed)
+        print(f'Próbki: {samples} ({args.days} dni co {args.interval} min)')
+
+        def counts():
+            return {model.__tablename__: db.session.query(model).count()
+                    for model in (PersonalData, PersonalHourly, PersonalDaily)}
+
+        results['stages']['raw'] = {'rows': counts(), 'routes': measure(client, urls, args.repeat, chart_cache.clear)}
+        started = time.perf_counter()
+        moved = compact_personal_data()
+        results['compaction_seconds'] = round(time.perf_counter() - started, 2)
+        results['stages']['tiered'] = {'rows': counts(), 'routes': measure(client, urls, args.repeat, chart_cache.clear)}
+
+    print(f'Kompaktowanie: {moved["raw"]} próbek, {moved["hourly"]} agregatów godzinowych '
+          f'({results["compaction_seconds"]:.1f} s)')
+    for stage, result in results['stages'].items():
+        print(f'\n{stage}: ' + ', '.join(f'{table} {count}' for table, count in result['rows'].items()))
+        print(f'{"trasa":<90} {"p50 [ms]":>10} {"p95 [ms]":>10}')
+        for url, (p50, p95) in result['routes'].items():
+            print(f'{url:<90} {p50:>10.1f} {p95:>10.1f}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, indent=2, ensure_ascii=False)
+        print(f'Zapisano wyniki do {args.output}')
+
+
+if __name__ == '__main__':
+    main()
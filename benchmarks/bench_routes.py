@@ -0,0 +1,154 @@
+"""Benchmark tras aplikacji na syntetycznych danych z wielu lat.
+
+Dla każdej trasy mierzone są: czas pierwszego żądania, mediana (p50) i p95 czasu,
+liczba zapytań SQL na żądanie oraz szczytowe zużycie pamięci (tracemalloc).
+Wyniki trafiają do pliku JSON; z opcją --compare wypisywane jest porównanie
+z wcześniejszym plikiem (np. z poprzedniego commita).
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_routes.py --scale large --output bench-routes.json
+    python benchmarks/bench_routes.py --scale large --compare bench-routes.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from common import logged_in_client, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def route_urls(chart_names, day):
+    urls = ['/', '/sport', '/nutrition', '/personal', '/calendar', f'/day/{day.isoformat()}']
+    urls += [f'/api/charts/{name}' for name in chart_names]
+    return urls
+
+
+def measure_route(client, url, queries, repeat):
+    """Pomiar jednej trasy: pierwsze żądanie, potem `repeat` kolejnych"""
+    timings = []
+    query_counts = []
+    tracemalloc.start()
+    for attempt in range(repeat + 1):
+        queries.clear()
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: HTTP {response.status_code}')
+        if attempt == 0:
+            first = elapsed
+        else:
+            timings.append(elapsed)
+            query_counts.append(len(queries))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'first_ms': round(1000 * first, 2),
+        'p50_ms': round(1000 * percentile(timings, 0.5), 2),
+        'p95_ms': round(1000 * percentile(timings, 0.95), 2),
+        'queries': round(sum(query_counts) / len(query_counts), 1),
+        'peak_kib': round(peak / 1024, 1),
+        'bytes': len(response.data),
+    }
+
+
+def print_results(results, previous=None):
+    routes = results['routes']
+    previous_routes = (previous or {}).get('routes', {})
+    header = f'{"trasa":<40} {"p50 [ms]":>9} {"p95 [ms]":>9} {"zapytania":>10} {"pamięć [KiB]":>13}'
+    if previous:
+        header += f' {"p50 zmiana":>11}'
+    print(header)
+    for url, result in routes.items():
+        line = (f'{url:<40} {result["p50_ms"]:>9.1f} {result["p95_ms"]:>9.1f} '
+                f'{result["queries"]:>10} {result["peak_kib"]:>13.0f}')
+        before = previous_routes.get(url)
+        if before and before['p50_ms']:
+            line += f' {100 * (result["p50_ms"] / before["p50_ms"] - 1):>+10.0f}%'
+        elif previous:
+            line += f' {"-":>11}'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='medium', help='rozmiar danych: small, medium, large, huge')
+    parser.add_argument('--seed', type=int, default=42, help='ziarno generatora danych')
+    parser.add_argument('--end', help='ostatni dzień danych RRRR-MM-DD (domyślnie dziś)')
+    parser.add_argument('--repeat', type=int, default=20, help='liczba żądań na trasę')
+    parser.add_argument('--output', help='plik JSON z wynikami')
+    parser.add_argument('--compare', help='plik JSON z wcześniejszymi wynikami do porównania')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import synthetic
+    from sqlalchemy import event
+    from app import create_app, db, CHART_SOURCES, SportEntry, create_user, insert_synthetic, upgrade_database
+    app = create_app()
+
+    if args.scale not in synthetic.SCALES:
+        parser.error(f'nieznany rozmiar: {args.scale}')
+    years, multiplier = synthetic.SCALES[args.scale]
+    end = datetime.strptime(args.end, '%Y-%m-%d').date() if args.end else date.today()
+
+    queries = []
+    with app.app_context():
+        upgrade_database()
+        user_id = create_user('bench', 'bench-password').id
+        client = logged_in_client(app, user_id)
+        started = time.perf_counter()
+        rows = insert_synthetic(years, multiplier, args.seed, end, user_id)
+        generate_seconds = time.perf_counter() - started
+        last_day = db.session.query(SportEntry.date).order_by(SportEntry.date.desc()).first()[0]
+        event.listen(db.engine, 'before_cursor_execute', lambda *params: queries.append(params[2]))
+
+        chart_names = [name[:-len('_chart')] for name in CHART_SOURCES]
+        results = {
+            'commit': git_commit(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'scale': args.scale,
+            'seed': args.seed,
+            'end': end.isoformat(),
+            'repeat': args.repeat,
+            'rows': rows,
+            'generate_seconds': round(generate_seconds, 2),
+            'routes': {url: measure_route(client, url, queries, args.repeat)
+                       for url in route_urls(chart_names, last_day)},
+        }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as stream:
+            previous = json.load(stream)
+        print(f'Porównanie z {args.compare} (commit {previous.get("commit")})')
+    print_results(results, previous)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, indent=2, ensure_ascii=False)
+        print(f'Zapisano wyniki do {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Benchmark serwera produkcyjnego (`flask serve`): opóźnienia i przepustowość przy
+różnej liczbie jednoczesnych klientów.
+
+Każda konfiguracja (wątki serwera, procesy wykresów) działa jako osobny proces serwera
+na tej samej bazie z danymi syntetycznymi. Klienci przez zadany czas wysyłają mieszankę
+żądań: wszystkie wykresy naraz z /api/charts (z losowym zakresem dat, więc zwykle bez
+trafienia w pamięć podręczną) oraz strony /personal, /calendar, /day/<data> i /sport.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_serving.py --scale medium --concurrency 1 4 16 --seconds 10
+    python benchmarks/bench_serving.py --configs 1:0 8:0 8:4 --output bench-serving.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import date, timedelta
+
+from common import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+USERNAME, PASSWORD = 'bench', 'bench-password'
+
+
+def fill_database(database_url, scale, seed):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'create-user', USERNAME,
+                    '--password', PASSWORD], cwd=ROOT, env=env, check=True)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'generate-data',
+                    '--scale', scale, '--seed', str(seed)], cwd=ROOT, env=env, check=True)
+
+
+def log_in(port):
+    """Ciasteczko sesji użytkownika benchmarku"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    connection.request('POST', '/login', urllib.parse.urlencode({'username': USERNAME, 'password': PASSWORD}),
+                       {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def start_server(database_url, threads, workers, log):
+    """Serwer w osobnym procesie; komunikaty (np. ostrzeżenia o kolejce żądań) trafiają do `log`"""
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=database_url)
+    server = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'serve', '--port', str(port),
+                               '--threads', str(threads), '--chart-workers', str(workers)],
+                              cwd=ROOT, env=env, stdout=log, stderr=log)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            connection.request('GET', '/api/charts/shared')
+            connection.getresponse().read()
+            connection.close()
+            return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('Serwer nie wystartował')
+
+
+def request_mix(rng, today):
+    day = today - timedelta(days=rng.randrange(365))
+    if rng.random() < 0.4:
+        return 'charts', f'/api/charts?format=compact&max_points=800&from={(day - timedelta(days=365)).isoformat()}&to={day.isoformat()}'
+    return 'pages', rng.choice(['/personal', f'/calendar?month={day:%Y-%m}', f'/day/{day.isoformat()}', '/sport'])
+
+
+def run_clients(port, cookie, clients, seconds, seed):
+    """`clients` wątków wysyła żądania przez `seconds` sekund; zwraca czasy odpowiedzi wg rodzaju"""
+    today = date.today()
+    timings = {'charts': [], 'pages': []}
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        while time.perf_counter() < deadline:
+            kind, url = request_mix(rng, today)
+            started = time.perf_counter()
+            try:
+                connection.request('GET', url, headers={'Cookie': cookie})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    timings[kind].append(elapsed)
+                else:
+                    errors[0] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, errors[0], time.perf_counter() - started
+
+
+def summarize(timings, errors, elapsed):
+    everything = timings['charts'] + timings['pages']
+    result = {'requests': len(everything), 'errors': errors,
+              'throughput_rps': round(len(everything) / elapsed, 1)}
+    for kind, values in timings.items():
+        result[kind] = {'count': len(values),
+                        'p50_ms': round(1000 * percentile(values, 0.5), 1),
+                        'p95_ms': round(1000 * percentile(values, 0.95), 1),
+                        'p99_ms': round(1000 * percentile(values, 0.99), 1)}
+    return result
+
+
+def parse_config(value):
+    threads, workers = value.split(':')
+    return int(threads), int(workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='medium', help='rozmiar danych: small, medium, large, huge')
+    parser.add_argument('--seed', type=int, default=42, help='ziarno generatora danych i klientów')
+    parser.add_argument('--configs', nargs='+', type=parse_config,
+                        default=[(1, 0), (8, 0), (8, os.cpu_count() or 1)],
+                        help='konfiguracje serwera WĄTKI:PROCESY_WYKRESÓW')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16],
+                        help='liczby jednoczesnych klientów')
+    parser.add_argument('--seconds', type=float, default=10, help='czas pomiaru jednego poziomu')
+    parser.add_argument('--output', help='plik JSON z wynikami')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    database_url = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    print(f'Dane: {args.scale}, rdzenie: {os.cpu_count()}')
+    fill_database(database_url, args.scale, args.seed)
+
+    results = {'scale': args.scale, 'cpu_count': os.cpu_count(), 'seconds': args.seconds, 'runs': []}
+    print(f'{"wątki:procesy":<14} {"klienci":>8} {"żądania/s":>10} {"błędy":>6} '
+          f'{"wykresy p50/p95 [ms]":>22} {"strony p50/p95 [ms]":>21}')
+    log = open(os.path.join(workdir, 'server.log'), 'w', encoding='utf-8')
+    for threads, workers in args.configs:
+        server, port = start_server(database_url, threads, workers, log)
+        try:
+            # Rozgrzanie: start puli procesów, import modułów, pierwsze zapytania
+            cookie = log_in(port)
+            run_clients(port, cookie, min(4, max(args.concurrency)), 2, args.seed)
+            for clients in args.concurrency:
+                summary = summarize(*run_clients(port, cookie, clients, args.seconds, args.seed))
+                results['runs'].append(dict(summary, threads=threads, chart_workers=workers, clients=clients))
+                charts, pages = summary['charts'], summary['pages']
+                print(f'{f"{threads}:{workers}":<14} {clients:>8} {summary["throughput_rps"]:>10.1f} '
+                      f'{summary["errors"]:>6} {charts["p50_ms"]:>11.0f}/{charts["p95_ms"]:<10.0f} '
+                      f'{pages["p50_ms"]:>10.0f}/{pages["p95_ms"]:<10.0f}')
+        finally:
+            server.terminate()
+            server.wait()
+    log.close()
+    print(f'Komunikaty serwerów: {log.name}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, indent=2, ensure_ascii=False)
+        print(f'Zapisano wyniki do {args.output}')
+
+
+if __name__ == '__main__':
+    main()
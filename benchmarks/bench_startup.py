@@ -0,0 +1,107 @@
+"""Benchmark zimnego startu: czas `import wsgi` (import app i create_app()) w nowym procesie Pythona.
+
+Każdy pomiar to osobny interpreter z `-X importtime`, więc nic nie jest już
+zaimportowane. Wynikiem jest mediana łącznego czasu importu modułu wsgi (moduł app
+i utworzenie aplikacji fabryką create_app) oraz moduły, których import kosztuje
+najwięcej. Skrypt kończy się kodem 1, gdy mediana przekracza --budget-ms albo gdy
+przy starcie załadowano moduły, które mają być ładowane leniwie (Plotly, NumPy) -
+można go uruchamiać w CI po każdej zmianie.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1000
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Moduły ładowane dopiero przy pierwszym wykresie albo raporcie analiz
+LAZY_MODULES = ('plotly', 'numpy', 'charts', 'analytics', 'chart_format')
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+PROBE = ('import json, sys, wsgi; '
+         f'print(json.dumps(sorted(name for name in {LAZY_MODULES!r} if name in sys.modules)))')
+
+
+def import_profile(database_url):
+    """Jeden zimny import: (czas importu wsgi w ms, {moduł: czas w ms}, załadowane moduły leniwe)"""
+    env = dict(os.environ, DATABASE_URL=database_url)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    total = None
+    children = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)) - 1, match.group(4)
+        # Importy zagnieżdżone wypisywane są przed modułem, który je importuje (wsgi -> app -> moduły)
+        if depth == 0:
+            if name == 'wsgi':
+                total = cumulative / 1000
+                break
+            children = {}
+        elif depth == 4:
+            children[name] = cumulative / 1000
+    return total, children, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='liczba zimnych startów')
+    parser.add_argument('--budget-ms', type=float, default=1000, help='limit mediany czasu importu wsgi')
+    parser.add_argument('--top', type=int, default=10, help='liczba najdroższych modułów w raporcie')
+    parser.add_argument('--output', help='plik JSON z wynikami')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    database_url = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    # Pierwszy start kompiluje pliki .pyc - nie jest liczony
+    import_profile(database_url)
+
+    totals = []
+    modules = {}
+    loaded = set()
+    for _ in range(args.runs):
+        total, children, lazy = import_profile(database_url)
+        totals.append(total)
+        for name, milliseconds in children.items():
+            modules.setdefault(name, []).append(milliseconds)
+        loaded.update(lazy)
+
+    median = statistics.median(totals)
+    top = sorted(((statistics.median(values), name) for name, values in modules.items()), reverse=True)[:args.top]
+    print(f'import wsgi: mediana {median:.0f} ms, min {min(totals):.0f} ms, max {max(totals):.0f} ms '
+          f'({args.runs} startów, limit {args.budget_ms:.0f} ms)')
+    print(f'\n{"moduł":<32} {"import [ms]":>12}')
+    for milliseconds, name in top:
+        print(f'{name:<32} {milliseconds:>12.1f}')
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f'mediana {median:.0f} ms przekracza limit {args.budget_ms:.0f} ms')
+    if loaded:
+        failures.append(f'przy starcie załadowano moduły leniwe: {", ".join(sorted(loaded))}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump({'runs': totals, 'median_ms': median, 'budget_ms': args.budget_ms,
+                       'modules': {name: milliseconds for milliseconds, name in top},
+                       'lazy_modules_loaded': sorted(loaded)}, stream, indent=2, ensure_ascii=False)
+        print(f'Zapisano wyniki do {args.output}')
+
+    for failure in failures:
+        print(f'BŁĄD: {failure}')
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Benchmark wielu kont: czy czas odpowiedzi jednego użytkownika zależy od liczby innych kont.
+
+Mierzony użytkownik ma pełną historię z generatora synthetic.py. Baza rośnie kolejnymi
+krokami (domyślnie do 1, 10, 100, 1000 i 10000 kont); każde dodatkowe konto dostaje
+krótką historię (--days dni treningów, posiłków i pomiarów). Po każdym kroku mierzone są
+trasy mierzonego użytkownika: zimne (pusta pamięć podręczna wykresów) i ciepłe. Między
+żądaniami mierzonego użytkownika te same trasy wywołuje --interleave innych kont (po kolei
+z --active pierwszych kont tła), więc ciepłe czasy pokazują też, czy ich wykresy nie
+wypierają z pamięci podręcznej wykresów mierzonego użytkownika.
+Przy indeksach zaczynających się od (user_id, date) czasy powinny być płaskie.
+
+Uruchomienie (z katalogu głównego projektu):
+    python benchmarks/bench_tenancy.py --scale medium --users 1 10 100 1000 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from common import logged_in_client, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def background_rows(user_id, days, end, rng):
+    """Krótka historia jednego konta tła: {tabela: [wiersze]}"""
+    rows = {'sport': [], 'nutrition': [], 'personal': []}
+    for offset in range(days):
+        day = end - timedelta(days=offset)
+        rows['sport'].append(dict(user_id=user_id, date=day, activity='Bieganie',
+                                  duration=rng.randint(20, 90), notes=''))
+        for meal_type in ('śniadanie', 'obiad', 'kolacja'):
+            rows['nutrition'].append(dict(user_id=user_id, date=day, meal_type=meal_type,
+                                          food_item='Owsianka', quantity='', calories=rng.randint(200, 900),
+                                          water_ml=250, notes=''))
+        rows['personal'].append(dict(user_id=user_id, date=day, weight=round(rng.uniform(55, 95), 1),
+                                     height=175.0, body_fat=None, muscle_mass=None, notes=''))
+    return rows
+
+
+def add_users(db, models, first_id, count, days, end, password_hash, seed):
+    """Dopisuje `count` kont tła z historią (zapis paczkami po 500 kont)"""
+    User = models['user']
+    rng = random.Random(seed)
+    for start in range(first_id, first_id + count, 500):
+        ids = range(start, min(start + 500, first_id + count))
+        db.session.execute(User.__table__.insert(), [
+            dict(id=user_id, username=f'user{user_id}', password_hash=password_hash) for user_id in ids])
+        batch = {'sport': [], 'nutrition': [], 'personal': []}
+        for user_id in ids:
+            for table, rows in background_rows(user_id, days, end, rng).items():
+                batch[table] += rows
+        for table, rows in batch.items():
+            db.session.execute(models[table].__table__.insert(), rows)
+        db.session.commit()
+
+
+def measure(client, urls, repeat, before=None, others=(), interleave=0):
+    """{url: (p50, p95)} w ms dla `repeat` żądań każdej trasy (po jednym żądaniu rozgrzewającym).
+
+    Przed każdym pomiarem tę samą trasę wywołuje `interleave` kolejnych klientów z `others`."""
+    results = {}
+    turn = 0
+    for url in urls:
+        client.get(url)
+        timings = []
+        for _ in range(repeat):
+            if before:
+                before()
+            for _ in range(min(interleave, len(others))):
+                others[turn % len(others)].get(url)
+                turn += 1
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200, (url, response.status_code)
+        results[url] = (round(1000 * percentile(timings, 0.5), 2), round(1000 * percentile(timings, 0.95), 2))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='medium', help='historia mierzonego użytkownika: small, medium, large, huge')
+    parser.add_argument('--seed', type=int, default=42, help='ziarno generatora danych')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 10, 100, 1000, 10000],
+                        help='łączne liczby kont w kolejnych krokach')
+    parser.add_argument('--days', type=int, default=14, help='długość historii kont tła (dni)')
+    parser.add_argument('--repeat', type=int, default=10, help='liczba żądań każdej trasy')
+    parser.add_argument('--active', type=int, default=50, help='liczba kont tła wysyłających żądania')
+    parser.add_argument('--interleave', type=int, default=5,
+                        help='żądania innych kont przed każdym pomiarem ciepłym')
+    parser.add_argument('--output', help='plik JSON z wynikami')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='dziennik-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import synthetic
+    from werkzeug.security import generate_password_hash
+    from app import (create_app, db, User, SportEntry, NutritionEntry, PersonalData, chart_cache, create_user,
+                     insert_synthetic, rebuild_daily_summary, upgrade_database)
+    app = create_app()
+
+    if args.scale not in synthetic.SCALES:
+        parser.error(f'nieznany rozmiar: {args.scale}')
+    years, multiplier = synthetic.SCALES[args.scale]
+    models = {'user': User, 'sport': SportEntry, 'nutrition': NutritionEntry, 'personal': PersonalData}
+    today = date.today()
+    month = today.replace(day=1)
+    urls = ['/personal', '/calendar', f'/day/{today.isoformat()}', '/sport',
+            '/api/charts?format=compact', f'/api/charts?format=compact&from={month.isoformat()}',
+            '/api/search?q=bieg']
+
+    results = {'scale': args.scale, 'days': args.days, 'active': args.active, 'interleave': args.interleave,
+               'steps': []}
+    with app.app_context():
+        upgrade_database()
+        user_id = create_user('bench', 'bench-password').id
+        insert_synthetic(years, multiplier, args.seed, today, user_id)
+        client = logged_in_client(app, user_id)
+        others = []
+        password_hash = generate_password_hash('bench-password')
+
+        users = 1
+        print(f'{"konta":>7} {"wpisy":>9} {"trasa":<48} {"zimne p50/p95 [ms]":>19} {"ciepłe p50/p95 [ms]":>20}')
+        for target in sorted(args.users):
+            if target > users:
+                add_users(db, models, users + 1, target - users, args.days, today, password_hash,
+                          args.seed + target)
+                users = target
+                rebuild_daily_summary()
+            entries = sum(db.session.query(model).count() for model in (SportEntry, NutritionEntry, PersonalData))
+
+            for other_id in range(len(others) + 2, min(users, args.active + 1) + 1):
+                others.append(logged_in_client(app, other_id))
+
+            cold = measure(client, urls, args.repeat, before=chart_cache.clear)
+            warm = measure(client, urls, args.repeat, others=others, interleave=args.interleave)
+            results['steps'].append({'users': users, 'entries': entries,
+                                     'routes': {url: {'cold': cold[url], 'warm': warm[url]} for url in urls}})
+            for url in urls:
+                print(f'{users:>7} {entries:>9} {url:<48} {cold[url][0]:>9.1f}/{cold[url][1]:<9.1f} '
+                      f'{warm[url][0]:>10.1f}/{warm[url][1]:<9.1f}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, indent=2, ensure_ascii=False)
+        print(f'Zapisano wyniki do {args.output}')
+
+
+if __name__ == '__main__':
+    main()
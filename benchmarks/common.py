@@ -0,0 +1,20 @@
+"""Funkcje wspólne benchmarków (skrypty uruchamiane z katalogu głównego projektu).
+
+Moduł nie importuje aplikacji - skrypty ustawiają DATABASE_URL przed importem app.
+"""
+
+
+def percentile(values, fraction):
+    """Wartość z pozycji `fraction` (0-1) posortowanych `values`; 0.0 dla pustej listy"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def logged_in_client(app, user_id):
+    """Klient testowy aplikacji z sesją zalogowanego użytkownika"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client
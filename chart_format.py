@@ -0,0 +1,92 @@
+"""Zwarty format wykresów dla /api/charts (?format=compact).
+
+Pełna figura Plotly zawiera w każdym wykresie ten sam szablon wyglądu
+(ok. 7,5 KB) i daty jako napisy ISO. Format zwarty wysyła szablon raz
+(/api/charts/shared), a serie jako kolumny z typem:
+
+    {"kind": "day", "dtype": "i4", ...}   dni od 1970-01-01
+    {"dtype": "i4", ...}                  liczby całkowite
+    {"dtype": "f4", "decimals": 2, ...}   liczby zmiennoprzecinkowe (NaN = brak)
+
+Dane kolumny są w polu "b64" (little-endian, base64) albo - bez pakowania -
+w polu "data" jako lista liczb. Kolumna i4 o stałym kroku (np. kolejne dni) to
+tylko "start", "step" i "length". Kolumny innych typów (np. etykiety) zostają listami.
+Adapter po stronie przeglądarki jest w szablonie personal.html.
+"""
+import base64
+import math
+from datetime import date, datetime
+
+import numpy as np
+import plotly.io as pio
+
+FORMAT_VERSION = 1
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Pola śladów z seriami danych
+ARRAY_KEYS = ('x', 'y', 'labels', 'values')
+FLOAT_DECIMALS = 2
+
+
+def shared_layout():
+    """Część układu wspólna dla wszystkich wykresów (domyślny szablon Plotly)"""
+    return {'version': FORMAT_VERSION,
+            'template': pio.templates[pio.templates.default].to_plotly_json()}
+
+
+def column_kind(values):
+    sample = next((value for value in values if value is not None), None)
+    if isinstance(sample, datetime):
+        return None
+    if isinstance(sample, date):
+        return 'day'
+    if isinstance(sample, (bool, np.bool_)) or not isinstance(sample, (int, float, np.number)):
+        return None
+    return 'number'
+
+
+def pack(values, dtype, packed):
+    """Kolumna liczb jako base64 (little-endian) albo lista; ciąg arytmetyczny jako start i krok"""
+    if dtype == 'i4' and len(values) > 2:
+        steps = np.diff(values)
+        if (steps == steps[0]).all():
+            return {'dtype': dtype, 'start': int(values[0]), 'step': int(steps[0]), 'length': len(values)}
+    if packed:
+        data = values.astype('<' + dtype).tobytes()
+        return {'dtype': dtype, 'b64': base64.b64encode(data).decode('ascii')}
+    if dtype == 'f4':
+        # JSON nie ma NaN - brak wartości jako null
+        return {'dtype': dtype, 'data': [None if math.isnan(value) else value for value in values.tolist()]}
+    return {'dtype': dtype, 'data': values.tolist()}
+
+
+def encode_column(values, packed=True):
+    kind = column_kind(values)
+    if kind == 'day' and None not in values:
+        days = np.fromiter(map(date.toordinal, values), dtype=np.int64, count=len(values)) - EPOCH_ORDINAL
+        column = pack(days, 'i4', packed)
+        column['kind'] = 'day'
+        return column
+    if kind == 'number':
+        numbers = np.array(values, dtype=float)
+        integral = numbers == np.round(numbers)
+        if integral.all() and (np.abs(numbers) < 2 ** 31).all():
+            return pack(numbers.astype(np.int64), 'i4', packed)
+        column = pack(np.round(numbers, FLOAT_DECIMALS), 'f4', packed)
+        column['decimals'] = FLOAT_DECIMALS
+        return column
+    return [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+
+
+def encode_figure(figure, packed=True):
+    """Figura Plotly w formacie zwartym (bez szablonu, serie jako kolumny z typem)"""
+    # Bez to_plotly_json() - kopiuje ono głęboko całą figurę, a tutaj i tak powstają nowe słowniki
+    layout = {key: value for key, value in figure._layout.items() if key != 'template'}
+    traces = []
+    for trace in figure._data:
+        trace = dict(trace)
+        for key in ARRAY_KEYS:
+            if key in trace and trace[key] is not None:
+                trace[key] = encode_column(trace[key], packed)
+        traces.append(trace)
+    return {'version': FORMAT_VERSION, 'data': traces, 'layout': layout}
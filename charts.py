@@ -0,0 +1,351 @@
+"""Wykresy Plotly strony /personal: budowa figur z danych load_chart_data() i serializacja.
+
+Import Plotly (a przy pierwszym wykresie - jego walidatorów) trwa setki milisekund,
+dlatego app.py ładuje ten moduł dopiero przy pierwszym budowanym wykresie. Trasy bez
+wykresów, polecenia CLI i procesy startujące serwer go nie potrzebują.
+"""
+import json
+from datetime import datetime, time
+
+import numpy as np
+import plotly.graph_objs as go
+import plotly.utils
+
+import analytics
+import chart_format
+from models import MEAL_TYPE_COLUMNS, calculate_bmi
+
+
+def lttb_indices(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets: indeksy punktów zachowujących kształt serii"""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    indices = [0]
+    a = 0
+
+    for i in range(threshold - 2):
+        # Średni punkt następnego koszyka
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_count = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / avg_count
+        avg_y = sum(ys[avg_start:avg_end]) / avg_count
+
+        # Punkt bieżącego koszyka tworzący największy trójkąt
+        ax, ay = xs[a], ys[a]
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+
+        indices.append(best)
+        a = best
+
+    indices.append(n - 1)
+    return indices
+
+
+def axis_value(moment):
+    """Data albo chwila (datetime) jako liczba dni - oś x dla LTTB"""
+    if isinstance(moment, datetime):
+        return moment.toordinal() + (moment - datetime.combine(moment.date(), time())).total_seconds() / 86400
+    return moment.toordinal()
+
+
+def downsample(points, max_points):
+    """Przyjmuje krotki (data, wartość, ...) i zwraca kolumny, najwyżej max_points punktów.
+
+    Kształt serii wyznacza pierwsza wartość po dacie."""
+    if max_points and len(points) > max_points:
+        xs = [axis_value(point[0]) for point in points]
+        ys = [point[1] for point in points]
+        points = [points[i] for i in lttb_indices(xs, ys, max_points)]
+    return tuple(zip(*points))
+
+
+def series_points(days, values):
+    """Punkty (data, wartość) serii NumPy z pominięciem NaN - wejście dla downsample()"""
+    present = ~np.isnan(values)
+    return list(zip(days[present].astype(object), np.round(values[present], 2).tolist()))
+
+
+def create_weight_chart(data, max_points=None):
+    personal = data['personal']
+    points = [(day, weight) for day, weight in zip(personal['date'], personal['weight']) if weight]
+    
+    if not points:
+        return None
+    
+    dates, weights = downsample(points, max_points)
+    
+    fig = go.Figure(data=go.Scatter(x=dates, y=weights, mode='lines+markers', name='Waga'))
+    
+    # Średnie kroczące i trend liniowy z ostatnich 90 dni z prognozą
+    weight = analytics.daily_series(data, 'personal', 'weight')
+    for window, color in ((7, 'orange'), (30, 'green')):
+        rolling = series_points(weight.days, weight.rolling_mean(window))
+        if len(rolling) > 1:
+            trend_dates, trend_values = downsample(rolling, max_points)
+            fig.add_trace(go.Scatter(x=trend_dates, y=trend_values, mode='lines',
+                                     name=f'Średnia {window} dni', line=dict(color=color)))
+    
+    trend = analytics.linear_trend(weight)
+    if trend:
+        trend_days = [trend['start'], trend['end']] + [day for day, value in trend['projections']]
+        trend_values = [trend['start_value'], trend['end_value']] + [value for day, value in trend['projections']]
+        fig.add_trace(go.Scatter(x=[day.astype(object) for day in trend_days],
+                                 y=[round(value, 2) for value in trend_values], mode='lines',
+                                 name=f"Trend ({trend['slope_per_week']:+.2f} kg/tydz.)",
+                                 line=dict(color='gray', dash='dash')))
+    
+    fig.update_layout(
+        title='Wykres Wagi',
+        xaxis_title='Data',
+        yaxis_title='Waga (kg)',
+        height=400
+    )
+    
+    return fig
+
+
+def create_bmi_chart(data, max_points=None):
+    personal = data['personal']
+    points = []
+    
+    for day, weight, height in zip(personal['date'], personal['weight'], personal['height']):
+        bmi = calculate_bmi(weight, height)
+        if bmi:
+            points.append((day, bmi))
+    
+    if not points:
+        return None
+    
+    dates, bmis = downsample(points, max_points)
+    
+    fig = go.Figure(data=go.Scatter(x=dates, y=bmis, mode='lines+markers'))
+    fig.update_layout(
+        title='Wykres BMI',
+        xaxis_title='Data',
+        yaxis_title='BMI',
+        height=400
+    )
+    
+    # Dodaj linie referencyjne BMI
+    fig.add_hline(y=18.5, line_dash="dash", line_color="blue", annotation_text="Niedowaga")
+    fig.add_hline(y=25, line_dash="dash", line_color="green", annotation_text="Norma")
+    fig.add_hline(y=30, line_dash="dash", line_color="orange", annotation_text="Nadwaga")
+    
+    return fig
+
+
+def create_body_composition_chart(data, max_points=None):
+    """Wykres składu ciała (tkanka tłuszczowa + masa mięśniowa)"""
+    personal = data['personal']
+    days = personal['date']
+    body_fat = [(day, bf) for day, bf in zip(days, personal['body_fat']) if bf]
+    muscle_mass = [(day, mm) for day, mm in zip(days, personal['muscle_mass']) if mm]
+    
+    if not body_fat and not muscle_mass:
+        return None
+    
+    fig = go.Figure()
+    
+    # Każda seria próbkowana osobno - pomiary nie zawsze zawierają obie wartości
+    if body_fat:
+        dates, values = downsample(body_fat, max_points)
+        fig.add_trace(go.Scatter(x=dates, y=values, mode='lines+markers', 
+                                name='Tkanka tłuszczowa (%)', line=dict(color='red')))
+    
+    if muscle_mass:
+        dates, values = downsample(muscle_mass, max_points)
+        fig.add_trace(go.Scatter(x=dates, y=values, mode='lines+markers', 
+                                name='Masa mięśniowa (kg)', line=dict(color='green'), yaxis='y2'))
+    
+    fig.update_layout(
+        title='Skład Ciała',
+        xaxis_title='Data',
+        yaxis=dict(title='Tkanka tłuszczowa (%)', side='left'),
+        yaxis2=dict(title='Masa mięśniowa (kg)', side='right', overlaying='y'),
+        height=400,
+        legend=dict(x=0, y=1)
+    )
+    
+    return fig
+
+
+def create_calories_chart(data, max_points=None):
+    """Wykres dziennego spożycia kalorii"""
+    summary = data['summary']
+    # Dni z posiłkami z podanymi kaloriami (także 0 kcal)
+    calories_by_day = [(day, kcal) for day, kcal, count
+                       in zip(summary['date'], summary['calories'], summary['calories_count']) if count > 0]
+    
+    if not calories_by_day:
+        return None
+    
+    # Średnia liczona z pełnych danych, przed próbkowaniem
+    avg_calories = sum(kcal for day, kcal in calories_by_day) / len(calories_by_day)
+    calories_series = analytics.daily_series(data, 'summary', 'calories')
+    dates, calories = downsample(calories_by_day, max_points)
+    
+    fig = go.Figure(data=go.Bar(x=dates, y=calories, marker_color='orange', name='Kalorie'))
+    rolling = series_points(calories_series.days, calories_series.rolling_mean(7))
+    if len(rolling) > 1:
+        rolling_dates, rolling_values = downsample(rolling, max_points)
+        fig.add_trace(go.Scatter(x=rolling_dates, y=rolling_values, mode='lines',
+                                 name='Średnia 7 dni', line=dict(color='darkred')))
+    fig.update_layout(
+        title='Dzienne Spożycie Kalorii',
+        xaxis_title='Data',
+        yaxis_title='Kalorie (kcal)',
+        height=400
+    )
+    
+    fig.add_hline(y=avg_calories, line_dash="dash", line_color="red", 
+                  annotation_text=f"Średnia: {avg_calories:.0f} kcal")
+    target = data.get('goals', {}).get('calories')
+    if target:
+        fig.add_hline(y=target, line_dash="dot", line_color="green",
+                      annotation_text=f"Cel: {target} kcal")
+    
+    return fig
+
+
+# Zalecane dzienne spożycie wody - linia wykresu, gdy użytkownik nie ustawił celu
+RECOMMENDED_WATER_ML = 2000
+
+
+def create_water_chart(data, max_points=None):
+    """Wykres dziennego spożycia wody"""
+    summary = data['summary']
+    water_by_day = [(day, ml) for day, ml in zip(summary['date'], summary['water_ml']) if ml > 0]
+    
+    if not water_by_day:
+        return None
+    
+    dates, water = downsample(water_by_day, max_points)
+    
+    fig = go.Figure(data=go.Bar(x=dates, y=water, marker_color='lightblue', name='Woda'))
+    water_series = analytics.daily_series(data, 'summary', 'water_ml')
+    rolling = series_points(water_series.days, water_series.rolling_mean(7))
+    if len(rolling) > 1:
+        rolling_dates, rolling_values = downsample(rolling, max_points)
+        fig.add_trace(go.Scatter(x=rolling_dates, y=rolling_values, mode='lines',
+                                 name='Średnia 7 dni', line=dict(color='navy')))
+    fig.update_layout(
+        title='Dzienne Spożycie Wody',
+        xaxis_title='Data',
+        yaxis_title='Woda (ml)',
+        height=400
+    )
+    
+    # Linia dziennego celu użytkownika (goals.py), bez celu - zalecana ilość
+    target = data.get('goals', {}).get('water_ml')
+    if target:
+        fig.add_hline(y=target, line_dash="dash", line_color="blue",
+                      annotation_text=f"Cel: {target} ml")
+    else:
+        fig.add_hline(y=RECOMMENDED_WATER_ML, line_dash="dash", line_color="blue",
+                      annotation_text=f"Zalecane: {RECOMMENDED_WATER_ML}ml")
+    
+    return fig
+
+
+def create_activity_chart(data, max_points=None):
+    """Wykres aktywności sportowej (czas treningu)"""
+    summary = data['summary']
+    # Tylko treningi z podanym czasem
+    activity_by_day = [(day, minutes, count) for day, minutes, count
+                       in zip(summary['date'], summary['workout_minutes'], summary['timed_workout_count'])
+                       if count > 0]
+    
+    if not activity_by_day:
+        return None
+    
+    dates, durations, counts = downsample(activity_by_day, max_points)
+    
+    fig = go.Figure()
+    
+    # Czas treningu (słupki)
+    fig.add_trace(go.Bar(x=dates, y=durations, name='Czas treningu (min)', 
+                        marker_color='green', yaxis='y'))
+    
+    # Liczba treningów (linia)
+    fig.add_trace(go.Scatter(x=dates, y=counts, mode='lines+markers', 
+                            name='Liczba treningów', line=dict(color='red'), yaxis='y2'))
+    
+    fig.update_layout(
+        title='Aktywność Sportowa',
+        xaxis_title='Data',
+        yaxis=dict(title='Czas (minuty)', side='left'),
+        yaxis2=dict(title='Liczba treningów', side='right', overlaying='y'),
+        height=400,
+        legend=dict(x=0, y=1)
+    )
+    target = data.get('goals', {}).get('workout_minutes')
+    if target:
+        fig.add_hline(y=target, line_dash="dash", line_color="darkgreen",
+                      annotation_text=f"Cel: {target} min")
+    
+    return fig
+
+
+def create_meal_distribution_chart(data, max_points=None):
+    """Wykres rozkładu posiłków"""
+    summary = data['summary']
+    
+    # Zliczanie posiłków według typu
+    labels = [meal_type.title() for meal_type in MEAL_TYPE_COLUMNS] + ['Inne']
+    columns = list(MEAL_TYPE_COLUMNS.values()) + ['other_meal_count']
+    meal_counts = [(label, sum(summary[column])) for label, column in zip(labels, columns)]
+    meal_counts = [(label, count) for label, count in meal_counts if count]
+    
+    if not meal_counts:
+        return None
+    
+    meal_types = [label for label, count in meal_counts]
+    counts = [count for label, count in meal_counts]
+    
+    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8']
+    
+    fig = go.Figure(data=go.Pie(labels=meal_types, values=counts, 
+                               marker=dict(colors=colors)))
+    fig.update_layout(
+        title='Rozkład Rodzajów Posiłków',
+        height=400
+    )
+    
+    return fig
+
+
+# Wszystkie wykresy strony /personal (nazwa -> funkcja budująca)
+CHART_BUILDERS = {
+    'weight_chart': create_weight_chart,
+    'bmi_chart': create_bmi_chart,
+    'body_composition_chart': create_body_composition_chart,
+    'calories_chart': create_calories_chart,
+    'water_chart': create_water_chart,
+    'activity_chart': create_activity_chart,
+    'meal_distribution_chart': create_meal_distribution_chart,
+}
+
+
+def serialize_chart(fig, fmt='plotly', packed=True):
+    """JSON wykresu w wybranym formacie ('null', gdy wykresu nie ma)"""
+    if fig is None:
+        return 'null'
+    if fmt == 'compact':
+        return json.dumps(chart_format.encode_figure(fig, packed), separators=(',', ':'),
+                          cls=plotly.utils.PlotlyJSONEncoder)
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def warm_up():
+    """Ładuje walidatory Plotly używane przez wykresy (pierwsza figura jest kilkaset ms wolniejsza)"""
+    fig = go.Figure([go.Scatter(x=[0], y=[0]), go.Bar(x=[0], y=[0]), go.Pie(labels=['a'], values=[1])])
+    fig.update_layout(title='', xaxis_title='', yaxis_title='', hovermode='x unified', height=400)
+    serialize_chart(fig, 'compact')
@@ -0,0 +1,164 @@
+"""Strumieniowe formaty eksportu (CSV, NDJSON, kolumnowy format binarny).
+
+Każdy zapis przyjmuje kolejne paczki wierszy (krotek) i zwraca generator
+fragmentów bajtów, więc zużycie pamięci nie zależy od rozmiaru tabeli.
+
+Format kolumnowy (.dzc):
+    MAGIC
+    dla każdej tabeli:
+        uint32 długość + nagłówek JSON {"table", "columns": [[nazwa, typ], ...]}
+        dla każdej paczki wierszy (row group):
+            uint32 liczba wierszy (> 0)
+            dla każdej kolumny: uint32 długość + bitmapa wartości niepustych,
+                                uint32 długość + dane kolumny
+        uint32 0 (koniec tabeli)
+    uint32 0 (koniec pliku)
+
+Dane kolumn (little-endian): int64 / float64 / int32 dni od 1970-01-01 /
+int64 mikrosekundy od 1970-01-01 / tekst jako uint32 przesunięcia + UTF-8.
+"""
+import csv
+import io
+import json
+import struct
+from array import array
+from datetime import date, datetime, timedelta
+
+FORMATS = ('csv', 'ndjson', 'columnar')
+
+EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'columnar': 'dzc'}
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'columnar': 'application/octet-stream',
+}
+
+MAGIC = b'DZCOL1\n'
+END_MARKER = struct.pack('<I', 0)
+EPOCH = date(1970, 1, 1)
+EPOCH_DATETIME = datetime(1970, 1, 1)
+
+# Typ kolumny -> kod typu modułu array
+ARRAY_TYPES = {'int': 'q', 'float': 'd', 'date': 'i', 'timestamp': 'q'}
+
+
+def to_text(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(columns, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in partitions:
+        writer.writerows([to_text(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_ndjson(table, columns, partitions):
+    """Linie JSON z polem "type" - zgodne z importem JSON Lines"""
+    for rows in partitions:
+        lines = []
+        for row in rows:
+            record = {'type': table}
+            record.update(zip(columns, (to_text(value) for value in row)))
+            lines.append(json.dumps(record, ensure_ascii=False))
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def pack_block(data):
+    return struct.pack('<I', len(data)) + data
+
+
+def encode_column(values, kind):
+    """Zwraca (bitmapa wartości niepustych, dane kolumny) dla jednej kolumny paczki"""
+    validity = bytearray((len(values) + 7) // 8)
+    for i, value in enumerate(values):
+        if value is not None:
+            validity[i // 8] |= 1 << (i % 8)
+
+    if kind == 'str':
+        offsets = array('I', [0])
+        blob = bytearray()
+        for value in values:
+            blob += (value or '').encode('utf-8')
+            offsets.append(len(blob))
+        return bytes(validity), offsets.tobytes() + bytes(blob)
+
+    if kind == 'date':
+        values = [(value - EPOCH).days if value is not None else 0 for value in values]
+    elif kind == 'timestamp':
+        values = [(value - EPOCH_DATETIME) // timedelta(microseconds=1) if value is not None else 0
+                  for value in values]
+    else:
+        values = [value if value is not None else 0 for value in values]
+    return bytes(validity), array(ARRAY_TYPES[kind], values).tobytes()
+
+
+def iter_columnar(table, columns, types, partitions):
+    """Jedna sekcja tabeli w formacie kolumnowym (bez MAGIC i znacznika końca pliku)"""
+    header = json.dumps({'table': table, 'columns': [list(pair) for pair in zip(columns, types)]})
+    yield pack_block(header.encode('utf-8'))
+    for rows in partitions:
+        if not rows:
+            continue
+        chunk = [struct.pack('<I', len(rows))]
+        for values, kind in zip(zip(*rows), types):
+            validity, data = encode_column(values, kind)
+            chunk.append(pack_block(validity))
+            chunk.append(pack_block(data))
+        yield b''.join(chunk)
+    yield END_MARKER
+
+
+def read_block(stream):
+    (length,) = struct.unpack('<I', stream.read(4))
+    return stream.read(length)
+
+
+def decode_column(validity, data, kind, count):
+    if kind == 'str':
+        offsets = array('I')
+        offsets.frombytes(data[:4 * (count + 1)])
+        blob = data[4 * (count + 1):]
+        values = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+    else:
+        values = array(ARRAY_TYPES[kind])
+        values.frombytes(data)
+        if kind == 'date':
+            values = [EPOCH + timedelta(days=value) for value in values]
+        elif kind == 'timestamp':
+            values = [EPOCH_DATETIME + timedelta(microseconds=value) for value in values]
+        else:
+            values = list(values)
+    return [value if validity[i // 8] & (1 << (i % 8)) else None for i, value in enumerate(values)]
+
+
+def read_columnar(stream):
+    """Wczytuje plik kolumnowy: {tabela: {kolumna: lista wartości}}"""
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError('To nie jest plik eksportu kolumnowego')
+
+    tables = {}
+    while True:
+        header = read_block(stream)
+        if not header:
+            return tables
+        header = json.loads(header)
+        columns = tables.setdefault(header['table'], {name: [] for name, kind in header['columns']})
+        while True:
+            (count,) = struct.unpack('<I', stream.read(4))
+            if not count:
+                break
+            for name, kind in header['columns']:
+                validity = read_block(stream)
+                data = read_block(stream)
+                columns[name].extend(decode_column(validity, data, kind, count))
@@ -0,0 +1,228 @@
+"""Cele dzienne i tygodniowe oraz serie kolejnych okresów, w których zostały spełnione.
+
+Postęp celu liczony jest z podsumowań dziennych (DailySummary), a dla każdego okresu
+z danymi tabela goal_period przechowuje wartość, spełnienie celu i długość serii
+spełnionych okresów kończącej się na nim. Zmiana wpisów (apply_summary_deltas w app.py)
+przelicza przez refresh_days() tylko okresy zmienionych dni i serię, która po nich
+następuje - aż do pierwszego okresu, którego seria się nie zmieniła. Strona główna
+czyta bieżącą serię przez status() - kilka odczytów po kluczu, niezależnie od długości
+historii.
+"""
+from datetime import timedelta
+
+from sqlalchemy import func
+
+from importer import batched
+from models import DailySummary, Goal, GoalPeriod
+
+# Miary celów (kolumny podsumowań): nazwa, jednostka, kierunek - 'min' (co najmniej
+# `target`) albo 'max' (najwyżej `target`, dzień bez wpisów nie spełnia celu)
+GOAL_METRICS = {
+    'water_ml': ('Woda', 'ml', 'min'),
+    'calories': ('Kalorie', 'kcal', 'max'),
+    'workout_minutes': ('Aktywność', 'min', 'min'),
+}
+PERIODS = {'day': ('dziennie', 1), 'week': ('tygodniowo', 7)}
+
+# Liczba okresów wczytywanych naraz przy przeliczaniu serii za zmienionymi okresami
+LOOKAHEAD = 64
+
+
+def period_start(day, period):
+    """Początek okresu zawierającego `day` (tydzień od poniedziałku)"""
+    return day - timedelta(days=day.weekday()) if period == 'week' else day
+
+
+def shift(start, period, count=1):
+    return start + timedelta(days=count * PERIODS[period][1])
+
+
+def is_met(goal, value):
+    if GOAL_METRICS[goal.metric][2] == 'max':
+        return 0 < value <= goal.target
+    return value >= goal.target
+
+
+def goal_filter(model, goal):
+    return [model.user_id == goal.user_id, model.metric == goal.metric, model.period == goal.period]
+
+
+def period_values(session, goal, starts):
+    """{początek okresu: suma miary} dla okresów `starts` - tylko ich dni podsumowań"""
+    length = PERIODS[goal.period][1]
+    days = [start + timedelta(days=offset) for start in starts for offset in range(length)]
+    column = getattr(DailySummary, goal.metric)
+    values = dict.fromkeys(starts, 0)
+    for chunk in batched(days, 500):
+        for day, value in session.query(DailySummary.date, column).filter(
+                DailySummary.user_id == goal.user_id, DailySummary.date.in_(chunk)):
+            values[period_start(day, goal.period)] += value
+    return values
+
+
+def load_rows(session, goal, first, last):
+    """{początek okresu: GoalPeriod} okresów celu od `first` do `last` włącznie"""
+    rows = session.query(GoalPeriod).filter(*goal_filter(GoalPeriod, goal),
+                                            GoalPeriod.start >= first, GoalPeriod.start <= last)
+    return {row.start: row for row in rows}
+
+
+def refresh(session, goal, days):
+    """Przelicza okresy celu zawierające `days` i serie okresów po nich"""
+    starts = sorted({period_start(day, goal.period) for day in days})
+    values = period_values(session, goal, starts)
+    first = shift(starts[0], goal.period, -1)
+    rows = load_rows(session, goal, first, starts[-1])
+    loaded_until = starts[-1]
+
+    for start in starts:
+        row = rows.get(start)
+        if row is None:
+            if not values[start]:
+                continue
+            row = rows[start] = GoalPeriod(user_id=goal.user_id, metric=goal.metric, period=goal.period,
+                                           start=start, streak=0)
+            session.add(row)
+        row.value = values[start]
+        row.met = is_met(goal, row.value)
+
+    # Seria okresu zależy tylko od serii poprzedniego - przeliczanie kończy się
+    # na pierwszym okresie, którego seria się nie zmieniła
+    longest = 0
+    lowered = False
+    pending = 1
+    start = starts[0]
+    streak = rows[first].streak if first in rows else 0
+    while True:
+        if start > loaded_until:
+            rows.update(load_rows(session, goal, start, shift(loaded_until, goal.period, LOOKAHEAD)))
+            loaded_until = shift(loaded_until, goal.period, LOOKAHEAD)
+        row = rows.get(start)
+        new = streak + 1 if row is not None and row.met else 0
+        changed = row is not None and row.streak != new
+        if changed:
+            lowered = lowered or (row.streak == goal.best_streak and new < row.streak)
+            row.streak = new
+            longest = max(longest, new)
+        if pending < len(starts) and start == starts[pending]:
+            pending += 1
+        if not changed:
+            if pending >= len(starts):
+                break
+            start = starts[pending]
+            previous = rows.get(shift(start, goal.period, -1))
+            streak = previous.streak if previous is not None else 0
+            continue
+        streak = new
+        start = shift(start, goal.period)
+
+    for start in starts:
+        row = rows.get(start)
+        if row is not None and not row.value:
+            session.delete(row)
+    if lowered:
+        session.flush()
+        goal.best_streak = session.query(func.coalesce(func.max(GoalPeriod.streak), 0))\
+            .filter(*goal_filter(GoalPeriod, goal)).scalar()
+    else:
+        goal.best_streak = max(goal.best_streak, longest)
+
+
+def refresh_days(session, user_id, deltas):
+    """Aktualizuje cele użytkownika po zmianach podsumowań {dzień: {kolumna: zmiana}}"""
+    for goal in session.query(Goal).filter(Goal.user_id == user_id):
+        days = [day for day, delta in deltas.items() if delta.get(goal.metric)]
+        if days:
+            refresh(session, goal, days)
+
+
+def rebuild(session, goal):
+    """Przelicza od zera wszystkie okresy celu (po dodaniu celu albo zmianie progu)"""
+    session.query(GoalPeriod).filter(*goal_filter(GoalPeriod, goal)).delete(synchronize_session='fetch')
+    column = getattr(DailySummary, goal.metric)
+    values = {}
+    for day, value in session.query(DailySummary.date, column).filter(
+            DailySummary.user_id == goal.user_id, column != 0).order_by(DailySummary.date):
+        start = period_start(day, goal.period)
+        values[start] = values.get(start, 0) + value
+
+    rows = []
+    previous = None
+    for start, value in values.items():
+        met = is_met(goal, value)
+        streak = 0
+        if met:
+            streak = previous['streak'] + 1 if previous and previous['start'] == shift(start, goal.period, -1) else 1
+        previous = dict(user_id=goal.user_id, metric=goal.metric, period=goal.period, start=start,
+                        value=value, met=met, streak=streak)
+        rows.append(previous)
+    if rows:
+        session.execute(GoalPeriod.__table__.insert(), rows)
+    goal.best_streak = max((row['streak'] for row in rows), default=0)
+
+
+def rebuild_user(session, user_id):
+    for goal in session.query(Goal).filter(Goal.user_id == user_id):
+        rebuild(session, goal)
+
+
+def set_goal(session, user_id, metric, period, target):
+    """Dodaje cel albo zmienia jego próg; ValueError z komunikatem dla użytkownika"""
+    if metric not in GOAL_METRICS:
+        raise ValueError(f'Nieznana miara celu: {metric}')
+    if period not in PERIODS:
+        raise ValueError(f'Nieznany okres celu: {period}')
+    if target <= 0:
+        raise ValueError('Cel musi być większy od zera')
+
+    goal = session.get(Goal, (user_id, metric, period))
+    if goal is None:
+        goal = Goal(user_id=user_id, metric=metric, period=period, target=target, best_streak=0)
+        session.add(goal)
+    elif goal.target == target:
+        return goal
+    goal.target = target
+    session.flush()
+    rebuild(session, goal)
+    return goal
+
+
+def delete_goal(session, user_id, metric, period):
+    """Usuwa cel z jego okresami; False, gdy celu nie było"""
+    goal = session.get(Goal, (user_id, metric, period))
+    if goal is None:
+        return False
+    session.query(GoalPeriod).filter(*goal_filter(GoalPeriod, goal)).delete(synchronize_session='fetch')
+    session.delete(goal)
+    return True
+
+
+def daily_targets(session, user_id):
+    """{miara: próg} celów dziennych użytkownika (linie celów na wykresach)"""
+    return dict(session.query(Goal.metric, Goal.target).filter(Goal.user_id == user_id, Goal.period == 'day'))
+
+
+def status(session, user_id, today):
+    """Cele użytkownika z postępem bieżącego okresu i bieżącą serią.
+
+    Okres jeszcze trwa, więc gdy cel nie jest w nim (jeszcze) spełniony, bieżąca seria
+    to seria zakończona na poprzednim okresie."""
+    result = []
+    for goal in session.query(Goal).filter(Goal.user_id == user_id).order_by(Goal.metric, Goal.period):
+        start = period_start(today, goal.period)
+        current = session.get(GoalPeriod, (user_id, goal.metric, goal.period, start))
+        previous = session.get(GoalPeriod, (user_id, goal.metric, goal.period, shift(start, goal.period, -1)))
+        met = current is not None and current.met
+        if met:
+            streak = current.streak
+        else:
+            streak = previous.streak if previous is not None and previous.met else 0
+        value = current.value if current is not None else 0
+        label, unit, direction = GOAL_METRICS[goal.metric]
+        result.append({
+            'metric': goal.metric, 'period': goal.period, 'label': label, 'unit': unit,
+            'period_label': PERIODS[goal.period][0], 'direction': direction, 'target': goal.target,
+            'value': value, 'met': met, 'progress': min(100, round(100 * value / goal.target)),
+            'streak': streak, 'best_streak': goal.best_streak,
+        })
+    return result
@@ -0,0 +1,253 @@
+"""Przetwarzanie zdjęć treningów (usuwanie metadanych, w tle miniatury i warianty WebP).
+
+Metadane usuwane są przy zapisie, zanim policzony zostanie skrót nazwy pliku -
+oryginał w magazynie już się potem nie zmienia. Obróbkę wariantów trasa zleca
+puli wątków, więc żądanie nie czeka na skalowanie. Warianty trafiają do podkatalogu `variants` folderu
+uploadów jako `<nazwa>.<wariant>.webp`; strony zawsze odwołują się do wariantu,
+a dopóki nie powstanie, trasa zdjęć zwraca pod jego adresem oryginał.
+"""
+import glob
+import logging
+import os
+import shutil
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'variants'
+
+# Wariant -> maksymalny rozmiar dłuższego boku w pikselach
+VARIANTS = {
+    'thumb': 240,    # miniatury 60-100 px (z zapasem dla ekranów o wysokiej gęstości)
+    'card': 800,     # karty na liście treningów
+    'large': 1600,   # podgląd w oknie modalnym
+}
+
+WEBP_QUALITY = 80
+
+# Segmenty JPEG z metadanymi: APP1 (EXIF, XMP), APP13 (IPTC), COM (komentarz)
+JPEG_METADATA = {0xE1, 0xED, 0xFE}
+# Fragmenty PNG z metadanymi
+PNG_METADATA = {b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+ORIENTATION = 0x0112
+
+
+def variant_name(filename, variant):
+    """Ścieżka wariantu względem folderu uploadów"""
+    stem = os.path.splitext(filename)[0]
+    return f'{VARIANTS_DIR}/{stem}.{variant}.webp'
+
+
+def variant_source(filename):
+    """(nazwa oryginału bez rozszerzenia, wariant) dla ścieżki wariantu; None dla innych plików"""
+    prefix = VARIANTS_DIR + '/'
+    if not filename.startswith(prefix) or not filename.endswith('.webp'):
+        return None
+    stem, _, variant = filename[len(prefix):-len('.webp')].rpartition('.')
+    if not stem or variant not in VARIANTS:
+        return None
+    return stem, variant
+
+
+def find_original(folder, stem):
+    """Nazwa oryginału o podanej nazwie bez rozszerzenia; None, gdy go nie ma"""
+    for path in glob.glob(glob.escape(os.path.join(folder, stem)) + '.*'):
+        if not path.endswith('.tmp'):
+            return os.path.relpath(path, folder).replace(os.sep, '/')
+    return None
+
+
+def variant_paths(folder, filename):
+    return [os.path.join(folder, variant_name(filename, variant)) for variant in VARIANTS]
+
+
+def orientation_exif(image):
+    """EXIF z samą orientacją (bez niej zdjęcia z telefonu leżą bokiem); None dla orientacji 1"""
+    orientation = image.getexif().get(ORIENTATION, 1)
+    if orientation == 1:
+        return None
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    return exif.tobytes()
+
+
+def jpeg_header(stream):
+    """Segmenty JPEG przed danymi obrazu jako lista (znacznik, bajty segmentu), ostatni to SOS"""
+    stream.seek(2)
+    segments = []
+    while True:
+        prefix = stream.read(2)
+        while prefix[1:] == b'\xff':
+            # Bajty wypełnienia przed znacznikiem
+            prefix = prefix[1:] + stream.read(1)
+        if len(prefix) < 2 or prefix[0] != 0xFF:
+            raise ValueError('Uszkodzony plik JPEG')
+        length = stream.read(2)
+        segment = prefix + length + stream.read(int.from_bytes(length, 'big') - 2)
+        segments.append((prefix[1], segment))
+        if prefix[1] == 0xDA:
+            return segments
+
+
+def strip_jpeg(source, target, exif):
+    segments = jpeg_header(source)
+    clean = [segment for marker, segment in segments if marker not in JPEG_METADATA]
+    if exif:
+        app1 = b'\xff\xe1' + (len(exif) + 2).to_bytes(2, 'big') + exif
+        # Po ewentualnym APP0 (JFIF), który musi być pierwszy
+        clean.insert(1 if segments[0][0] == 0xE0 else 0, app1)
+    if clean == [segment for marker, segment in segments]:
+        return False
+    target.write(b'\xff\xd8' + b''.join(clean))
+    shutil.copyfileobj(source, target, 64 * 1024)
+    return True
+
+
+def png_chunks(stream):
+    """Fragmenty PNG jako (typ, położenie, długość całego fragmentu) - bez czytania danych"""
+    stream.seek(len(PNG_SIGNATURE))
+    chunks = []
+    while True:
+        head = stream.read(8)
+        if len(head) < 8:
+            return chunks
+        size = int.from_bytes(head[:4], 'big') + 12
+        chunks.append((head[4:], stream.tell() - 8, size))
+        stream.seek(size - 8, os.SEEK_CUR)
+
+
+def strip_png(source, target, exif):
+    chunks = png_chunks(source)
+    if exif:
+        # eXIf w PNG to sam nagłówek TIFF, bez prefiksu `Exif\0\0`
+        data = exif[6:]
+        exif_chunk = len(data).to_bytes(4, 'big') + b'eXIf' + data + zlib.crc32(b'eXIf' + data).to_bytes(4, 'big')
+        source.seek(next((start for kind, start, size in chunks if kind == b'eXIf'), 0))
+        if [kind for kind, start, size in chunks if kind in PNG_METADATA] == [b'eXIf'] \
+                and source.read(len(exif_chunk)) == exif_chunk:
+            return False
+    elif not any(kind in PNG_METADATA for kind, start, size in chunks):
+        return False
+
+    target.write(PNG_SIGNATURE)
+    for kind, start, size in chunks:
+        if kind in PNG_METADATA:
+            continue
+        source.seek(start)
+        target.write(source.read(size))
+        if kind == b'IHDR' and exif:
+            target.write(exif_chunk)
+    return True
+
+
+def strip_metadata(source, target):
+    """Kopiuje zdjęcie ze strumienia `source` do `target` bez metadanych.
+
+    Obraz nie jest kodowany ponownie - usuwane są tylko segmenty JPEG i fragmenty PNG
+    z metadanymi, a z EXIF zostaje orientacja. Zwraca False (nic nie zapisując), gdy
+    plik nie ma czego usuwać; GIF i inne formaty zostają bez zmian.
+    """
+    source.seek(0)
+    with Image.open(source) as image:
+        fmt = image.format
+        exif = orientation_exif(image) if fmt in ('JPEG', 'PNG') else None
+    source.seek(0)
+    if fmt == 'JPEG':
+        return strip_jpeg(source, target, exif)
+    if fmt == 'PNG':
+        return strip_png(source, target, exif)
+    return False
+
+
+def process_image(folder, filename):
+    """Tworzy wszystkie warianty zdjęcia (oryginał zostaje bez zmian)"""
+    path = os.path.join(folder, filename)
+    os.makedirs(os.path.dirname(os.path.join(folder, variant_name(filename, 'thumb'))), exist_ok=True)
+
+    with Image.open(path) as original:
+        # Obrót zgodnie z orientacją z EXIF, inaczej zdjęcia z telefonu leżą bokiem
+        image = ImageOps.exif_transpose(original)
+        if image is original:
+            image = original.copy()
+
+    rgb = image
+    if rgb.mode not in ('RGB', 'RGBA'):
+        transparent = rgb.mode in ('LA', 'PA') or 'transparency' in rgb.info
+        rgb = rgb.convert('RGBA' if transparent else 'RGB')
+    for variant, size in VARIANTS.items():
+        resized = rgb.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        target = os.path.join(folder, variant_name(filename, variant))
+        resized.save(target + '.tmp', 'WEBP', quality=WEBP_QUALITY, method=4)
+        os.replace(target + '.tmp', target)
+
+
+def remove_variants(folder, filename):
+    for path in variant_paths(folder, filename):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class ImagePipeline:
+    """Pula wątków przetwarzająca zdjęcia poza wątkiem żądania"""
+
+    def __init__(self, folder=None, workers=2):
+        self.folder = folder
+        self.workers = workers
+        self.executor = None  # tworzona przy pierwszym zleceniu
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.processed = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        """Folder i liczba wątków z konfiguracji aplikacji (UPLOAD_FOLDER, IMAGE_WORKERS)"""
+        self.folder = app.config['UPLOAD_FOLDER']
+        self.workers = app.config['IMAGE_WORKERS']
+
+    def submit(self, filename):
+        with self._lock:
+            if filename in self._pending:
+                return self._pending[filename]
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='images')
+            future = self.executor.submit(self._run, filename)
+            self._pending[filename] = future
+            return future
+
+    def _run(self, filename):
+        try:
+            process_image(self.folder, filename)
+        except Exception:
+            # Uszkodzony obraz nie może zatrzymać puli - szablony pokażą oryginał
+            logger.exception('Nie udało się przetworzyć zdjęcia %s', filename)
+            with self._lock:
+                self.failed += 1
+        else:
+            with self._lock:
+                self.processed += 1
+        finally:
+            with self._lock:
+                self._pending.pop(filename, None)
+
+    def wait(self):
+        """Czeka na zakończenie wszystkich zleconych zadań"""
+        while True:
+            with self._lock:
+                futures = list(self._pending.values())
+            if not futures:
+                return
+            for future in futures:
+                future.result()
+
+    def has_variant(self, filename, variant):
+        return os.path.exists(os.path.join(self.folder, variant_name(filename, variant)))
+
+    def stats(self):
+        with self._lock:
+            return {'pending': len(self._pending), 'processed': self.processed, 'failed': self.failed}
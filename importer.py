@@ -0,0 +1,235 @@
+"""Parsery plików importu (CSV, JSON Lines, GPX, TCX).
+
+Każdy parser czyta plik strumieniowo i zwraca generator rekordów
+w postaci (tabela, słownik kolumn), gdzie tabela to 'sport', 'nutrition' albo 'personal'.
+"""
+import csv
+import io
+import json
+import os
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timezone
+from itertools import islice
+
+# Kolumny akceptowane dla każdej tabeli i ich typy
+TABLE_COLUMNS = {
+    'sport': {'date': 'date', 'activity': str, 'duration': int, 'notes': str},
+    'nutrition': {'date': 'date', 'meal_type': str, 'food_item': str, 'quantity': str,
+                  'calories': int, 'water_ml': int, 'notes': str},
+    'personal': {'date': 'date', 'measured_at': 'datetime', 'weight': float, 'height': float,
+                 'body_fat': float, 'muscle_mass': float, 'notes': str},
+}
+
+# Kolumny wymagane (poza datą) - po nich rozpoznawana jest tabela rekordu
+REQUIRED_COLUMNS = {
+    'sport': ('activity',),
+    'nutrition': ('meal_type', 'food_item'),
+    'personal': (),
+}
+
+FORMATS = ('csv', 'jsonl', 'gpx', 'tcx')
+
+
+class ImportDataError(ValueError):
+    """Nieprawidłowy rekord lub plik importu"""
+
+
+def detect_format(filename):
+    ext = os.path.splitext(filename)[1].lower().lstrip('.')
+    if ext == 'ndjson':
+        return 'jsonl'
+    if ext not in FORMATS:
+        raise ImportDataError(f'Nieobsługiwany format pliku: {filename}')
+    return ext
+
+
+def detect_table(record):
+    if 'meal_type' in record or 'food_item' in record:
+        return 'nutrition'
+    if 'activity' in record:
+        return 'sport'
+    if any(record.get(key) not in (None, '') for key in ('weight', 'height', 'body_fat', 'muscle_mass')):
+        return 'personal'
+    raise ImportDataError('Nie można rozpoznać rodzaju wpisu')
+
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    try:
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    except ValueError:
+        raise ImportDataError(f'Nieprawidłowa data: {value!r}')
+
+
+def parse_datetime(value):
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    value = str(value).strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ImportDataError(f'Nieprawidłowy czas: {value!r}')
+    # Czas ze strefą zapisywany jako UTC (jak created_at)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def normalize(table, record):
+    """Zamienia surowy rekord na (tabela, słownik kolumn modelu z właściwymi typami)"""
+    if record is None:
+        raise ImportDataError('Nieprawidłowy rekord')
+    table = table or detect_table(record)
+    if table not in TABLE_COLUMNS:
+        raise ImportDataError(f'Nieznana tabela: {table}')
+    if not record.get('date') and record.get('measured_at'):
+        # Próbki z urządzeń mają tylko czas pomiaru
+        record = dict(record, date=parse_datetime(record['measured_at']))
+    if not record.get('date'):
+        raise ImportDataError('Data jest wymagana')
+
+    row = {}
+    for column, kind in TABLE_COLUMNS[table].items():
+        value = record.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        if value in (None, ''):
+            row[column] = None
+        elif kind == 'date':
+            row[column] = parse_date(value)
+        elif kind == 'datetime':
+            row[column] = parse_datetime(value)
+        else:
+            try:
+                row[column] = kind(float(value)) if kind is int else kind(value)
+            except (TypeError, ValueError):
+                raise ImportDataError(f'Nieprawidłowa wartość {column}: {value!r}')
+
+    for column in REQUIRED_COLUMNS[table]:
+        if not row[column]:
+            raise ImportDataError(f'Brak wymaganej kolumny: {column}')
+    if table == 'nutrition' and row['water_ml'] is None:
+        row['water_ml'] = 0
+    if table == 'personal' and not any(row[c] for c in ('weight', 'height', 'body_fat', 'muscle_mass')):
+        raise ImportDataError('Podaj przynajmniej jedną wartość pomiarową')
+    for column in ('notes', 'quantity'):
+        if column in row and row[column] is None:
+            row[column] = ''
+    return table, row
+
+
+def iter_csv(stream, table=None):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield (table or record.get('type')), record
+
+
+def iter_jsonl(stream, table=None):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = None
+        if not isinstance(record, dict):
+            # Błędna linia nie przerywa importu - normalize() zgłosi błąd rekordu
+            yield table, None
+            continue
+        yield (table or record.pop('type', None)), record
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+
+
+def iter_gpx(stream, table=None):
+    """Każda ścieżka <trk> to jeden trening: data i czas trwania z punktów <trkpt>"""
+    name, kind, first, last = None, None, None, None
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        tag = local_name(element.tag)
+        if event == 'start':
+            if tag == 'trk':
+                name, kind, first, last = None, None, None, None
+            continue
+
+        if tag == 'name' and name is None:
+            name = (element.text or '').strip()
+        elif tag == 'type':
+            kind = (element.text or '').strip()
+        elif tag == 'time' and element.text:
+            timestamp = parse_timestamp(element.text)
+            first = first or timestamp
+            last = timestamp
+        elif tag == 'trkpt':
+            element.clear()
+        elif tag == 'trk':
+            if first is not None:
+                yield 'sport', {
+                    'date': first.date(),
+                    'activity': kind or name or 'Aktywność',
+                    'duration': round((last - first).total_seconds() / 60),
+                    'notes': name if kind and name else '',
+                }
+            element.clear()
+
+
+def iter_tcx(stream, table=None):
+    """Każdy element <Activity> to jeden trening: czas trwania to suma okrążeń"""
+    started, seconds, notes = None, 0.0, ''
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        tag = local_name(element.tag)
+        if event == 'start':
+            if tag == 'Activity':
+                sport = element.get('Sport') or 'Aktywność'
+                started, seconds, notes = None, 0.0, ''
+            continue
+
+        if tag == 'Id' and started is None and element.text:
+            started = parse_timestamp(element.text)
+        elif tag == 'TotalTimeSeconds' and element.text:
+            seconds += float(element.text)
+        elif tag == 'Notes':
+            notes = (element.text or '').strip()
+        elif tag == 'Trackpoint':
+            element.clear()
+        elif tag == 'Activity':
+            if started is not None:
+                yield 'sport', {
+                    'date': started.date(),
+                    'activity': sport,
+                    'duration': round(seconds / 60),
+                    'notes': notes,
+                }
+            element.clear()
+
+
+def iter_records(stream, fmt, table=None):
+    """Zwraca generator rekordów (tabela, surowy słownik) z otwartego strumienia binarnego"""
+    if fmt in ('csv', 'jsonl'):
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        parser = iter_csv if fmt == 'csv' else iter_jsonl
+        return parser(text, table)
+    if fmt == 'gpx':
+        return iter_gpx(stream, table)
+    if fmt == 'tcx':
+        return iter_tcx(stream, table)
+    raise ImportDataError(f'Nieobsługiwany format: {fmt}')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
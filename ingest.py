@@ -0,0 +1,187 @@
+"""Kolejka próbek z urządzeń (wagi, zegarki) zapisywanych w tle paczkami.
+
+Trasa /api/ingest tylko sprawdza próbki i dopisuje je do kolejki w pamięci procesu,
+więc odpowiada od razu (202). Wątek zapisujący zatwierdza zebrane próbki jedną
+transakcją, gdy jest ich co najmniej `batch_size` albo gdy najstarsza czeka
+`flush_interval` sekund. Kolejka ma ograniczoną pojemność: paczka, która się nie mieści,
+jest odrzucana w całości (IngestQueueFull), a klient ponawia ją później.
+
+Paczka, której zapis się nie udaje z powodu danych (np. naruszenie ograniczenia), od razu
+dzielona jest na połowy, więc błędna próbka nie zabiera ze sobą próbek innych kont. Tylko
+zapis przerwany blokadą bazy jest ponawiany - po kilku próbach paczka jest porzucana,
+żeby jedyny wątek zapisujący nie stał, gdy kolejka się zapełnia. Próbki przyjęte, ale jeszcze niezapisane, giną
+przy awarii procesu; przy zwykłym zakończeniu (close(), atexit) kolejka jest opróżniana.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Okno (w sekundach), z którego liczone jest tempo zapisu
+RATE_WINDOW = 10
+# Próby zapisu paczki przy blokadzie bazy, zanim zostanie porzucona
+WRITE_ATTEMPTS = 3
+
+
+def is_locked(error):
+    """Błąd blokady bazy (inny zapis trwa zbyt długo) - ponowienie zapisu może się udać"""
+    return isinstance(error, OperationalError) and any(word in str(error.orig).lower()
+                                                       for word in ('locked', 'busy'))
+
+
+class IngestQueueFull(Exception):
+    """Kolejka nie mieści paczki - należy ją ponowić później"""
+
+
+class IngestQueue:
+    """Ograniczona kolejka próbek i wątek zapisujący je paczkami (zapis grupowy)"""
+
+    def __init__(self, write=None, maxsize=50000, batch_size=1000, flush_interval=0.5):
+        self.write = write
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._items = deque()  # (czas przyjęcia, próbka)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._writing = 0
+        self._flushing = False
+        self._stopping = False
+        self._commits = deque()  # (czas, liczba próbek) zapisów z ostatnich RATE_WINDOW sekund
+        self.accepted = 0
+        self.written = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self.commit_seconds = 0.0
+
+    def init_app(self, app, write):
+        """Funkcja zapisu paczki i limity z konfiguracji (INGEST_QUEUE_SIZE, INGEST_BATCH_SIZE,
+        INGEST_FLUSH_INTERVAL); opróżnienie kolejki przy zakończeniu procesu (atexit)"""
+        self.write = write
+        self.maxsize = app.config['INGEST_QUEUE_SIZE']
+        self.batch_size = app.config['INGEST_BATCH_SIZE']
+        self.flush_interval = app.config['INGEST_FLUSH_INTERVAL']
+        # Raz na kolejkę - wątek zapisujący może być uruchamiany ponownie po close()
+        atexit.register(self.close)
+
+    def submit(self, items):
+        """Dopisuje próbki do kolejki (wszystkie albo żadnej); zwraca liczbę oczekujących"""
+        with self._condition:
+            if len(self._items) + len(items) > self.maxsize:
+                self.rejected += len(items)
+                raise IngestQueueFull(f'Kolejka zapisu jest pełna ({len(self._items)}/{self.maxsize})')
+            received = time.monotonic()
+            self._items.extend((received, item) for item in items)
+            self.accepted += len(items)
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='ingest', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+            return len(self._items)
+
+    def _ready(self):
+        if not self._items:
+            return False
+        if len(self._items) >= self.batch_size or self._flushing or self._stopping:
+            return True
+        return time.monotonic() - self._items[0][0] >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._ready():
+                    if self._stopping and not self._items:
+                        return
+                    timeout = None
+                    if self._items:
+                        timeout = max(0.0, self._items[0][0] + self.flush_interval - time.monotonic())
+                    self._condition.wait(timeout)
+                batch = [self._items.popleft()[1] for _ in range(min(self.batch_size, len(self._items)))]
+                self._writing = len(batch)
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        written = self._write_part(batch)
+        with self._condition:
+            self.failed += len(batch) - written
+            self._writing = 0
+            self._condition.notify_all()
+
+    def _write_part(self, items):
+        """Zapisuje próbki i zwraca liczbę zapisanych.
+
+        Przy blokadzie bazy zapis jest ponawiany (WRITE_ATTEMPTS razy), a przy innym błędzie
+        część dzielona jest od razu na połowy (bisekcja) - porzucane są tylko próbki, których
+        zapis się nie udaje, a nie cała paczka."""
+        for attempt in range(WRITE_ATTEMPTS):
+            started = time.perf_counter()
+            try:
+                self.write(items)
+            except Exception as error:
+                if not is_locked(error):
+                    return self._split(items, error)
+                logger.warning('Baza zablokowana - nie zapisano paczki %d próbek (próba %d)', len(items), attempt + 1)
+                if attempt + 1 < WRITE_ATTEMPTS:
+                    time.sleep(0.1 * 2 ** attempt)
+                continue
+            with self._condition:
+                self.written += len(items)
+                self.batches += 1
+                self.commit_seconds += time.perf_counter() - started
+                self._commits.append((time.monotonic(), len(items)))
+            return len(items)
+
+        logger.error('Porzucono paczkę %d próbek - baza danych pozostaje zablokowana', len(items))
+        return 0
+
+    def _split(self, items, error):
+        """Zapisuje osobno obie połowy części, której zapis zakończył się błędem `error`"""
+        if len(items) == 1:
+            logger.error('Porzucono próbkę, której nie udało się zapisać: %r', items[0], exc_info=error)
+            return 0
+        middle = len(items) // 2
+        return self._write_part(items[:middle]) + self._write_part(items[middle:])
+
+    def flush(self):
+        """Zapisuje od razu wszystkie oczekujące próbki i czeka na koniec zapisu"""
+        with self._condition:
+            self._flushing = True
+            self._condition.notify_all()
+            while self._thread is not None and (self._items or self._writing):
+                self._condition.wait()
+            self._flushing = False
+
+    def close(self):
+        """Zapisuje oczekujące próbki i kończy wątek zapisujący"""
+        with self._condition:
+            thread = self._thread
+            self._stopping = True
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join()
+        with self._condition:
+            self._thread = None
+
+    def stats(self):
+        with self._condition:
+            now = time.monotonic()
+            while self._commits and self._commits[0][0] < now - RATE_WINDOW:
+                self._commits.popleft()
+            return {
+                'queued': len(self._items),
+                'capacity': self.maxsize,
+                'accepted': self.accepted,
+                'written': self.written,
+                'rejected': self.rejected,
+                'failed': self.failed,
+                'batches': self.batches,
+                'rate_per_second': round(sum(count for at, count in self._commits) / RATE_WINDOW, 1),
+                'avg_commit_ms': round(1000 * self.commit_seconds / self.batches, 2) if self.batches else 0.0,
+            }
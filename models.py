@@ -0,0 +1,188 @@
+"""Modele bazy danych dziennika (Flask-SQLAlchemy).
+
+Rozszerzenie `db` nie jest związane z aplikacją - łączy je z nią create_app()
+w app.py przez db.init_app(). Moduł nie importuje Plotly ani NumPy, więc mogą
+z niego korzystać także moduły ładowane leniwie (charts.py).
+"""
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+
+def calculate_bmi(weight, height):
+    if weight and height:
+        height_m = height / 100
+        return round(weight / (height_m * height_m), 1)
+    return None
+
+
+class User(db.Model):
+    """Konto użytkownika - właściciel wpisów"""
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), nullable=False, unique=True)
+    password_hash = db.Column(db.String(256), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Wpisy należą do użytkownika; indeksy zaczynają się od (user_id, date), więc zapytania
+# jednego użytkownika nie zwalniają wraz z liczbą kont. Wpisy sprzed kont (user_id NULL)
+# przejmuje pierwszy zarejestrowany użytkownik.
+class SportEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    date = db.Column(db.Date, nullable=False)
+    activity = db.Column(db.String(100), nullable=False)
+    duration = db.Column(db.Integer)  # w minutach
+    notes = db.Column(db.Text)
+    photo_filename = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_sport_entry_user_date', 'user_id', 'date'),
+        # Sprawdzenie właściciela przy serwowaniu zdjęcia
+        db.Index('ix_sport_entry_user_photo', 'user_id', 'photo_filename'),
+    )
+
+
+class NutritionEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    date = db.Column(db.Date, nullable=False)
+    meal_type = db.Column(db.String(50), nullable=False)  # śniadanie, obiad, kolacja, przekąska
+    food_item = db.Column(db.String(200), nullable=False)
+    quantity = db.Column(db.String(100))
+    calories = db.Column(db.Integer)
+    water_ml = db.Column(db.Integer, default=0)
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_nutrition_entry_user_date', 'user_id', 'date'),
+        db.Index('ix_nutrition_entry_user_date_meal_type', 'user_id', 'date', 'meal_type'),
+    )
+
+
+class PersonalData(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    date = db.Column(db.Date, nullable=False)
+    measured_at = db.Column(db.DateTime)  # czas pomiaru (próbki z urządzeń, UTC)
+    weight = db.Column(db.Float)
+    height = db.Column(db.Float)  # w cm
+    body_fat = db.Column(db.Float)  # procent
+    muscle_mass = db.Column(db.Float)  # kg
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_personal_data_user_date', 'user_id', 'date'),
+    )
+
+    @property
+    def bmi(self):
+        return calculate_bmi(self.weight, self.height)
+
+
+# Pomiary z urządzeń starsze niż okres surowych danych trafiają do agregatów godzinowych,
+# a potem dziennych (retention.py). Dla każdej miary: minimum, średnia, maksimum i liczba
+# próbek, z których ją policzono (potrzebna przy łączeniu agregatów)
+ROLLUP_METRICS = ('weight', 'height', 'body_fat', 'muscle_mass')
+ROLLUP_STATS = ('min', 'mean', 'max', 'count')
+
+
+def rollup_model(name, table_name, bucket_type, doc):
+    attributes = {
+        '__doc__': doc,
+        '__tablename__': table_name,
+        'user_id': db.Column(db.Integer, primary_key=True),
+        'bucket': db.Column(bucket_type, primary_key=True),
+        'samples': db.Column(db.Integer, nullable=False, default=0),
+    }
+    for metric in ROLLUP_METRICS:
+        attributes[f'{metric}_min'] = db.Column(db.Float)
+        attributes[f'{metric}_mean'] = db.Column(db.Float)
+        attributes[f'{metric}_max'] = db.Column(db.Float)
+        attributes[f'{metric}_count'] = db.Column(db.Integer, nullable=False, default=0)
+    return type(name, (db.Model,), attributes)
+
+
+PersonalHourly = rollup_model('PersonalHourly', 'personal_hourly', db.DateTime,
+                              'Godzinowe agregaty pomiarów starszych niż okres surowych danych')
+PersonalDaily = rollup_model('PersonalDaily', 'personal_daily', db.Date,
+                             'Dzienne agregaty pomiarów starszych niż okres agregatów godzinowych')
+
+
+class DataVersion(db.Model):
+    """Licznik wersji danych tabeli użytkownika - zwiększany przy każdej zmianie wpisów"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Photo(db.Model):
+    """Plik w magazynie zdjęć i liczba wpisów, które go używają"""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(200), nullable=False, unique=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Kolumny liczników posiłków w podsumowaniu dziennym
+MEAL_TYPE_COLUMNS = {
+    'śniadanie': 'breakfast_count',
+    'obiad': 'lunch_count',
+    'kolacja': 'dinner_count',
+    'przekąska': 'snack_count',
+}
+
+
+class DailySummary(db.Model):
+    """Zmaterializowane dzienne agregaty dla wykresów (aktualizowane przy każdym zapisie)"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    calories = db.Column(db.Integer, nullable=False, default=0)
+    calories_count = db.Column(db.Integer, nullable=False, default=0)  # posiłki z podanymi kaloriami
+    water_ml = db.Column(db.Integer, nullable=False, default=0)
+    workout_minutes = db.Column(db.Integer, nullable=False, default=0)
+    workout_count = db.Column(db.Integer, nullable=False, default=0)
+    timed_workout_count = db.Column(db.Integer, nullable=False, default=0)  # treningi z podanym czasem
+    breakfast_count = db.Column(db.Integer, nullable=False, default=0)
+    lunch_count = db.Column(db.Integer, nullable=False, default=0)
+    dinner_count = db.Column(db.Integer, nullable=False, default=0)
+    snack_count = db.Column(db.Integer, nullable=False, default=0)
+    other_meal_count = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def meal_count(self):
+        return (self.breakfast_count + self.lunch_count + self.dinner_count
+                + self.snack_count + self.other_meal_count)
+
+    @property
+    def is_empty(self):
+        return self.workout_count == 0 and self.meal_count == 0
+
+
+class Goal(db.Model):
+    """Cel użytkownika: dzienny albo tygodniowy próg miary z podsumowań (goals.py)"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)  # kolumna DailySummary, np. water_ml
+    period = db.Column(db.String(10), primary_key=True)  # 'day' albo 'week'
+    target = db.Column(db.Integer, nullable=False)
+    best_streak = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class GoalPeriod(db.Model):
+    """Postęp celu w jednym okresie (dzień lub tydzień od poniedziałku) i długość serii
+    spełnionych okresów kończącej się na nim - aktualizowane przy każdej zmianie wpisów"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)
+    period = db.Column(db.String(10), primary_key=True)
+    start = db.Column(db.Date, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    met = db.Column(db.Boolean, nullable=False, default=False)
+    streak = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,181 @@
+"""Pomiary wydajności żądań: zapytania SQL, wykresy, renderowanie szablonów.
+
+Dla każdego żądania liczone są zapytania SQL i ich łączny czas oraz czasy
+nazwanych etapów (np. budowy wykresu, renderowania szablonu). Wynik trafia do
+nagłówka Server-Timing i do raportu najwolniejszych tras i zapytań, dostępnego
+pod /debug/perf tylko dla kont z PERF_ADMINS - raport obejmuje żądania wszystkich
+użytkowników, więc zapisywane są w nim ścieżki bez parametrów zapytania (np. szukanych
+fraz). Wyłączony monitor nie rejestruje żadnych zdarzeń ani tras, a span() zwraca
+pusty kontekst.
+"""
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+from flask import (before_render_template, current_app, g, has_request_context, jsonify, request, session,
+                   template_rendered)
+from sqlalchemy import event
+
+# Liczba ostatnich czasów trasy, z których liczony jest p95
+ROUTE_WINDOW = 200
+SLOWEST_LIMIT = 20
+
+
+def normalize_sql(statement):
+    """Zapytanie bez zbędnych odstępów i z ujednoliconymi listami parametrów IN"""
+    statement = ' '.join(statement.split())
+    return re.sub(r'\((?:\?, )+\?\)', '(?, ...)', statement)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.spans = defaultdict(float)
+
+
+class PerfMonitor:
+    """Bieżący raport najwolniejszych tras i zapytań w obrębie procesu"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._queries = {}
+        self._slowest = []
+
+    def init_app(self, app, engine):
+        if not app.config.get('PERF_ENABLED'):
+            return
+        self.enabled = True
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/debug/perf', 'debug_perf', self._report_view)
+
+    @contextmanager
+    def _span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = g.get('perf') if has_request_context() else None
+            if stats is not None:
+                stats.spans[name] += time.perf_counter() - started
+
+    def span(self, name):
+        """Mierzy czas bloku jako etap żądania (np. `chart_weight`)"""
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name)
+
+    def _before_request(self):
+        g.perf = RequestStats()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['perf_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop('perf_started')
+        stats = g.get('perf') if has_request_context() else None
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += elapsed
+
+        key = normalize_sql(statement)
+        with self._lock:
+            query = self._queries.get(key)
+            if query is None:
+                query = self._queries[key] = {'count': 0, 'total': 0.0, 'max': 0.0}
+            query['count'] += 1
+            query['total'] += elapsed
+            query['max'] = max(query['max'], elapsed)
+
+    def _before_render(self, sender, template, context, **extra):
+        if g.get('perf') is not None:
+            g.perf_render_started = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        started = g.pop('perf_render_started', None)
+        if started is not None:
+            g.perf.spans['render'] += time.perf_counter() - started
+
+    def _after_request(self, response):
+        stats = g.pop('perf', None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+
+        timings = [f'db;dur={1000 * stats.sql_seconds:.2f};desc="SQL ({stats.queries})"']
+        timings += [f'{name};dur={1000 * seconds:.2f}' for name, seconds in stats.spans.items()]
+        timings.append(f'total;dur={1000 * total:.2f}')
+        response.headers.add('Server-Timing', ', '.join(timings))
+
+        route = request.url_rule.rule if request.url_rule else '<404>'
+        if route != '/debug/perf':
+            self._record(route, total, stats)
+        return response
+
+    def _record(self, route, total, stats):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {'count': 0, 'total': 0.0, 'max': 0.0, 'queries': 0,
+                                               'recent': deque(maxlen=ROUTE_WINDOW)}
+            entry['count'] += 1
+            entry['total'] += total
+            entry['max'] = max(entry['max'], total)
+            entry['queries'] += stats.queries
+            entry['recent'].append(total)
+
+            self._slowest.append({
+                'url': request.path,
+                'ms': round(1000 * total, 2),
+                'sql_ms': round(1000 * stats.sql_seconds, 2),
+                'queries': stats.queries,
+                'spans': {name: round(1000 * seconds, 2) for name, seconds in stats.spans.items()},
+            })
+            self._slowest.sort(key=lambda item: item['ms'], reverse=True)
+            del self._slowest[SLOWEST_LIMIT:]
+
+    def report(self):
+        with self._lock:
+            routes = []
+            for route, entry in self._routes.items():
+                recent = sorted(entry['recent'])
+                routes.append({
+                    'route': route,
+                    'count': entry['count'],
+                    'mean_ms': round(1000 * entry['total'] / entry['count'], 2),
+                    'p95_ms': round(1000 * recent[min(len(recent) - 1, int(0.95 * len(recent)))], 2),
+                    'max_ms': round(1000 * entry['max'], 2),
+                    'queries_per_request': round(entry['queries'] / entry['count'], 1),
+                })
+            queries = [{'sql': sql, 'count': entry['count'],
+                        'total_ms': round(1000 * entry['total'], 2),
+                        'max_ms': round(1000 * entry['max'], 2)}
+                       for sql, entry in self._queries.items()]
+            slowest = list(self._slowest)
+
+        routes.sort(key=lambda item: item['p95_ms'], reverse=True)
+        queries.sort(key=lambda item: item['total_ms'], reverse=True)
+        return {'routes': routes, 'queries': queries[:SLOWEST_LIMIT], 'slowest_requests': slowest}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._queries.clear()
+            self._slowest.clear()
+
+    def _report_view(self):
+        if session.get('username') not in current_app.config['PERF_ADMINS']:
+            return jsonify({'error': 'Brak uprawnień'}), 403
+        if request.args.get('reset'):
+            self.reset()
+        return jsonify(self.report())
@@ -0,0 +1,100 @@
+"""Magazyn zdjęć adresowany treścią.
+
+Zdjęcie zapisywane jest pod nazwą wynikającą ze skrótu SHA-256 jego bajtów
+po usunięciu metadanych: `<dwa pierwsze znaki skrótu>/<skrót><rozszerzenie>`.
+Upload trafia na dysk kawałkami przez HashingFile, który liczy skrót w trakcie
+zapisu, więc plik nie jest trzymany w pamięci ani czytany drugi raz; kopia bez
+metadanych powstaje w drugim HashingFile tylko wtedy, gdy jest co usuwać.
+Treść pliku o takiej nazwie nigdy się nie zmienia. Liczniki odwołań
+przechowuje tabela `photo` (model Photo w app.py).
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+from images import strip_metadata
+
+TMP_DIR = '.tmp'
+CHUNK_SIZE = 64 * 1024
+# Nazwa z magazynu albo jej wariant (`variants/<nazwa>.<wariant>.webp`)
+CONTENT_NAME = re.compile(r'(?:variants/)?([0-9a-f]{2})/\1[0-9a-f]{62}\.[\w.]+')
+
+
+class HashingFile:
+    """Plik tymczasowy, który liczy SHA-256 zapisywanych danych"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def close(self):
+        """Zamyka plik; plik tymczasowy nieprzeniesiony do magazynu jest usuwany"""
+        self._file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def spool(folder, stream):
+    """Kopiuje dowolny strumień do HashingFile (np. pliki spoza formularza)"""
+    upload = HashingFile(os.path.join(folder, TMP_DIR))
+    shutil.copyfileobj(stream, upload, CHUNK_SIZE)
+    return upload
+
+
+def sanitize(folder, upload):
+    """Upload bez metadanych: ten sam plik albo nowy HashingFile z oczyszczoną kopią"""
+    clean = HashingFile(os.path.join(folder, TMP_DIR))
+    try:
+        stripped = strip_metadata(upload, clean)
+    except (OSError, ValueError):
+        # Plik nierozpoznany przez Pillow zapisywany jest bez zmian (warianty nie powstaną)
+        stripped = False
+    if not stripped:
+        clean.close()
+        return upload
+    upload.close()
+    return clean
+
+
+def content_name(digest, ext):
+    return f'{digest[:2]}/{digest}{ext}'
+
+
+def is_content_name(filename):
+    """Czy plik jest adresowany treścią (zdjęcia sprzed magazynu mają nazwy z datą)"""
+    return CONTENT_NAME.fullmatch(filename) is not None
+
+
+def store_upload(folder, upload, ext):
+    """Przenosi plik tymczasowy do magazynu i zwraca jego nazwę względną.
+
+    Jeśli plik o tej treści już jest na dysku, kopia tymczasowa jest usuwana.
+    """
+    name = content_name(upload.hexdigest(), ext)
+    target = os.path.join(folder, name)
+    upload.flush()
+    if os.path.exists(target):
+        upload.close()
+        return name
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(upload.path, target)
+    upload.path = None
+    upload.close()
+    return name
@@ -0,0 +1,91 @@
+"""Kontrola planów zapytań SQLite dla tras aplikacji.
+
+Każda trasa jest wywoływana przez klienta testowego Flask zalogowanego jako wybrany
+użytkownik, a każde wykonane zapytanie SELECT, UPDATE i DELETE jest sprawdzane przez
+EXPLAIN QUERY PLAN. Pełne przeszukanie tabeli, która rośnie z historią (SCAN bez
+indeksu), jest zgłaszane jako błąd. Korzystają z tego polecenie `check-query-plans`
+(tylko trasy odczytu, na bieżącej bazie) i test tests/test_query_plans.py.
+"""
+from datetime import date
+
+from sqlalchemy import event
+
+# Tabele, które rosną z historią - ich pełny skan to regresja
+CHECKED_TABLES = ('sport_entry', 'nutrition_entry', 'personal_data', 'daily_summary', 'goal_period',
+                  'personal_hourly', 'personal_daily')
+# Zapytania, których plany są sprawdzane
+CHECKED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def default_urls(chart_names, today=None):
+    """Trasy odczytu do sprawdzenia (z przykładowymi datami z bieżącego miesiąca)"""
+    today = today or date.today()
+    month_start = today.replace(day=1).isoformat()
+    urls = ['/', '/sport', '/nutrition', '/personal', '/calendar',
+            f'/api/calendar?month={today.strftime("%Y-%m")}', f'/api/calendar?year={today.year}',
+            f'/day/{today.isoformat()}', f'/api/days?from={month_start}&to={today.isoformat()}', '/sport/edit/1', '/nutrition/edit/1',
+            f'/export?format=ndjson&from={month_start}&to={today.isoformat()}',
+            # Kolejne strony list (kursor) z filtrami
+            f'/sport?after={today.isoformat()}_1&activity=Bieg',
+            f'/sport?before={month_start}_1&from={month_start}',
+            f'/nutrition?after={today.isoformat()}_1&meal_type=obiad',
+            f'/nutrition?before={month_start}_1&to={today.isoformat()}']
+    urls += ['/api/analytics', f'/api/analytics?from={month_start}&to={today.isoformat()}']
+    urls += [f'/api/charts/{name}' for name in chart_names]
+    urls += [f'/api/charts/{name}?from={month_start}&to={today.isoformat()}' for name in chart_names]
+    urls += ['/search?q=owsianka', '/api/search?q=bieg&kind=sport', '/goals', '/api/goals']
+    urls.append(f'/api/charts?format=compact&from={month_start}&to={today.isoformat()}')
+    # Pomiary w rozdzielczości godzinowej i dziennej (agregaty retention.py)
+    urls += [f'/api/charts/weight?max_points={max_points}' for max_points in (20, 2000)]
+    return urls
+
+
+def capture_queries(app, db, urls, user_id, posts=()):
+    """Zwraca listę (url, zapytanie, parametry) dla zapytań wykonanych przez trasy.
+
+    `urls` wywoływane są przez GET, a `posts` to pary (url, dane formularza) dla POST."""
+    captured = []
+    current = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(CHECKED_STATEMENTS):
+            captured.append((current['url'], statement, parameters))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for url in urls:
+            current['url'] = url
+            client.get(url)
+        for url, data in posts:
+            current['url'] = url
+            client.post(url, data=data)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return captured
+
+
+def full_scans(details):
+    """Wiersze planu oznaczające pełny skan sprawdzanej tabeli"""
+    problems = []
+    for detail in details:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == 'SCAN' and words[1] in CHECKED_TABLES and 'USING' not in words:
+            problems.append(detail)
+    return problems
+
+
+def check_query_plans(app, db, urls, user_id, posts=()):
+    """Zwraca listę (url, zapytanie, opis) zapytań wykonujących pełny skan tabeli"""
+    failures = []
+    with app.app_context():
+        queries = capture_queries(app, db, urls, user_id, posts)
+        with db.engine.connect() as connection:
+            for url, statement, parameters in queries:
+                plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+                details = [row[-1] for row in plan]
+                failures.extend((url, ' '.join(statement.split()), detail)
+                                for detail in full_scans(details))
+    return failures
@@ -0,0 +1,249 @@
+"""Poziomy przechowywania pomiarów: surowe próbki, agregaty godzinowe i dzienne.
+
+Próbki z urządzeń (z `measured_at`, bez notatek) starsze niż `raw_days` dni są
+przenoszone przez compact() do tabeli personal_hourly, a agregaty godzinowe starsze
+niż `hourly_days` dni - do personal_daily. Agregat przechowuje dla każdej miary
+minimum, średnią, maksimum i liczbę próbek, więc łączenie agregatów (kolejne
+kompaktowanie, próbki spóźnione) daje te same średnie co surowe dane.
+
+Wpisy dodane ręcznie (bez `measured_at` albo z notatką) zostają w tabeli surowej.
+
+Wykresy i analizy czytają przez load_series() wszystkie poziomy naraz, zgrupowane do
+rozdzielczości ('raw', 'hour', 'day') wybranej przez series_resolution() - gdy w zakresie
+są agregaty, a wierszy jest więcej niż punktów wykresu: im dłuższy zakres, tym grubsza
+rozdzielczość i mniej wierszy do odczytania. Same wpisy ręczne zostają surowe.
+"""
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func, select
+
+from models import db, PersonalData, PersonalHourly, PersonalDaily, ROLLUP_METRICS
+
+RESOLUTIONS = ('raw', 'hour', 'day')
+# Początek godziny w formacie kolumn DateTime SQLite
+HOUR_FORMAT = '%Y-%m-%d %H:00:00'
+
+
+def choose_resolution(span_days, max_points=None):
+    """Najgrubsza rozdzielczość, która daje jeszcze co najmniej `max_points` punktów
+    w zakresie `span_days` dni (bez limitu punktów - surowe dane)"""
+    if not max_points:
+        return 'raw'
+    if span_days >= max_points:
+        return 'day'
+    if span_days * 24 >= max_points:
+        return 'hour'
+    return 'raw'
+
+
+def empty_group():
+    group = {'samples': 0}
+    for metric in ROLLUP_METRICS:
+        group.update({f'{metric}_min': None, f'{metric}_max': None, f'{metric}_sum': 0.0, f'{metric}_count': 0})
+    return group
+
+
+def add_group(group, other):
+    """Dołącza do `group` agregat `other` (słowniki z empty_group())"""
+    group['samples'] += other['samples']
+    for metric in ROLLUP_METRICS:
+        count = other[f'{metric}_count']
+        if not count:
+            continue
+        low, high = other[f'{metric}_min'], other[f'{metric}_max']
+        if group[f'{metric}_count']:
+            low = min(low, group[f'{metric}_min'])
+            high = max(high, group[f'{metric}_max'])
+        group[f'{metric}_min'], group[f'{metric}_max'] = low, high
+        group[f'{metric}_sum'] += other[f'{metric}_sum']
+        group[f'{metric}_count'] += count
+    return group
+
+
+def group_means(group):
+    return tuple(group[f'{metric}_sum'] / group[f'{metric}_count'] if group[f'{metric}_count'] else None
+                 for metric in ROLLUP_METRICS)
+
+
+def aggregate_columns(model):
+    """Kolumny zapytania dające agregat w kształcie empty_group() - z próbek albo z agregatów"""
+    if model is PersonalData:
+        columns = [func.count().label('samples')]
+        for metric in ROLLUP_METRICS:
+            column = getattr(PersonalData, metric)
+            columns += [func.min(column).label(f'{metric}_min'), func.max(column).label(f'{metric}_max'),
+                        func.coalesce(func.sum(column), 0.0).label(f'{metric}_sum'),
+                        func.count(column).label(f'{metric}_count')]
+        return columns
+
+    columns = [func.sum(model.samples).label('samples')]
+    for metric in ROLLUP_METRICS:
+        mean, count = getattr(model, f'{metric}_mean'), getattr(model, f'{metric}_count')
+        columns += [func.min(getattr(model, f'{metric}_min')).label(f'{metric}_min'),
+                    func.max(getattr(model, f'{metric}_max')).label(f'{metric}_max'),
+                    func.coalesce(func.sum(mean * count), 0.0).label(f'{metric}_sum'),
+                    func.sum(count).label(f'{metric}_count')]
+    return columns
+
+
+def bucket_expression(model, resolution):
+    """Wyrażenie SQL początku godziny ('hour') albo dnia ('day') wiersza danego poziomu"""
+    if model is PersonalData:
+        moment = func.coalesce(PersonalData.measured_at, PersonalData.date)
+    else:
+        moment = model.bucket
+    if resolution == 'hour':
+        return func.strftime(HOUR_FORMAT, moment, type_=db.DateTime)
+    return func.date(moment, type_=db.Date)
+
+
+def aggregate(session, model, resolution, filters):
+    """{początek przedziału: agregat} wierszy poziomu `model` spełniających `filters`"""
+    bucket = bucket_expression(model, resolution).label('bucket')
+    rows = session.execute(select(bucket, *aggregate_columns(model)).where(*filters).group_by(bucket))
+    return {row.bucket: row._asdict() for row in rows}
+
+
+def range_filters(model, user_id, date_from=None, date_to=None):
+    """Filtry zakresu dat (włącznie) dla poziomu `model`"""
+    filters = [model.user_id == user_id]
+    if model is PersonalData:
+        if date_from:
+            filters.append(PersonalData.date >= date_from)
+        if date_to:
+            filters.append(PersonalData.date <= date_to)
+    elif model is PersonalHourly:
+        if date_from:
+            filters.append(PersonalHourly.bucket >= datetime.combine(date_from, time()))
+        if date_to:
+            filters.append(PersonalHourly.bucket < datetime.combine(date_to + timedelta(days=1), time()))
+    else:
+        if date_from:
+            filters.append(PersonalDaily.bucket >= date_from)
+        if date_to:
+            filters.append(PersonalDaily.bucket <= date_to)
+    return filters
+
+
+def row_count(session, model, user_id, date_from=None, date_to=None):
+    """Liczba wierszy poziomu `model` w zakresie dat"""
+    return session.query(func.count()).select_from(model)\
+        .filter(*range_filters(model, user_id, date_from, date_to)).scalar()
+
+
+def series_resolution(session, user_id, date_from=None, date_to=None, max_points=None):
+    """Rozdzielczość load_series() dla zakresu: surowa, gdy w zakresie nie ma agregatów
+    (wpisy ręczne i świeże próbki - wykres próbkuje je sam) albo gdy wszystkich wierszy
+    jest najwyżej `max_points`; w przeciwnym razie z długości zakresu (choose_resolution())"""
+    if not max_points:
+        return 'raw'
+    rollups = sum(row_count(session, model, user_id, date_from, date_to) for model in (PersonalHourly, PersonalDaily))
+    if not rollups or rollups + row_count(session, PersonalData, user_id, date_from, date_to) <= max_points:
+        return 'raw'
+    return choose_resolution(span_days(session, user_id, date_from, date_to), max_points)
+
+
+def span_days(session, user_id, date_from=None, date_to=None):
+    """Długość zakresu w dniach; brakujące końce uzupełniane datami skrajnych pomiarów"""
+    if date_from is None or date_to is None:
+        bounds = [session.query(func.min(PersonalData.date), func.max(PersonalData.date))
+                  .filter(PersonalData.user_id == user_id).one(),
+                  session.query(func.min(func.date(PersonalHourly.bucket, type_=db.Date)),
+                                func.max(func.date(PersonalHourly.bucket, type_=db.Date)))
+                  .filter(PersonalHourly.user_id == user_id).one(),
+                  session.query(func.min(PersonalDaily.bucket), func.max(PersonalDaily.bucket))
+                  .filter(PersonalDaily.user_id == user_id).one()]
+        firsts = [first for first, last in bounds if first]
+        lasts = [last for first, last in bounds if last]
+        if not firsts:
+            return 0
+        date_from = date_from or min(firsts)
+        date_to = date_to or max(lasts)
+    return max((date_to - date_from).days + 1, 0)
+
+
+def as_moment(value):
+    """Data jako północ tego dnia - wspólny typ osi dla rozdzielczości 'raw' i 'hour'"""
+    return value if isinstance(value, datetime) else datetime.combine(value, time())
+
+
+def load_series(session, user_id, resolution, date_from=None, date_to=None):
+    """Pomiary ze wszystkich poziomów w danej rozdzielczości, posortowane w czasie.
+
+    Zwraca wiersze (chwila, waga, wzrost, tkanka tłuszczowa, masa mięśniowa) - średnie
+    z przedziału. Chwila to `date` dla 'day' i `datetime` dla 'raw' i 'hour' (o ile są
+    próbki z godziną pomiaru)."""
+    points = []
+    groups = {}
+    for model in (PersonalData, PersonalHourly, PersonalDaily):
+        filters = range_filters(model, user_id, date_from, date_to)
+        if model is PersonalData and resolution == 'raw':
+            rows = session.query(PersonalData.date, PersonalData.measured_at,
+                                 *(getattr(PersonalData, metric) for metric in ROLLUP_METRICS)).filter(*filters)
+            points += [(row[1] or row[0],) + tuple(row[2:]) for row in rows]
+            continue
+        # Agregaty pokazywane są najwyżej w swojej rozdzielczości
+        level = 'day' if resolution == 'day' or model is PersonalDaily else 'hour'
+        for bucket, group in aggregate(session, model, level, filters).items():
+            add_group(groups.setdefault(bucket, empty_group()), group)
+
+    points += [(bucket,) + group_means(group) for bucket, group in groups.items()]
+    # Same wpisy ręczne zostają z osią dat; przy próbkach z godziną wszystkie chwile to datetime
+    if any(isinstance(point[0], datetime) for point in points):
+        points = [(as_moment(point[0]),) + point[1:] for point in points]
+    points.sort(key=lambda point: point[0])
+    return points
+
+
+def store(session, model, user_id, groups):
+    """Zapisuje agregaty {przedział: agregat} poziomu `model`, łącząc je z istniejącymi"""
+    if not groups:
+        return
+    existing = session.query(model).filter(model.user_id == user_id, model.bucket.in_(list(groups))).all()
+    for row in existing:
+        stored = {'samples': row.samples}
+        for metric in ROLLUP_METRICS:
+            count = getattr(row, f'{metric}_count')
+            stored.update({f'{metric}_min': getattr(row, f'{metric}_min'),
+                           f'{metric}_max': getattr(row, f'{metric}_max'),
+                           f'{metric}_sum': (getattr(row, f'{metric}_mean') or 0.0) * count,
+                           f'{metric}_count': count})
+        add_group(groups[row.bucket], stored)
+        session.delete(row)
+    session.flush()
+
+    rows = []
+    for bucket, group in groups.items():
+        row = {'user_id': user_id, 'bucket': bucket, 'samples': group['samples']}
+        for metric, mean in zip(ROLLUP_METRICS, group_means(group)):
+            row.update({f'{metric}_min': group[f'{metric}_min'], f'{metric}_mean': mean,
+                        f'{metric}_max': group[f'{metric}_max'], f'{metric}_count': group[f'{metric}_count']})
+        rows.append(row)
+    session.execute(model.__table__.insert(), rows)
+
+
+def compact(session, user_id, today, raw_days, hourly_days):
+    """Przenosi stare próbki użytkownika do agregatów godzinowych, a stare agregaty
+    godzinowe do dziennych (bez zatwierdzania transakcji).
+
+    Zwraca liczby przeniesionych wierszy {'raw': ..., 'hourly': ...}."""
+    moved = {'raw': 0, 'hourly': 0}
+
+    # Tylko próbki, które już są w bazie - nowe (zapisywane w tle) poczekają do następnego razu
+    last_id = session.query(func.max(PersonalData.id)).scalar()
+    if last_id is not None:
+        filters = [PersonalData.user_id == user_id, PersonalData.id <= last_id,
+                   PersonalData.measured_at.isnot(None), PersonalData.date < today - timedelta(days=raw_days),
+                   func.coalesce(PersonalData.notes, '') == '']
+        groups = aggregate(session, PersonalData, 'hour', filters)
+        if groups:
+            store(session, PersonalHourly, user_id, groups)
+            moved['raw'] = session.query(PersonalData).filter(*filters).delete(synchronize_session=False)
+
+    cutoff = datetime.combine(today - timedelta(days=hourly_days), time())
+    filters = [PersonalHourly.user_id == user_id, PersonalHourly.bucket < cutoff]
+    groups = aggregate(session, PersonalHourly, 'day', filters)
+    if groups:
+        store(session, PersonalDaily, user_id, groups)
+        moved['hourly'] = session.query(PersonalHourly).filter(*filters).delete(synchronize_session=False)
+    return moved
@@ -0,0 +1,168 @@
+"""Wyszukiwanie pełnotekstowe w treningach, posiłkach i notatkach (SQLite FTS5).
+
+Indeks search_index ma dwie kolumny: title (aktywność albo potrawa) i notes. Wiersz
+indeksu ma rowid = id użytkownika * USER_STRIDE + id wpisu * ROWID_STRIDE + kod tabeli,
+dzięki czemu da się go usunąć bez szukania, a wpisy jednego użytkownika zajmują ciągły
+przedział rowid (wyszukiwanie zawęża się do niego). Indeks aktualizują wyzwalacze SQLite,
+więc obejmuje wpisy z formularzy, z importu i z generatora danych. Pomiary (bez tytułu)
+trafiają do indeksu tylko z niepustą notatką - próbki z urządzeń nie powiększają go.
+
+Tokenizer unicode61 usuwa polskie znaki diakrytyczne poza "ł". Tę literę zamieniają
+na "l" wyzwalacze (fold_sql) i zapytania (fold).
+"""
+import re
+
+from sqlalchemy import text
+
+INDEX_TABLE = 'search_index'
+ROWID_STRIDE = 4
+# Przedział rowid jednego użytkownika (id wpisów poniżej 2**38)
+USER_STRIDE = 2 ** 40
+
+SOURCES = {
+    # rodzaj wpisu: (tabela, kod w rowid, kolumna tytułu)
+    'sport': ('sport_entry', 1, 'activity'),
+    'nutrition': ('nutrition_entry', 2, 'food_item'),
+    'personal': ('personal_data', 3, None),
+}
+KINDS_BY_CODE = {code: kind for kind, (table, code, title) in SOURCES.items()}
+
+# Waga dopasowania w tytule względem notatek w rankingu bm25
+TITLE_WEIGHT = 5.0
+TOKEN = re.compile(r'\w+')
+
+
+def fold(value):
+    return value.replace('ł', 'l').replace('Ł', 'L')
+
+
+def fold_sql(expression):
+    return f"replace(replace({expression}, 'ł', 'l'), 'Ł', 'L')"
+
+
+def rowid_sql(prefix, code):
+    return f'coalesce({prefix}.user_id, 0) * {USER_STRIDE} + {prefix}.id * {ROWID_STRIDE} + {code}'
+
+
+def row_values(prefix, code, title):
+    """Wartości (rowid, title, notes) wiersza indeksu dla wiersza `prefix` (NEW, OLD, tabela)"""
+    title_sql = fold_sql(f'{prefix}.{title}') if title else "''"
+    return f'{rowid_sql(prefix, code)}, {title_sql}, {fold_sql(f"{prefix}.notes")}'
+
+
+def indexed_sql(prefix, title):
+    """Warunek SQL zaindeksowania wiersza: wpisy bez tytułu (pomiary) tylko z notatką; None - zawsze"""
+    return None if title else f"coalesce({prefix}.notes, '') != ''"
+
+
+def when_sql(prefix, title):
+    condition = indexed_sql(prefix, title)
+    return f' WHEN {condition}' if condition else ''
+
+
+def schema_statements():
+    """Instrukcje tworzące indeks i wyzwalacze (bezpieczne przy ponownym wykonaniu)"""
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+        f"title, notes, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ]
+    for table, code, title in SOURCES.values():
+        insert = f'INSERT INTO {INDEX_TABLE}(rowid, title, notes) SELECT {row_values("NEW", code, title)}'
+        delete = f'DELETE FROM {INDEX_TABLE} WHERE rowid = {rowid_sql("OLD", code)}'
+        columns = ', '.join(column for column in ('user_id', title, 'notes') if column)
+        # Przy zmianie wiersz indeksu usuwany jest zawsze, a dodawany tylko dla wierszy spełniających warunek
+        condition = indexed_sql('NEW', title)
+        update_insert = f'{insert} WHERE {condition}' if condition else insert
+        statements += [
+            f'CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table}{when_sql("NEW", title)} '
+            f'BEGIN {insert}; END',
+            f'CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table}{when_sql("OLD", title)} '
+            f'BEGIN {delete}; END',
+            f'CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {columns} ON {table} '
+            f'BEGIN {delete}; {update_insert}; END',
+        ]
+    return statements
+
+
+def has_index(session):
+    return session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                           {'name': INDEX_TABLE}).first() is not None
+
+
+def trigger_names():
+    return [f'{table}_search_{event}' for table, code, title in SOURCES.values()
+            for event in ('insert', 'delete', 'update')]
+
+
+def is_current(session):
+    """Czy zapisane w bazie wyzwalacze są takie jak w schema_statements() (np. ten sam układ rowid)"""
+    stored = dict(session.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE :pattern"),
+        {'pattern': '%_search_%'}).all())
+    expected = [statement.replace(' IF NOT EXISTS', '') for statement in schema_statements()[1:]]
+    return [stored.get(name) for name in trigger_names()] == expected
+
+
+def drop_index(session):
+    for name in trigger_names():
+        session.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+    session.execute(text(f'DROP TABLE IF EXISTS {INDEX_TABLE}'))
+
+
+def ensure_index(session):
+    """Tworzy indeks i wyzwalacze (przebudowuje je po zmianie ich definicji); nowy indeks
+    wypełnia istniejącymi wpisami. Zwraca True, gdy powstał"""
+    if has_index(session) and not is_current(session):
+        drop_index(session)
+    created = not has_index(session)
+    for statement in schema_statements():
+        session.execute(text(statement))
+    if created:
+        fill_index(session)
+    return created
+
+
+def fill_index(session):
+    for table, code, title in SOURCES.values():
+        condition = indexed_sql(table, title)
+        session.execute(text(f'INSERT INTO {INDEX_TABLE}(rowid, title, notes) '
+                             f'SELECT {row_values(table, code, title)} FROM {table}'
+                             + (f' WHERE {condition}' if condition else '')))
+
+
+def rebuild_index(session):
+    """Buduje indeks od zera i scala jego segmenty; zwraca liczbę zaindeksowanych wpisów"""
+    session.execute(text(f'DELETE FROM {INDEX_TABLE}'))
+    fill_index(session)
+    session.execute(text(f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('optimize')"))
+    return session.execute(text(f'SELECT count(*) FROM {INDEX_TABLE}')).scalar()
+
+
+def fts_query(phrase):
+    """Zapytanie FTS5 z tekstu użytkownika: wszystkie słowa, każde jako prefiks ("owsi" -> owsianka).
+
+    None, gdy w tekście nie ma żadnego słowa."""
+    tokens = TOKEN.findall(fold(phrase))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search(session, user_id, phrase, kind=None, limit=20, offset=0):
+    """Najlepiej pasujące wpisy użytkownika jako lista (rodzaj, id, wynik); mniejszy wynik = lepsze dopasowanie"""
+    query = fts_query(phrase)
+    if query is None:
+        return []
+    params = {'query': query, 'limit': limit, 'offset': offset,
+              'low': user_id * USER_STRIDE, 'high': (user_id + 1) * USER_STRIDE - 1}
+    kind_filter = ''
+    if kind:
+        kind_filter = f'AND rowid % {ROWID_STRIDE} = :code'
+        params['code'] = SOURCES[kind][1]
+    rows = session.execute(text(
+        f'SELECT rowid, bm25({INDEX_TABLE}, {TITLE_WEIGHT}, 1.0) AS score FROM {INDEX_TABLE} '
+        f'WHERE {INDEX_TABLE} MATCH :query AND rowid BETWEEN :low AND :high {kind_filter} '
+        f'ORDER BY score, rowid DESC LIMIT :limit OFFSET :offset'
+    ), params)
+    return [(KINDS_BY_CODE[rowid % ROWID_STRIDE], rowid % USER_STRIDE // ROWID_STRIDE, score)
+            for rowid, score in rows]
@@ -0,0 +1,117 @@
+"""Deterministyczny generator realistycznych danych dziennika z wielu lat.
+
+Ten sam seed, parametry i data końcowa dają zawsze te same wiersze. Generator zwraca paczki
+słowników kolumn dla tabel 'sport', 'nutrition' i 'personal' (jak importer),
+a zapisem zajmuje się wywołujący (polecenie `generate-data`, benchmarki).
+
+Model danych:
+- treningi w ok. 4 dniach tygodnia (częściej w weekend), czasem dwa jednego dnia,
+- 3-5 posiłków dziennie z kaloriami zależnymi od typu posiłku i wodą,
+- pomiar wagi co 1-4 dni: waga zmienia się zgodnie z bilansem kalorii i treningami,
+  tkanka tłuszczowa i masa mięśniowa podążają za wagą.
+"""
+import random
+from datetime import date, timedelta
+
+ACTIVITIES = (
+    # nazwa, waga losowania, (min, max) minut, kcal na minutę
+    ('Bieganie', 30, (20, 75), 11),
+    ('Rower', 20, (30, 150), 8),
+    ('Siłownia', 25, (40, 90), 6),
+    ('Pływanie', 10, (30, 60), 9),
+    ('Joga', 10, (20, 60), 3),
+    ('Spacer', 5, (30, 120), 4),
+)
+
+MEALS = {
+    # typ posiłku: (potrawy, (min, max) kcal)
+    'śniadanie': (('Owsianka z owocami', 'Jajecznica', 'Kanapki z serem', 'Jogurt z granolą'), (300, 650)),
+    'obiad': (('Kurczak z ryżem', 'Spaghetti bolognese', 'Zupa pomidorowa', 'Łosoś z warzywami',
+               'Pierogi', 'Kotlet schabowy z ziemniakami'), (500, 1100)),
+    'kolacja': (('Sałatka z tuńczykiem', 'Kanapki', 'Omlet', 'Twarożek z warzywami'), (300, 700)),
+    'przekąska': (('Jabłko', 'Baton proteinowy', 'Orzechy', 'Banan', 'Jogurt'), (80, 350)),
+}
+
+SCALES = {
+    # nazwa: (lata, mnożnik liczby wpisów dziennie)
+    'small': (1, 1),
+    'medium': (5, 1),
+    'large': (10, 1),
+    'huge': (10, 10),
+}
+
+KCAL_PER_KG = 7700
+# Średni bilans dnia wynikający z MEALS i ACTIVITIES (spożyte minus spalone kcal)
+TYPICAL_NET_KCAL = 1850
+# Zapotrzebowanie rośnie z wagą, więc waga dąży do wylosowanej wagi docelowej
+KCAL_PER_KG_BODY = 22
+
+
+def generate(years=5, multiplier=1, seed=42, end=None, batch_size=5000):
+    """Generator paczek {tabela: [wiersze]} obejmujących `years` lat kończących się w `end`.
+
+    `multiplier` zwielokrotnia liczbę wpisów dziennie (do testów dużych tabel).
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=round(365.25 * years) - 1)
+    height = round(rng.uniform(160, 195), 1)
+    weight = rng.uniform(65, 95)
+    target = weight + rng.uniform(-8, 8)
+    base_maintenance = TYPICAL_NET_KCAL - KCAL_PER_KG_BODY * target
+    activity_names = [name for name, *rest in ACTIVITIES]
+    activity_weights = [share for name, share, *rest in ACTIVITIES]
+    activity_params = {name: (minutes, kcal) for name, share, minutes, kcal in ACTIVITIES}
+
+    batch = {'sport': [], 'nutrition': [], 'personal': []}
+    next_measurement = start
+    day = start
+    while day <= end:
+        burned = eaten = 0
+        for _ in range(multiplier):
+            workout_chance = 0.7 if day.weekday() >= 5 else 0.5
+            workouts = 0 if rng.random() > workout_chance else (2 if rng.random() < 0.1 else 1)
+            for _ in range(workouts):
+                activity = rng.choices(activity_names, activity_weights)[0]
+                (low, high), kcal_per_minute = activity_params[activity]
+                duration = rng.randint(low, high)
+                burned += duration * kcal_per_minute
+                batch['sport'].append({'date': day, 'activity': activity, 'duration': duration,
+                                       'notes': ''})
+
+            meal_types = ['śniadanie', 'obiad', 'kolacja']
+            meal_types += ['przekąska'] * rng.choice((0, 0, 1, 1, 2))
+            for meal_type in meal_types:
+                foods, (low, high) = MEALS[meal_type]
+                # Weekendy i okres świąteczny są bardziej kaloryczne
+                festive = 1.15 if day.weekday() >= 5 or (day.month == 12 and day.day >= 20) else 1.0
+                calories = round(rng.randint(low, high) * festive / 10) * 10
+                eaten += calories
+                batch['nutrition'].append({
+                    'date': day, 'meal_type': meal_type, 'food_item': rng.choice(foods),
+                    'quantity': '1 porcja', 'calories': calories,
+                    'water_ml': rng.choice((0, 250, 250, 500)), 'notes': '',
+                })
+
+        # Waga zmienia się zgodnie z bilansem dnia (dla multiplier > 1 - średnim)
+        maintenance = base_maintenance + KCAL_PER_KG_BODY * weight
+        weight += ((eaten - burned) / multiplier - maintenance) / KCAL_PER_KG
+        weight = min(max(weight, 45), 150)
+
+        if day >= next_measurement:
+            measured = weight + rng.gauss(0, 0.3)
+            body_fat = max(5, 15 + (measured - 70) * 0.45 + rng.gauss(0, 0.8))
+            batch['personal'].append({
+                'date': day, 'weight': round(measured, 1), 'height': height,
+                'body_fat': round(body_fat, 1),
+                'muscle_mass': round(measured * (1 - body_fat / 100) * 0.52, 1), 'notes': '',
+            })
+            next_measurement = day + timedelta(days=rng.randint(1, 4))
+
+        if sum(len(rows) for rows in batch.values()) >= batch_size:
+            yield batch
+            batch = {'sport': [], 'nutrition': [], 'personal': []}
+        day += timedelta(days=1)
+
+    if any(batch.values()):
+        yield batch
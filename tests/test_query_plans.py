@@ -0,0 +1,64 @@
+"""Plany zapytań tras na bazie z rocznymi danymi, celami i skompaktowanymi pomiarami.
+
+Test kończy się błędem, gdy któreś zapytanie trasy przegląda całą tabelę rosnącą
+z historią (query_plans.CHECKED_TABLES) zamiast korzystać z indeksu.
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import goals
+from app import CHART_SOURCES, compact_personal_data, create_app, create_user, db, insert_synthetic, upgrade_database
+from models import PersonalData
+from query_plans import check_query_plans, default_urls, full_scans
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "dziennik.db"}',
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'AUTO_UPGRADE_DB': False,
+        'PERSONAL_COMPACT_INTERVAL': 0,
+    })
+    yield app
+    app.extensions['dziennik_ingest'].close()
+
+
+@pytest.fixture
+def user_id(app):
+    today = date.today()
+    with app.app_context():
+        upgrade_database()
+        user_id = create_user('test', 'password123').id
+        insert_synthetic(years=1, user_id=user_id)
+        # Próbki z urządzeń z dwóch lat - po kompaktowaniu w agregatach godzinowych i dziennych
+        db.session.add_all(PersonalData(user_id=user_id, date=moment.date(), measured_at=moment, weight=80.0)
+                           for moment in (datetime.combine(today, datetime.min.time()) - timedelta(hours=7 * step)
+                                          for step in range(2500)))
+        db.session.commit()
+        compact_personal_data(today)
+        for metric, period, target in (('water_ml', 'day', 2000), ('calories', 'week', 14000)):
+            goals.set_goal(db.session, user_id, metric, period, target)
+        db.session.commit()
+    return user_id
+
+
+def test_full_scans_detects_scan_of_checked_table():
+    assert full_scans(['SCAN daily_summary', 'SCAN goal USING INDEX sqlite_autoindex_goal_1',
+                       'SEARCH personal_hourly USING PRIMARY KEY (user_id=?)']) == ['SCAN daily_summary']
+
+
+def test_routes_use_indexes(app, user_id):
+    today = date.today().isoformat()
+    chart_names = [name[:-len('_chart')] for name in CHART_SOURCES]
+    posts = [
+        ('/sport/add', {'date': today, 'activity': 'Bieg', 'duration': '30'}),
+        ('/nutrition/add', {'date': today, 'meal_type': 'obiad', 'food_item': 'Zupa', 'calories': '400'}),
+        ('/personal/add', {'date': today, 'weight': '80.5'}),
+        ('/goals', {'metric': 'workout_minutes', 'period': 'week', 'target': '150'}),
+        ('/sport/delete/1', {}),
+        ('/nutrition/delete/1', {}),
+    ]
+    failures = check_query_plans(app, db, default_urls(chart_names), user_id, posts)
+    assert [f'{url}: {detail}: {statement}' for url, statement, detail in failures] == []
@@ -0,0 +1,8 @@
+"""Obiekt aplikacji dla serwerów WSGI (np. `gunicorn wsgi:app`).
+
+Moduł app.py udostępnia tylko fabrykę create_app(), więc jego import nie tworzy
+aplikacji; polecenia `flask --app app ...` znajdują fabrykę same.
+"""
+from app import create_app
+
+app = create_app()